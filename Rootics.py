@@ -18,15 +18,17 @@ from PyQt5 import QtCore, QtWidgets
 from PyQt5 import QtGui
 from PyQt5.QtWidgets import (QCheckBox, QComboBox, QFileDialog, QFrame, QGridLayout, QGroupBox, QHBoxLayout, QLabel,
                              QLineEdit, QDialog, QMessageBox, QPushButton, QSlider, QVBoxLayout, QWidget, QWizard,
-                             QWizardPage, QTabWidget, QTableWidget, QTableWidgetItem)
+                             QWizardPage, QTabWidget, QTableWidget, QTableWidgetItem, QProgressDialog)
 from PyQt5.QtCore import Qt, QRegExp
 from PyQt5.QtGui import *
+from PyQt5.QtGui import QFont
 import numpy as np
 import seaborn as sns
 import pandas as pd
 from lmfit import Model
 import os
 import re
+import threading
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT, FigureCanvasQTAgg
 from datetime import datetime
@@ -85,12 +87,122 @@ wizard_page_index = {"IntroPage": 0, "o2Page": 1, "phPage": 2, "h2sPage": 3, "ep
 ls_para_global = ['O2', 'pH', 'H2S', 'EP']
 loc_path = os.getcwd()
 
+# background computations that are currently running (kept alive until they are finished)
+dtask = set()
+
 
 class QIComboBox(QComboBox):
     def __init__(self):
         super(QIComboBox, self).__init__()
 
 
+class TaskSignals(QtCore.QObject):
+    progress = QtCore.pyqtSignal(int, int, str)
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(object)
+    cancelled = QtCore.pyqtSignal()
+
+
+class Task(QtCore.QRunnable):
+    """ Long computation (loading, curve fit, total sulfide, export) executed in a worker thread of the global thread
+    pool. The function is called as fn(progress=..., **kwargs) and must not touch any widget - results, progress, and
+    errors are reported to the GUI thread via signals.
+    """
+    def __init__(self, fn, **kwargs):
+        super(Task, self).__init__()
+        self.fn, self.kwargs = fn, kwargs
+        self.signals = TaskSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self, done, total, label=''):
+        # called by the computation after each step; stops the computation when cancelled meanwhile
+        if self._cancel.is_set():
+            raise dbs.TaskCancelled()
+        if isinstance(label, (list, tuple)):
+            label = ', '.join([os.path.basename(str(l)) for l in label])
+        self.signals.progress.emit(int(done), int(total), str(label))
+
+    def run(self):
+        try:
+            res = self.fn(progress=self.progress, **self.kwargs)
+        except dbs.TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            if self._cancel.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(res)
+
+
+def runTask(parent, fn, label, on_done, on_cancel=None, **kwargs):
+    """ Run fn(progress=..., **kwargs) in the background while a (window modal) progress dialog keeps the GUI
+    responsive and allows to cancel the computation. on_done(result) is called in the GUI thread when finished.
+    """
+    task = Task(fn, **kwargs)
+    dialog = QProgressDialog(label, 'Cancel', 0, 0, parent)
+    dialog.setWindowTitle('Rootics')
+    dialog.setFont(QFont(font_button, fs_font))
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setAutoReset(False), dialog.setAutoClose(False)
+    dialog.setMinimumDuration(500)
+    dialog.canceled.connect(task.cancel)
+
+    def _progress(done, total, text):
+        dialog.setMaximum(total), dialog.setValue(done)
+        dialog.setLabelText('{}\n{}'.format(label, text) if text else label)
+
+    def _close():
+        dtask.discard(task)
+        dialog.canceled.disconnect(task.cancel)
+        dialog.close()
+
+    def _finished(res):
+        _close()
+        on_done(res)
+
+    def _cancelled():
+        _close()
+        if on_cancel is not None:
+            on_cancel()
+
+    def _failed(e):
+        _close()
+        msgBox = QMessageBox()
+        msgBox.setIcon(QMessageBox.Warning)
+        msgBox.setText("{} failed: {}".format(label, e))
+        msgBox.setFont(QFont(font_button, fs_font))
+        msgBox.setWindowTitle("Error")
+        msgBox.setStandardButtons(QMessageBox.Ok)
+        msgBox.exec()
+
+    task.signals.progress.connect(_progress)
+    task.signals.finished.connect(_finished)
+    task.signals.cancelled.connect(_cancelled)
+    task.signals.failed.connect(_failed)
+    dtask.add(task)
+    QtCore.QThreadPool.globalInstance().start(task)
+    return task
+
+
+def exportTask(ls_step, progress=None):
+    # data and figure export as a sequence of save functions fn(**kwargs, progress=...) - executed in the background
+    for fn, kwargs in ls_step:
+        fn(progress=progress, **kwargs)
+
+
+def loadTask(parent, data, on_done):
+    # measurement files are loaded (once per session) in the background before the analyte data are prepared
+    if len(data[1:-1]) == 0:
+        on_done(None)
+    else:
+        runTask(parent, dbs.loadDataset, label='Loading measurement files', on_done=on_done, file_str=data)
+
+
 class MagicWizard(QWizard):
     def __init__(self):
         super(MagicWizard, self).__init__()
@@ -566,6 +678,8 @@ class o2Page(QWizardPage):
         # plotting area
         self.figO2, self.axO2 = plt.subplots()
         self.canvasO2 = FigureCanvasQTAgg(self.figO2)
+        self.browserO2 = dbs.ProfileBrowser(fig=self.figO2, ax=self.axO2)
+        self.plotcache = dbs.PlotCache()
         self.axO2.set_xlabel('O2 / mV'), self.axO2.set_ylabel('Depth / µm')
         self.axO2.invert_yaxis()
         self.figO2.subplots_adjust(bottom=0.2, right=0.95, top=0.9, left=0.15)
@@ -602,8 +716,18 @@ class o2Page(QWizardPage):
         # minimal dissolved O2 is assumed to be 0%air
         self.o2_dis = fO2.dissolvedO2_calc(T=float(self.temperature_edit.text()), sal=float(self.salinity_edit.text()))
 
+    def O2solubility(self):
+        # O2 solubility of each profile in case the metadata sheet lists temperature / salinity for each deployment
+        df_meta = dbs.loadDataset(file_str=self.field("Data"))['meta data']
+        dTS = dbs.profileTS(df_meta=df_meta, temp_degC=float(self.temperature_edit.text()),
+                            sal_PSU=float(self.salinity_edit.text()))
+        if dTS is None:
+            return self.o2_dis
+        return fO2.dissolvedO2_profiles(dTS=dTS, data_shift=self.ddata_shift, T=float(self.temperature_edit.text()),
+                                        sal=float(self.salinity_edit.text()))
+
     def User4Calibration(self):
-        global userCal, dunit, results, steps
+        global userCal
         dunit['O2'] = 'µmol/L'
 
         if userCal:
@@ -622,14 +746,8 @@ class o2Page(QWizardPage):
             dO2_core.update(fO2.O2rearrange(df=self.ddata_shift, unit='µmol/L'))
             results['O2 profile'] = dO2_core
 
-            # update fit and derivative accordingly
-            results = fO2.updateBaseline_O2Fit(results=results, dunit=dunit, steps=steps, gmod=self.gmod)
-
-            # continue with the process - first execute without any click
-            self.continue_processII()
-            # update process that shall be executed when button is clicked
-            self.continue_button.disconnect()
-            self.continue_button.clicked.connect(self.continue_processII)
+            # update fit and derivative accordingly and continue with the process
+            self.updateFit()
 
         elif userCal == QMessageBox.No:
             global ret
@@ -647,28 +765,23 @@ class o2Page(QWizardPage):
 
                 ret = msgBox1.exec()
 
-            global lim, lim_min
             if ret == 0:
                 # define for output metadata
                 self.typeCalib = 'recalibration core by core'
 
                 # calibration core by core
-                dO2_core.update(fO2.O2converter4conc(data_shift=self.ddata_shift, o2_dis=self.o2_dis, lim_min=lim_min,
+                dO2_core.update(fO2.O2converter4conc(data_shift=self.ddata_shift, o2_dis=self.O2solubility(), lim_min=lim_min,
                                                      lim=lim, unit='µmol/L'))
                 for c in dO2_core.keys():
                     for i in dO2_core[c].columns:
                         # get the right columns:
                         col2sub = [k for k in results['O2 profile'][c][i[0]].columns if 'M' in k or 'mol' in k][0]
                         results['O2 profile'][c][i[0]][col2sub] = dO2_core[c][i].dropna().to_numpy()
+                # calibrated values are written into the profiles - plot data need to be prepared again
+                self.plotcache.invalidate()
 
-                # update fit and derivative accordingly
-                results = fO2.updateBaseline_O2Fit(results=results, dunit=dunit, steps=steps, gmod=self.gmod)
-
-                # continue with the process - first execute without any click
-                self.continue_processII()
-                # update process that shall be executed when button is clicked
-                self.continue_button.disconnect()
-                self.continue_button.clicked.connect(self.continue_processII)
+                # update fit and derivative accordingly and continue with the process
+                self.updateFit()
             else:
                 # open window (QDialog) to identify the core that shall be used
                 global wCore
@@ -705,7 +818,6 @@ class o2Page(QWizardPage):
                         self.continue_button.clicked.connect(self.continue_processI)
 
     def continue_process(self):
-        global dunit, dcol_label, grp_label, steps, results
         # store relevant information
         results['temperature degC'] = float(self.temperature_edit.text())
         results['salinity PSU'] = float(self.salinity_edit.text())
@@ -720,31 +832,8 @@ class o2Page(QWizardPage):
             # update subtitle for progress report
             self.setSubTitle("The analysis starts with the correction of the surface-water interface (SWI).  If the "
                              "correction looks good,  press CONTINUE.  Otherwise,  press CHECK FIT for adjustments. \n")
-            # load data from excel sheet depending on the type (measurement file or prepared file)
-            ddata, sheet_select, checked, grp_label = fO2.load_O2data(data=self.field("Data"), grp_label=grp_label,
-                                                                      dcol_label=dcol_label)
-
-            if checked is True:
-                # determine best sigmoidal fit for given dataset
-                [self.ls_core, self.ls_colname, self.gmod, self.dic_dcore, self.dic_deriv,
-                 self.dfit, results] = fO2.sigmoidalFit(ddata=ddata, sheet_select=sheet_select, dunit=dunit,
-                                                        results=results, steps=steps)
-
-                # update group label
-                self.sld_label.setText('{}: {}'.format(self.ls_colname[0], min(self.ls_core)))
-
-                # apply baseline shift and plot updated data
-                self.baselineShift()
-
-                # enable button to click and investigate the derivative / fit
-                self.checkFit_button.setEnabled(True)
-                self.checkFit_button.clicked.connect(self.checkFitWindow)
-
-                # enable next step in O2 analysis
-                self.count += 1
-            else:
-                # reset page as nothing was found
-                self.reset_o2page()
+            # load data from excel sheet (in the background) and continue with the curve fit
+            loadTask(self, data=self.field("Data"), on_done=self.continue_fit)
 
         elif self.count == 1:
             # update subtitle for progress report
@@ -753,6 +842,38 @@ class o2Page(QWizardPage):
             # get user input on calibration - convert O2 potential into concentration
             self.User4Calibration()
 
+    def continue_fit(self, _=None):
+        global grp_label
+        # load data from excel sheet depending on the type (measurement file or prepared file)
+        ddata, sheet_select, checked, grp_label = fO2.load_O2data(data=self.field("Data"), grp_label=grp_label,
+                                                                  dcol_label=dcol_label)
+
+        if checked is True:
+            # determine best sigmoidal fit for given dataset - computed in the background
+            runTask(self, fO2.sigmoidalFit, label='SWI correction - curve fit of all profiles',
+                    on_done=self.continue_fitDone, ddata=ddata, sheet_select=sheet_select, dunit=dunit,
+                    results=results, steps=steps)
+        else:
+            # reset page as nothing was found
+            self.reset_o2page()
+
+    def continue_fitDone(self, res):
+        global results
+        [self.ls_core, self.ls_colname, self.gmod, self.dic_dcore, self.dic_deriv, self.dfit, results] = res
+
+        # update group label
+        self.sld_label.setText('{}: {}'.format(self.ls_colname[0], min(self.ls_core)))
+
+        # apply baseline shift and plot updated data
+        self.baselineShift()
+
+        # enable button to click and investigate the derivative / fit
+        self.checkFit_button.setEnabled(True)
+        self.checkFit_button.clicked.connect(self.checkFitWindow)
+
+        # enable next step in O2 analysis
+        self.count += 1
+
     def baselineShift(self):
         # baseline shift of all samples (of all cores)
         self.ddata_shift = fO2.baseline_shift(dic_dcore=results['O2 profile'], dfit=self.dfit)
@@ -776,52 +897,39 @@ class o2Page(QWizardPage):
         self.figO2.canvas.draw()
 
     def continue_processI(self):
-        global results, dunit, steps
         # possible responses include either "core" or only the number -> find pattern with re
         dO2_core.update(fO2.O2calc4conc_one4all(core_sel=int(core_select), lim_min=lim_min, lim=lim, unit='µmol/L',
-                                                o2_dis=self.o2_dis, data_shift=self.ddata_shift))
+                                                o2_dis=self.O2solubility(), data_shift=self.ddata_shift))
         results['O2 profile'] = dO2_core
 
-        # update fit and derivative accordingly
-        results = fO2.updateBaseline_O2Fit(results=results, dunit=dunit, steps=steps, gmod=self.gmod)
-
         # define for output metadata
         self.typeCalib = 'recalibration one core ' + str(core_select) + ' to all'
 
+        # update fit and derivative accordingly and continue with the process
+        self.updateFit()
+
+    def updateFit(self):
+        # curve fit of the calibrated profiles - computed in the background
+        runTask(self, fO2.updateBaseline_O2Fit, label='Curve fit of the calibrated profiles',
+                on_done=self.updateFitDone, results=results, dunit=dunit, steps=steps, gmod=self.gmod)
+
+    def updateFitDone(self, res):
+        global results
+        results = res
+
         # continue with the process - first execute without any click
         self.continue_processII()
+        # update process that shall be executed when button is clicked
         self.continue_button.disconnect()
         self.continue_button.clicked.connect(self.continue_processII)
 
     def continue_processII(self):
-        global dpen_glob, grp_label, dobj_hid
         if self.count == 1:
-            # determine penetration depth according to given O2 concentration
+            # determine penetration depth according to given O2 concentration - computed in the background
             self.O2_penetration = float(self.pene2_edit.text())
-            self.dcore_pen, _ = fO2.GUI_calcO2penetration(dO2_core=results['O2 profile'], unit='µmol/L', steps=steps,
-                                                          gmod=self.gmod, O2_pen=float(self.pene2_edit.text()),
-                                                          dpen_glob=dpen_glob)
-            results['O2 penetration depth'] = self.dcore_pen
-
-            # update subtitle for progress report
-            self.setSubTitle("For each core,  select all samples to be considered for calculation of the average "
-                             "penetration depth. Then press CONTINUE.\n")
-
-            # slider initialized to first core
-            self.slider.setValue(int(min(self.ls_core)))
-            self.sld_label.setText('{}: {}'.format(self.ls_colname[0], int(min(self.ls_core))))
-
-            # initialize first plot with first core
-            _, dobj_hid = fO2.GUI_O2depth(core=int(min(self.ls_core)), ls_core=self.ls_core, dcore_pen=self.dcore_pen,
-                                          fs_=fs_, dobj_hid=dobj_hid, dO2_core=results['O2 profile'], ax=self.axO2,
-                                          fig=self.figO2, grp_label=grp_label)
-            # when slider value change (on click), return new value and update figure plot
-            self.slider.valueChanged.connect(self.slider_update1)
-            self.figO2.canvas.draw()
-
-            # enable next step in O2 analysis
-            results['O2 hidden objects'] = dobj_hid
-            self.count += 1
+            runTask(self, fO2.GUI_calcO2penetration, label='Penetration depth - curve fit of all profiles',
+                    on_done=self.continue_penetrationDone, dO2_core=results['O2 profile'], unit='µmol/L', steps=steps,
+                    gmod=self.gmod, O2_pen=self.O2_penetration, dpen_glob=dpen_glob)
 
         elif self.count == 2:
             # update subtitle for progress report
@@ -833,6 +941,31 @@ class o2Page(QWizardPage):
             self.count += 1
             self.continue_button.setEnabled(False)
 
+    def continue_penetrationDone(self, res):
+        global dobj_hid
+        self.dcore_pen = res[0]
+        results['O2 penetration depth'] = self.dcore_pen
+
+        # update subtitle for progress report
+        self.setSubTitle("For each core,  select all samples to be considered for calculation of the average "
+                         "penetration depth. Then press CONTINUE.\n")
+
+        # slider initialized to first core
+        self.slider.setValue(int(min(self.ls_core)))
+        self.sld_label.setText('{}: {}'.format(self.ls_colname[0], int(min(self.ls_core))))
+
+        # initialize first plot with first core
+        _, dobj_hid = fO2.GUI_O2depth(core=int(min(self.ls_core)), ls_core=self.ls_core, dcore_pen=self.dcore_pen,
+                                      fs_=fs_, dobj_hid=dobj_hid, dO2_core=results['O2 profile'], ax=self.axO2,
+                                      fig=self.figO2, grp_label=grp_label)
+        # when slider value change (on click), return new value and update figure plot
+        self.slider.valueChanged.connect(self.slider_update1)
+        self.figO2.canvas.draw()
+
+        # enable next step in O2 analysis
+        results['O2 hidden objects'] = dobj_hid
+        self.count += 1
+
     def _CalcPenetration(self):
         global dpen_glob
         # double check, whether definition of penetration depth has changed
@@ -887,11 +1020,11 @@ class o2Page(QWizardPage):
             self.slider.setValue(int(core_select))
             self.sld_label.setText('{}: {}'.format(self.ls_colname[0], core_select))
 
-            # update plot according to selected core
+            # update plot according to selected core (blitted)
             global dunit
-            _ = fO2.GUI_baslineShift(data_shift=self.ddata_shift, core=core_select, ls_core=self.ls_core,
-                                     fig=self.figO2, ax=self.axO2, plot_col=dunit['O2'], grp_label=grp_label)
-            self.figO2.canvas.draw()
+            _ = fO2.browse_baslineShift(browser=self.browserO2, data_shift=self.ddata_shift, core=core_select,
+                                        ls_core=self.ls_core, plot_col=dunit['O2'], grp_label=grp_label,
+                                        cache=self.plotcache)
 
     def slider_update1(self):
         # pre-check whether count status is >= 1:
@@ -936,27 +1069,6 @@ class o2Page(QWizardPage):
         else:
             wFit.show()
 
-    def save_data(self, analyte):
-        # make a project folder for the specific analyte if it doesn't exist
-        save_path = self.field("Storage path") + '/' + analyte + '_project/'
-        if not os.path.exists(save_path):
-            os.makedirs(save_path)
-
-        ls_saveData = list()
-        [ls_saveData.append(i) for i in self.field('saving parameters').split(',') if 'fig' not in i]
-        if len(ls_saveData) > 0:
-            # all keys that shall be removed
-            ls_removeKey = list()
-            [ls_removeKey.append(i) for i in ls_allData if i not in ls_saveData]
-            if 'fit_mV' in ls_removeKey:
-                ls_removeKey.append('derivative_mV')
-
-            # delete a keys not in that list regardless of whether it is in the dictionary
-            [dout.pop(i, None) for i in ls_removeKey]
-
-            # save to excel sheets
-            dbs.save_rawExcel(dout=dout, file=self.field("Data"), savePath=save_path)
-
     def save(self):
         global dout, dpen_glob, results, dobj_hid, grp_label, dunit
         # preparation - make own function out at the end
@@ -964,13 +1076,17 @@ class o2Page(QWizardPage):
                                 temperature=float(self.temperature_edit.text()), pene2=float(self.pene2_edit.text()),
                                 salinity=float(self.salinity_edit.text()), dpenStat=dpen_glob)
 
-        # extract saving options for data / figures - according to user input
-        self.save_data(analyte='O2')
-        fO2.save_figure(save_params=self.field('saving parameters'), path_save=self.field("Storage path"), analyte='O2',
-                        results=results, ls_core=self.ls_core, dic_deriv=self.dic_deriv, ddata_shift=self.ddata_shift,
-                        dcore_pen=self.dcore_pen, dO2_core=results['O2 profile'], dobj_hid=dobj_hid, dunit=dunit,
-                        grp_label=grp_label, dpen_glob=dpen_glob)
-
+        # extract saving options for data / figures - according to user input; exported in the background
+        ls_step = [(fO2.save_O2data, dict(save_path=self.field("Storage path"), dout=dout, data=self.field("Data"),
+                                          save_params=self.field('saving parameters'), ls_allData=ls_allData)),
+                   (fO2.save_figure, dict(save_params=self.field('saving parameters'), analyte='O2', results=results,
+                                          path_save=self.field("Storage path"), ls_core=self.ls_core, dunit=dunit,
+                                          dic_deriv=self.dic_deriv, ddata_shift=self.ddata_shift, dobj_hid=dobj_hid,
+                                          dcore_pen=self.dcore_pen, dO2_core=results['O2 profile'],
+                                          grp_label=grp_label, dpen_glob=dpen_glob))]
+        runTask(self, exportTask, label='Saving O2 data and figures', on_done=self.saved, ls_step=ls_step)
+
+    def saved(self, _=None):
         # Information that saving was successful
         msgBox = QMessageBox()
         msgBox.setIcon(QMessageBox.Information)
@@ -1065,6 +1181,7 @@ class FitWindow(QDialog):
         # get the transmitted data
         self.dShift, self.figO2, self.axO2, self.storage_path = data_shift, figO2, axO2, storage_path
         self.dfCore, self.FitCore, self.DerivCore = dfCore[self.Core], dfFit[self.Core], dfDeriv[self.Core]
+        self.dwarm = dict()     # fit parameters of the last refit of each sample (warm start)
 
         # generate an independent dictionary of cores in case of updateFit is used
         self.dfCoreFit = dict()
@@ -1290,15 +1407,17 @@ class FitWindow(QDialog):
 
         return dcore_crop
 
-    def reFit(self, dcore_crop):
+    def reFit(self, dcore_crop, s):
         global dunit
         gmod = Model(fO2._gompertz_curve_adv)
-        res, df_fit_crop, df_fitder = fO2.baseline_finder_DF(dic_dcore=dcore_crop, dunit_O2=dunit['O2'], steps=steps,
-                                                             model=gmod, adv=True)
+        [res, df_fit_crop, df_fitder,
+         xshift] = fO2.baseline_finder_DF(dic_dcore=dcore_crop, dunit_O2=dunit['O2'], steps=steps, model=gmod, adv=True,
+                                          params=self.dwarm[s] if s in self.dwarm.keys() else None)
+        self.dwarm[s] = res.params
 
         # update red.chi2
         self.chi2.setText('Goodness of fit (reduced χ2): ' + str(round(res.redchi, 3)))
-        return df_fit_crop, df_fitder
+        return df_fit_crop, df_fitder, xshift
 
     def adjustData(self):
         global dunit, grp_label
@@ -1316,15 +1435,16 @@ class FitWindow(QDialog):
             dcore_crop = self.popOutlier(dcore_crop=dcore_crop)
 
         # re-do fitting - curve fit and baseline finder
-        df_fit_crop, df_fitder = self.reFit(dcore_crop=dcore_crop)
+        df_fit_crop, df_fitder, xshift = self.reFit(dcore_crop=dcore_crop, s=s)
 
         # re-draw fit plot
         _ = fO2.plot_FitUpdate(core=self.Core, nr=s, dic_dcore=dcore_crop, dfit=df_fit_crop, dic_deriv=df_fitder,
-                               ax1=self.ax1Fit, ax=self.axFit, fig=self.figFit, grp_label=grp_label, dunit=dunit)
+                               ax1=self.ax1Fit, ax=self.axFit, fig=self.figFit, grp_label=grp_label, dunit=dunit,
+                               xshift=xshift)
         self.figFit.canvas.draw()
 
         # exchange the updated depth profile to the dictionary (to plot all)
-        self.dShift[c][s] = pd.DataFrame(np.array(dcore_crop), index=dcore_crop.index - df_fitder.idxmin().values[0],
+        self.dShift[c][s] = pd.DataFrame(np.array(dcore_crop), index=dcore_crop.index - xshift,
                                          columns=dcore_crop.columns)
         # plot baseline corrected depth profiles for special sample
         _ = fO2.GUI_baslineShiftCore(data_shift=self.dShift[c], core_select=self.Core, plot_col=dunit['O2'],
@@ -1349,14 +1469,15 @@ class FitWindow(QDialog):
             self.ls_out = list()
 
         # re-do fitting - curve fit and baseline finder
-        df_fit_crop, df_fitder = self.reFit(dcore_crop=dcore_crop)
+        df_fit_crop, df_fitder, xshift = self.reFit(dcore_crop=dcore_crop, s=s)
 
         # re-draw fit plot
         _ = fO2.plot_FitUpdate(core=self.Core, nr=s, dic_dcore=dcore_crop, dfit=df_fit_crop, dic_deriv=df_fitder,
-                               ax1=self.ax1Fit, ax=self.axFit, fig=self.figFit, grp_label=grp_label, dunit=dunit)
+                               ax1=self.ax1Fit, ax=self.axFit, fig=self.figFit, grp_label=grp_label, dunit=dunit,
+                               xshift=xshift)
         self.figFit.canvas.draw()
         # exchange the updated depth profile to the dictionary (to plot all)
-        self.dShiftFit[c][s] = pd.DataFrame(np.array(dcore_crop), index=dcore_crop.index - df_fitder.idxmin().values[0],
+        self.dShiftFit[c][s] = pd.DataFrame(np.array(dcore_crop), index=dcore_crop.index - xshift,
                                             columns=dcore_crop.columns)
         self.dShift[c][s] = pd.DataFrame(np.array(self.dShift[c][s]), index=self.dShift[c][s].index,
                                          columns=self.dShift[c][s].columns)
@@ -1639,6 +1760,8 @@ class phPage(QWizardPage):
         # plotting area
         self.figpH, self.axpH = plt.subplots()
         self.canvaspH = FigureCanvasQTAgg(self.figpH)
+        self.browserpH = dbs.ProfileBrowser(fig=self.figpH, ax=self.axpH)
+        self.plotcache = dbs.PlotCache()
         self.axpH.set_xlabel('pH value', fontsize=fs_), self.axpH.set_ylabel('Depth / µm', fontsize=fs_)
         self.axpH.invert_yaxis()
         self.figpH.tight_layout(pad=2.5)
@@ -1664,7 +1787,11 @@ class phPage(QWizardPage):
                 self.continuepH_button.setEnabled(False)
 
     def continue_pH(self):
-        global dcol_label, grp_label, results, dunit, fs_
+        # measurement files are loaded in the background first
+        loadTask(self, data=self.field("Data"), on_done=self.continue_pHI)
+
+    def continue_pHI(self, _=None):
+        global grp_label, results
         self.setSubTitle("Now,  the SWI can be set.  Either choose the depth determined in the O2 project,  or set "
                          "your own depth wisely.  Press PLOT to continue. \n")
 
@@ -1682,9 +1809,7 @@ class phPage(QWizardPage):
         if checked is True:
             # adjust all the core plots to the same x-scale
             dic_raw = results['pH profile raw data']
-            dfpH_scale = pd.concat([pd.DataFrame([(dic_raw[c][n]['pH'].min(), dic_raw[c][n]['pH'].max())
-                                                  for n in dic_raw[c].keys()]) for c in dic_raw.keys()])
-            self.scale0 = dfpH_scale[0].min(), dfpH_scale[1].max()
+            self.scale0 = self.plotcache.xrange(ddata=dic_raw, col='pH')
             self.scale = self.scale0
             # plot the pH profile for the first core
             _ = fph.plot_pHProfile(data_pH=dic_raw, core=min(self.ls_core), ls_core=self.ls_core, scale=self.scale,
@@ -1793,9 +1918,9 @@ class phPage(QWizardPage):
                 scale_plot = self.scale0
             ls = '-.' if self.status_pH < 1 else '-'
             global grp_label, fs_
-            _ = fph.plot_pHProfile(data_pH=results['pH adjusted'], core=core_select, ls_core=self.ls_core, ls=ls,
-                                   scale=scale_plot, fig=self.figpH, ax=self.axpH, grp_label=grp_label, fs_=fs_)
-            self.figpH.canvas.draw()
+            _ = fph.browse_pHProfile(browser=self.browserpH, data_pH=results['pH adjusted'], core=core_select, ls=ls,
+                                     ls_core=self.ls_core, scale=scale_plot, grp_label=grp_label, fs_=fs_,
+                                     cache=self.plotcache)
 
     def adjust_pH(self):
         # open dialog window to adjust data presentation
@@ -1814,12 +1939,14 @@ class phPage(QWizardPage):
         if not os.path.exists(save_path):
             os.makedirs(save_path)
 
-        # save data and figures
-        fph.save_pHdata(save_path=save_path, save_params=self.field('saving parameters'), data=self.field("Data"),
-                        results=results)
-        fph.save_pHfigures(save_para=self.field('saving parameters'), path_save=self.field("Storage path"), fs_=fs_,
-                           results=results, grp_label=grp_label)
+        # save data and figures - exported in the background
+        ls_step = [(fph.save_pHdata, dict(save_path=save_path, save_params=self.field('saving parameters'),
+                                          data=self.field("Data"), results=results)),
+                   (fph.save_pHfigures, dict(save_para=self.field('saving parameters'), fs_=fs_, results=results,
+                                             path_save=self.field("Storage path"), grp_label=grp_label))]
+        runTask(self, exportTask, label='Saving pH data and figures', on_done=self.saved_pH, ls_step=ls_step)
 
+    def saved_pH(self, _=None):
         # Information about successful saving
         msgBox = QMessageBox()
         msgBox.setIcon(QMessageBox.Information)
@@ -2352,6 +2479,8 @@ class h2sPage(QWizardPage):
         # plotting area
         self.figh2s, self.axh2s = plt.subplots()
         self.canvash2s = FigureCanvasQTAgg(self.figh2s)
+        self.browserh2s = dbs.ProfileBrowser(fig=self.figh2s, ax=self.axh2s)
+        self.plotcache = dbs.PlotCache()
         self.axh2s.set_xlabel('H2S / µmol/L', fontsize=fs_), self.axh2s.set_ylabel('Depth / µm', fontsize=fs_)
         self.axh2s.invert_yaxis()
         self.figh2s.subplots_adjust(bottom=0.2, right=0.95, top=0.9, left=0.15)
@@ -2384,7 +2513,11 @@ class h2sPage(QWizardPage):
             wConv.show()
 
     def continue_H2S(self):
-        global results, dunit, grp_label, dcol_label
+        # measurement files are loaded in the background first
+        loadTask(self, data=self.field("Data"), on_done=self.continue_H2SI)
+
+    def continue_H2SI(self, _=None):
+        global results, grp_label
         # get relevant information from previous projects if possible
         ssal = str(round(results['salinity PSU'], 4)) if 'salinity PSU' in results.keys() else '0.'
         self.sal_edit.setText(ssal)
@@ -2409,10 +2542,7 @@ class h2sPage(QWizardPage):
             c = list(self.dH2S_core.keys())[0]
             nr = list(self.dH2S_core[c].keys())[0]
             self.colH2S = self.dH2S_core[c][nr].columns[1]
-            dfH2S_scale = pd.concat([pd.DataFrame([(self.dH2S_core[c][n][self.colH2S].min(),
-                                                    self.dH2S_core[c][n][self.colH2S].max())
-                                                   for n in self.dH2S_core[c].keys()]) for c in self.dH2S_core.keys()])
-            self.scale0 = dfH2S_scale[0].min(), dfH2S_scale[1].max()
+            self.scale0 = fh2s.profileRange(ddata=self.dH2S_core, col=self.colH2S, cache=self.plotcache)
             self.scale = self.scale0
 
             # plot the pH profile for the first core
@@ -2494,7 +2624,6 @@ class h2sPage(QWizardPage):
         return df_correl
 
     def continue_H2SIIa(self):
-        global grp_label, dunit, dobj_hidH2S, scaleh2s, results
         self.updateh2s_button.setEnabled(False), self.swih2s_edit.setEnabled(False)
 
         # update subtitle for swi correction
@@ -2507,14 +2636,21 @@ class h2sPage(QWizardPage):
         # update the analyte that is used
         dunit['total sulfide'] = 'µmol/L'
 
-        # identify closest value in list
-        core_select = dbs.closest_core(ls_core=self.ls_core, core=self.sliderh2s.value())
+        # convert H2S into total sulfide in case pH was measured - computed in the background
+        dTS = dbs.profileTS(df_meta=dbs.loadDataset(file_str=self.field("Data"))['meta data'],
+                            temp_degC=float(self.tempC_edit.text()), sal_PSU=float(self.sal_edit.text()))
+        runTask(self, fh2s.calc_total_sulfide_TS, label='Total sulfide of all profiles',
+                on_done=self.continue_H2SIIaDone, results=results, dH2S_core=self.dH2S_core, temp_degC=float(self.tempC_edit.text()),
+                sal_pmill=float(self.sal_edit.text()), convC2K=convC2K, dTS=dTS)
 
-        # convert H2S into total sulfide in case pH was measured
-        dsulfide, results = fh2s.calc_total_sulfide(results=results, dH2S_core=self.dH2S_core, sal_edit=self.sal_edit,
-                                                    tempC_edit=self.tempC_edit, convC2K=convC2K)
+    def continue_H2SIIaDone(self, res):
+        global dobj_hidH2S, scaleh2s, results
+        dsulfide, results = res
         results['H2S profile total sulfide'] = dsulfide
 
+        # identify closest value in list
+        core_select = dbs.closest_core(ls_core=self.ls_core, core=self.sliderh2s.value())
+
         # create a total sulfide adjusted DF
         lab_raw = 'H2S profile total sulfide'
         results['H2S total sulfide adjusted'] = dict()
@@ -2641,34 +2777,9 @@ class h2sPage(QWizardPage):
         self.setSubTitle("The sulfidic front indicates the depth below the surface where total sulfide ΣS2- or H2S can"
                          " be detected for the first time in the sediment.\n")
 
-        # identify data to use for the sulfidic front
-        label1, label2 = 'H2S total sulfide adjusted', 'H2S adjust'
-        df_sulfFront = results[label1] if label1 in results.keys() else results[label2]
-        df_sFront = dict()
-        for coreS in df_sulfFront.keys():
-            ls_sample = list()
-            for en, s in enumerate(df_sulfFront[coreS].keys()):
-                df_, col = df_sulfFront[coreS][s], df_sulfFront[coreS][s].columns[-1]
-                sulFront = df_[col][df_[col] >= float(self.sFh2s_edit.text())]
-                if sulFront.empty:
-                    ls_sample.append(np.nan)
-                else:
-                    ls_sample.append(sulFront.index[0])
-            ind = ['sample '+str(i) for i in df_sulfFront[coreS].keys()]
-            dfCore = pd.DataFrame(ls_sample, index=ind, columns=['sulfidic front'])
-
-            # average when object not hidden
-            if coreS in dobj_hidH2S.keys():
-                smp_all = list(dfCore.index)
-                [smp_all.remove(i) for i in dobj_hidH2S[coreS] if i in smp_all]
-            else:
-                smp_all = list(dfCore.index)
-            if np.nanmean(dfCore.loc[smp_all]) >= 0:
-                dfCore.loc['mean', 'sulfidic front'] = np.nanmean(dfCore.loc[smp_all])
-            else:
-                dfCore.loc['mean', 'sulfidic front'] = 0
-            dfCore.loc['std', 'sulfidic front'] = np.nanstd(dfCore.loc[smp_all])
-            df_sFront[coreS] = dfCore
+        # identify the sulfidic front for each sample
+        df_sFront = fh2s.sulfidicFront(results=results, threshold=float(self.sFh2s_edit.text()),
+                                       dobj_hidH2S=dobj_hidH2S)
         results['H2S sulfidic front'], results['H2S hidden objects'] = df_sFront, dobj_hidH2S
 
         # identify closest value in list
@@ -2702,11 +2813,10 @@ class h2sPage(QWizardPage):
             ls = '-.' if self.status_h2s < 1 else '-'
             te = True if core_select in scaleh2s.keys() else False
             global grp_label, dunit, dobj_hidH2S, results
-            dobj_hidH2S = fh2s.plot_H2SProfile(data_H2S=results['H2S adjusted'], core=core_select, scale=scale_plot,
-                                               ls=ls, fig=self.figh2s, ax=self.axh2s, dobj_hidH2S=dobj_hidH2S,
-                                               ls_core=self.ls_core, col=self.colH2S, trimexact=te, grp_label=grp_label,
-                                               dunit=dunit, fs_=fs_)[-1]
-            self.figh2s.canvas.draw()
+            dobj_hidH2S = fh2s.browse_H2SProfile(browser=self.browserh2s, data_H2S=results['H2S adjusted'], ls=ls,
+                                                 core=core_select, scale=scale_plot, dobj_hidH2S=dobj_hidH2S,
+                                                 ls_core=self.ls_core, col=self.colH2S, trimexact=te,
+                                                 grp_label=grp_label, dunit=dunit, fs_=fs_, cache=self.plotcache)[-1]
 
     def sliderh2s_updateII(self):
         global scaleh2s
@@ -2727,11 +2837,11 @@ class h2sPage(QWizardPage):
                 scale_plot = self.scaleS0
             te = True if core_select_ in scaleh2s.keys() else False
             global grp_label, dunit, dobj_hidH2S, results
-            dobj_hidH2S = fh2s.plot_H2SProfile(data_H2S=results['H2S total sulfide adjusted'], core=core_select, ls='-',
-                                               ls_core=self.ls_core, col=self.col2, scale=scale_plot, fig=self.figh2s,
-                                               ax=self.axh2s, fs_=fs_, dunit=dunit, dobj_hidH2S=dobj_hidH2S,
-                                               trimexact=te, grp_label=grp_label)[-1]
-            self.figh2s.canvas.draw()
+            data_H2S = results['H2S total sulfide adjusted']
+            dobj_hidH2S = fh2s.browse_H2SProfile(browser=self.browserh2s, data_H2S=data_H2S, core=core_select, ls='-',
+                                                 ls_core=self.ls_core, col=self.col2, scale=scale_plot, fs_=fs_,
+                                                 dunit=dunit, dobj_hidH2S=dobj_hidH2S, trimexact=te,
+                                                 grp_label=grp_label, cache=self.plotcache)[-1]
 
     def sliderh2s_updateIII(self):
         if self.ls_core:
@@ -2777,13 +2887,15 @@ class h2sPage(QWizardPage):
         # preparation to save data
         dout = fh2s.prepDataH2Soutput(dout=dout, results=results)
 
-        # actual saving of data and figures
-        fh2s.save_H2Sdata(save_path=self.field("Storage path"), save_para=self.field('saving parameters'), dout=dout,
-                          data=self.field("Data"), ls_allData=ls_allData)
-        fh2s.save_H2Sfigure(save_para=self.field('saving parameters'), save_path=self.field("Storage path"), fs_=fs_,
-                            ls_core=self.ls_core, grp_label=grp_label, dunit=dunit, dobj_hidH2S=dobj_hidH2S,
-                            results=results)
+        # actual saving of data and figures - exported in the background
+        ls_step = [(fh2s.save_H2Sdata, dict(save_path=self.field("Storage path"), dout=dout, data=self.field("Data"),
+                                            save_para=self.field('saving parameters'), ls_allData=ls_allData)),
+                   (fh2s.save_H2Sfigure, dict(save_para=self.field('saving parameters'), fs_=fs_, results=results,
+                                              save_path=self.field("Storage path"), ls_core=self.ls_core,
+                                              grp_label=grp_label, dunit=dunit, dobj_hidH2S=dobj_hidH2S))]
+        runTask(self, exportTask, label='Saving H2S data and figures', on_done=self.saved_H2S, ls_step=ls_step)
 
+    def saved_H2S(self, _=None):
         # Information that saving was successful
         msgBox = QMessageBox()
         msgBox.setIcon(QMessageBox.Information)
@@ -2816,23 +2928,11 @@ class h2sPage(QWizardPage):
         if 'H2S total sulfide adjusted' in results.keys():
             results.pop('H2S total sulfide adjusted')
 
-        results['H2S adjusted'] = dict()
-        for c in results['pH profile raw data'].keys():
-            ddic = dict(map(lambda i: (i, pd.DataFrame(np.array(results['pH profile raw data'][c][i]),
-                                                       index=results['pH profile raw data'][c][i].index,
-                                                       columns=results['pH profile raw data'][c][i].columns)),
-                            results['pH profile raw data'][c].keys()))
-            results['H2S adjusted'][c] = ddic
+        results['H2S adjusted'] = results['pH profile raw data'].edit()
 
         # update status for process control
         self.scale = None
-        if self.dH2S_core:
-            dfH2S_scale = pd.concat([pd.DataFrame([(self.dH2S_core[c][n][self.colH2S].min(),
-                                                    self.dH2S_core[c][n][self.colH2S].max())
-                                                   for n in self.dH2S_core[c].keys()]) for c in self.dH2S_core.keys()])
-        else:
-            dfH2S_scale = None
-        self.scale0 = dfH2S_scale[0].min(), dfH2S_scale[1].max()
+        self.scale0 = fh2s.profileRange(ddata=self.dH2S_core, col=self.colH2S, cache=self.plotcache)
         self.tempC_edit.setText('13.2')
         self.sal_edit.setText('0.')
 
@@ -3341,6 +3441,8 @@ class epPage(QWizardPage):
         # plotting area
         self.figEP, self.axEP = plt.subplots()
         self.canvasEP = FigureCanvasQTAgg(self.figEP)
+        self.browserEP = dbs.ProfileBrowser(fig=self.figEP, ax=self.axEP)
+        self.plotcache = dbs.PlotCache()
         self.axEP.set_xlabel('EP / mV', fontsize=fs_), self.axEP.set_ylabel('Depth / µm', fontsize=fs_)
         self.axEP.invert_yaxis()
         self.figEP.subplots_adjust(bottom=0.2, right=0.95, top=0.9, left=0.15)
@@ -3364,13 +3466,17 @@ class epPage(QWizardPage):
                 self.continueEP_button.clicked.connect(self.continue_EPIIa)
 
     def continue_EP(self):
+        # measurement files are loaded in the background first
+        loadTask(self, data=self.field("Data"), on_done=self.continue_EPI)
+
+    def continue_EPI(self, _=None):
         # update instruction
         self.setSubTitle("The measurement data are plotted below.  If you want to adjust the profiles, press the "
                          "Adjustment button.  If the drift correction shall be applied in the next step, press the "
                          "respective checkbox. \n")
 
         # load relevant global parameters
-        global dunit, results, dcol_label, grp_label, scaleEP
+        global results, grp_label
         # store the unit (mV) in dunit
         dunit['EP'] = 'mV'
 
@@ -3382,10 +3488,7 @@ class epPage(QWizardPage):
 
         if checked is True:
             # adjust all the core plots to the same x-scale
-            dfEP_scale = pd.concat([pd.DataFrame([(self.dEP_core[c][n]['EP_mV'].min(),
-                                                   self.dEP_core[c][n]['EP_mV'].max())
-                                                  for n in self.dEP_core[c].keys()]) for c in self.dEP_core.keys()])
-            self.scale0 = dfEP_scale[0].min(), dfEP_scale[1].max()
+            self.scale0 = self.plotcache.xrange(ddata=self.dEP_core, col='EP_mV')
             # use self.scale0 for the initial plot but make it possible to update self.scale
             self.scale = scaleEP[min(self.ls_core)] if min(self.ls_core) in scaleEP.keys() else self.scale0
             # plot the pH profile for the first core
@@ -3423,10 +3526,10 @@ class epPage(QWizardPage):
 
             # update plot according to selected data set and core
             ls = '-.' if self.status_EP < 2 else '-'
-            _ = fep.plot_initalProfile(data=results['EP adjusted'], para='EP', unit='mV', col_name='EP_mV', ls=ls,
-                                       core=core_select, ls_core=self.ls_core, dobj_hidEP=dobj_hidEP, fig=self.figEP,
-                                       ax=self.axEP, grp_label=grp_label, scaleEP=scaleEP, fs_=fs_)
-            self.figEP.canvas.draw()
+            _ = fep.browse_initalProfile(browser=self.browserEP, data=results['EP adjusted'], para='EP', unit='mV',
+                                         col_name='EP_mV', ls=ls, core=core_select, ls_core=self.ls_core,
+                                         dobj_hidEP=dobj_hidEP, grp_label=grp_label, scaleEP=scaleEP, fs_=fs_,
+                                         cache=self.plotcache)
 
     def swi_correctionEP(self):
         # identify the data to adjust (SWI)
@@ -3444,7 +3547,7 @@ class epPage(QWizardPage):
                 # EP correction
                 ynew = data[core_select][s].index - float(self.swi_edit.text())
                 data[core_select][s].index = ynew
-                results['EP raw data'][core_select][s].index = ynew
+                results['EP raw data'].shift_depth(core=core_select, s=s, ynew=ynew)
 
         # add to results dictionary
         results['EP adjusted'] = data
@@ -3515,9 +3618,7 @@ class epPage(QWizardPage):
         self.swi_correctionEP()
 
         # plot the pH profile for the first core
-        dfEP_scale = pd.concat([pd.DataFrame([(self.data[c][n]['EP_mV'].min(), self.data[c][n]['EP_mV'].max())
-                                              for n in self.data[c].keys()]) for c in self.data.keys()])
-        scale_plot = dfEP_scale[0].min(), dfEP_scale[1].max()
+        scale_plot = self.plotcache.xrange(ddata=self.data, col='EP_mV')
         self.scale = scale_plot
         _ = fep.plot_initalProfile(data=self.data, para='EP', unit='mV', col_name='EP_mV', core=core_select, ls='-',
                                    ls_core=self.ls_core, dobj_hidEP=dobj_hidEP, fig=self.figEP, ax=self.axEP,
@@ -3563,12 +3664,15 @@ class epPage(QWizardPage):
         dout = dict()
         dout = fep.prepDataEPoutput(dout=dout, results=results)
 
-        # actual saving of data and figures
-        fep.save_EPdata(path_save=self.field("Storage path"), save_params=self.field('saving parameters'), dout=dout,
-                        data=self.field("Data"), ls_allData=ls_allData)
-        fep.save_EPfigure(save_para=self.field('saving parameters'), ls_core=self.ls_core, grp_label=grp_label,
-                          path_save=self.field("Storage path"), results=results, dobj_hidEP=dobj_hidEP, scaleEP=scaleEP)
+        # actual saving of data and figures - exported in the background
+        ls_step = [(fep.save_EPdata, dict(path_save=self.field("Storage path"), dout=dout, data=self.field("Data"),
+                                          save_params=self.field('saving parameters'), ls_allData=ls_allData)),
+                   (fep.save_EPfigure, dict(save_para=self.field('saving parameters'), ls_core=self.ls_core,
+                                            grp_label=grp_label, path_save=self.field("Storage path"), results=results,
+                                            dobj_hidEP=dobj_hidEP, scaleEP=scaleEP))]
+        runTask(self, exportTask, label='Saving EP data and figures', on_done=self.saved_EP, ls_step=ls_step)
 
+    def saved_EP(self, _=None):
         # Information that saving was successful
         msgBox = QMessageBox()
         msgBox.setIcon(QMessageBox.Information)
@@ -3957,9 +4061,7 @@ class DriftWindow(QDialog):
         self.nP = 1
 
         # get meta data
-        df = self.dsheets[self.dsheets['EP'] > 0][['deployment', 'code', 'EP']]
-        self.dorder = dict(map(lambda n: (n, list([(int(t[1].split(' ')[-1]), t[0]) for t in df[df['EP'] == n].values])),
-                               list(dict.fromkeys(df['EP'].to_numpy()))))
+        self.dorder = fep.EPdrift_order(df_meta=self.dsheets)
 
         # set slider to initial value
         self.sliderTD.setValue(self.nP), self.sldTD_label.setText('group: {}'.format(self.nP))
@@ -3977,6 +4079,7 @@ class DriftWindow(QDialog):
         # connect checkbox and load file button with a function
         self.closeDC_button.clicked.connect(self.close_windowSD)
         self.fit_button.clicked.connect(self.applyDriftCorr)
+        self.fitAll_button.clicked.connect(self.applyDriftCorrAll)
 
     def initUI(self):
         self.setWindowTitle("Sensor drift correction")
@@ -4017,6 +4120,8 @@ class DriftWindow(QDialog):
         self.closeDC_button.setFixedWidth(100), self.closeDC_button.setFont(QFont(font_button, fs_font))
         self.fit_button = QPushButton('Fit', self)
         self.fit_button.setFixedWidth(100), self.fit_button.setFont(QFont(font_button, fs_font))
+        self.fitAll_button = QPushButton('Correct all', self)
+        self.fitAll_button.setFixedWidth(100), self.fitAll_button.setFont(QFont(font_button, fs_font))
 
         # create grid and groups
         layoutDC = QGridLayout()
@@ -4031,6 +4136,7 @@ class DriftWindow(QDialog):
         layoutDC.addWidget(self.msg, 3, 1, 2, 2)
         layoutDC.addWidget(self.closeDC_button, 5, 1)
         layoutDC.addWidget(self.fit_button, 5, 2)
+        layoutDC.addWidget(self.fitAll_button, 6, 2)
 
         # Set the layout on the application's window
         self.setLayout(layoutDC)
@@ -4095,6 +4201,27 @@ class DriftWindow(QDialog):
                 self.msg.setText('Details about the curve fit:\ngoodness of fit: {:.2e} \n\nfit parameter: '
                                  '\na = {:.2e}\nb = {:.2e}\n'.format(chi_squared, corr_f[0], corr_f[1]))
 
+    def applyDriftCorrAll(self):
+        # drift correction of all groups at once with the selected regression
+        fit_select = self.FitSelect_box.currentText()
+        [self.dataDC, dataDP,
+         dFit] = fep.EPdrift_correction(dataEP=self.ddata, dorder=self.dorder, fit_select=fit_select,
+                                        resultsEP=self.dataDC)
+        self.dataDP.update(dataDP), self.dFit.update(dFit)
+        [self.Fitdone.append(g) for g in dFit.keys() if g not in self.Fitdone]
+
+        # re-draw the current group including the corrected profiles and its curve fit
+        self.sliderTD_update()
+        _ = fep.plot_Fit(df_reg=self.dFit[self.nP]['regression curve'], ydata=self.dFit[self.nP]['average EP'],
+                         figR=self.figCF, axR=self.axCF, show=True)
+        self.figCF.canvas.draw()
+
+        # report the goodness of fit for each group
+        df_report = fep.EPdrift_report(dFit=dFit)
+        self.msg.setText('Details about the curve fit ({}):\n'.format(fit_select) +
+                         '\n'.join(['group {}: χ2 = {:.2e}'.format(g, df_report.loc[g, 'chi-square'])
+                                    for g in df_report.index]))
+
     def close_windowSD(self):
         global grp_label, scaleEP
         results['EP adjusted'] = self.dataDC
@@ -5293,6 +5420,10 @@ class SalConvWindowO2(QDialog):
         else:
             salinity = sal.SalCon_Converter(temp_degC=float(self.temp_edit.text().strip()), M=0,
                                             cnd=float(self.cnd_edit.text()), p_dbar=10/1*float(self.atm_edit.text()))
+            # conductivity ratio below the zero salinity trap
+            if salinity != salinity:
+                self.sal_edit.setText('--')
+                return
             self.sal_edit.setText(str(round(salinity, 3)))
             results['salinity PSU'] = salinity
             results['temperature degC'] = float(self.temp_edit.text().strip())
@@ -5315,6 +5446,8 @@ class SalConvWindowO2(QDialog):
 # ---------------------------------------------------------------------------------------------------------------------
 if __name__ == '__main__':
     import sys
+    import multiprocessing
+    multiprocessing.freeze_support()    # worker processes (curve fitting) in the packaged application
 
     app = QtWidgets.QApplication(sys.argv)
     path = os.path.join(loc_path, 'Rootics.png')
@@ -0,0 +1,55 @@
+__author__ = 'Silvia E Zieger'
+__project__ = 'soil profile analysis'
+
+"""Copyright 2022. All rights reserved.
+
+This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+for any damages arising from the use of this software.
+Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter it
+and redistribute it freely, subject to the following restrictions:
+1. The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+   If you use this software in a product, an acknowledgment in the product documentation would be appreciated but is
+   not required
+2. Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software
+3. This notice may not be removed or altered from any source distribution.
+"""
+
+import matplotlib
+matplotlib.use('Agg')               # headless - no Qt window is opened
+import argparse
+import os
+
+import functions_batch as fbatch
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='rootics-batch',
+                                     description='Headless analysis of all Unisense measurement files (.xls) in a '
+                                                 'folder - SWI correction, calibration, penetration depth, total '
+                                                 'sulfide, EP drift correction, and export.')
+    parser.add_argument('folder', help='folder containing the measurement files')
+    parser.add_argument('-s', '--settings', default=None,
+                        help='settings file (json), e.g. {"temperature degC": 12.5, "salinity PSU": 30.1, '
+                             '"steps": 0.5, "lim": 150, "drift correction": "linear regression"}')
+    parser.add_argument('-o', '--output', default=None, help='storage path (default: <folder>/Rootics_batch)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    args = parser.parse_args()
+
+    # load settings and measurement files
+    dsettings = fbatch.load_settings(file=args.settings)
+    ls_file = fbatch.find_measurementFiles(folder=args.folder)
+    if len(ls_file) == 0:
+        print('no measurement file found in {}'.format(args.folder))
+        return
+    save_path = args.output if args.output else os.path.join(args.folder, 'Rootics_batch')
+    workers = args.workers if args.workers else dsettings['workers']
+
+    # process all files in parallel
+    print('processing {} measurement files...'.format(len(ls_file)))
+    dstatus = fbatch.run_batch(ls_file=ls_file, dsettings=dsettings, save_path=save_path, workers=workers)
+    nfail = len([f for f in dstatus.keys() if isinstance(dstatus[f], Exception)])
+    print('finished: {} processed, {} failed'.format(len(dstatus) - nfail, nfail))
+
+
+if __name__ == '__main__':
+    main()
@@ -225,11 +225,7 @@ def save_avProfiles(save_path, data, dav, dunit):
     savename = savename.split('.')[0] + '_avProfiles.xlsx'
 
     # actually saving DataFrame to excel
-    writer = pd.ExcelWriter(savename, options={'encoding':'utf-8'})
-    for key in dout_av.keys():
-        dout_av[key].to_excel(writer, sheet_name=key, engine='xlsxwriter')
-    writer.save()
-    writer.close()
+    dbs.write_sheets(dout=dout_av, savename=savename)
 
 
 # --------------------------------------------------------------------------------------------------------------------
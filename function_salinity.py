@@ -26,6 +26,7 @@ translation into Python by Silvia E. Zieger, 24-02-2022
 """
 
 import numpy as np
+import pandas as pd
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -88,50 +89,58 @@ def _Aconst(XT):
 
 # --------------------------------------------------------------------------------------------------------------------
 def SalCon_Converter(temp_degC, p_dbar, M, cnd):
+    """ Conversion of a single conductivity ratio into salinity (M=0) or of a salinity into conductivity ratio (M=1)
+    :param temp_degC:   temperature in degC
+    :param p_dbar:      pressure in dbar
+    :param M:           0 = conductivity ratio -> salinity; 1 = salinity -> conductivity ratio
+    :param cnd:         conductivity ratio (M=0) or salinity (M=1)
+    :return:            salinity / conductivity ratio; nan for values below the zero salinity / conductivity trap
     """
-
-    :param temp_degC:
-    :param p_dbar:
-    :param M:
-    :param cnd:
-    :return:
+    return float(SalCon_array(temp_degC=temp_degC, p_dbar=p_dbar, M=M, cnd=cnd))
+
+
+def SalCon_array(temp_degC, p_dbar, M, cnd, maxiter=10, tol=1e-4):
+    """ Vectorized PSS-78 conversion of arrays (e.g. CTD casts or temperature series). All inputs are broadcast against
+    each other; the Newton-Raphson inversion (M=1) runs over all elements at once until each element converged.
+    :param temp_degC:   temperature in degC
+    :param p_dbar:      pressure in dbar
+    :param M:           0 = conductivity ratio -> salinity; 1 = salinity -> conductivity ratio
+    :param cnd:         conductivity ratio (M=0) or salinity (M=1)
+    :param maxiter:     maximal number of Newton-Raphson iterations
+    :param tol:         convergence criterion for the salinity
+    :return:            array of salinity / conductivity ratio; nan for trapped or not converged elements
     """
-    # setting start conditions
-    SAL78 = 0
-
+    temp_degC, p_dbar, cnd = np.broadcast_arrays(np.asarray(temp_degC, dtype=float), np.asarray(p_dbar, dtype=float),
+                                                 np.asarray(cnd, dtype=float))
     # zero salinity / conductivity trap
-    if (M == 0 and cnd <= 5e-4) or (M == 1 and cnd <= 0.2):
-        exit()
+    trap = cnd <= 5e-4 if M == 0 else cnd <= 0.2
 
     # corrected temperature (introduced by Schulze)
     DT = temp_degC - 15
 
     # either calculate salinity (M=0) or conductivity (M=1)
-    if M == 0:
-        # convert conductivity to salinity
-        Res = cnd
-        RT_ = Res / (RT35(temp_degC) * (1.0 + _Cconst(p_dbar) / (_Bconst(temp_degC) + _Aconst(temp_degC) * Res)))
-        RT = np.sqrt(np.abs(RT_))
-
-        Sal78 = _salinity(RT, DT)
-    elif M == 1:
-        # invert salinity to conductivity by the Newton-Raphson iterative method
-        # first approximation
-        RT = np.sqrt(cnd / 35)
-        SI = _salinity(RT, DT)
-        N = 0
-
-        # iterative loop begins with a maximum of 10 cycles
-        ci = 0
-        while ci <= 10:
-            ci += 1
-            RT = RT + (cnd - SI) / _derivSAL(RT, DT)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if M == 0:
+            # convert conductivity to salinity
+            Res = cnd
+            RT_ = Res / (RT35(temp_degC) * (1.0 + _Cconst(p_dbar) / (_Bconst(temp_degC) + _Aconst(temp_degC) * Res)))
+            RT = np.sqrt(np.abs(RT_))
+
+            Sal78 = _salinity(RT, DT)
+        else:
+            # invert salinity to conductivity by the Newton-Raphson iterative method - first approximation
+            RT = np.sqrt(cnd / 35)
             SI = _salinity(RT, DT)
-            N += 1
-            DELS = np.abs(SI - cnd)
 
-            # if ((DELS.GT.1.0E-4) and (N.LT.10) go to 15 !!!TODO: check what that means
-            ci = 15 if (DELS < 1e-4) or (N >= 10) else 0
+            # iteration over all elements that did not converge yet
+            active = ~trap & np.isfinite(SI)
+            for n in range(maxiter):
+                if not active.any():
+                    break
+                RT = np.where(active, RT + (cnd - SI) / _derivSAL(RT, DT), RT)
+                SI = np.where(active, _salinity(RT, DT), SI)
+                active &= np.abs(SI - cnd) > tol
+            converged = np.abs(SI - cnd) <= tol
 
             # compute conductivity ratio
             RTT = RT35(temp_degC) * RT * RT
@@ -142,5 +151,21 @@ def SalCon_Converter(temp_degC, p_dbar, M, cnd):
             Res = np.sqrt(np.abs(BT * BT + 4 * _Aconst(temp_degC) * CP)) - BT
 
             # conductivity return
-            Sal78 = 0.5 * Res / _Aconst(temp_degC)
-    return Sal78
\ No newline at end of file
+            Sal78 = np.where(converged, 0.5 * Res / _Aconst(temp_degC), np.nan)
+    return np.where(trap, np.nan, Sal78)
+
+
+def SalCon_table(df, col_cnd, col_temp, col_p=None, M=0, p_dbar=10.1325):
+    """ PSS-78 conversion of DataFrame columns, e.g. a full CTD cast
+    :param df:          DataFrame containing conductivity ratio (M=0) or salinity (M=1), temperature and pressure
+    :param col_cnd:     column of conductivity ratio / salinity
+    :param col_temp:    column of the temperature in degC
+    :param col_p:       column of the pressure in dbar; if None, the constant p_dbar is used
+    :param M:           0 = conductivity ratio -> salinity; 1 = salinity -> conductivity ratio
+    :param p_dbar:      constant pressure in dbar (atmospheric pressure by default)
+    :return:            Series of salinity / conductivity ratio with the index of df
+    """
+    p = df[col_p].to_numpy(dtype=float) if col_p is not None else p_dbar
+    res = SalCon_array(temp_degC=df[col_temp].to_numpy(dtype=float), p_dbar=p, M=M,
+                       cnd=df[col_cnd].to_numpy(dtype=float))
+    return pd.Series(res, index=df.index, name='salinity PSU' if M == 0 else 'conductivity ratio')
@@ -20,6 +20,7 @@ import seaborn as sns
 import numpy as np
 import pandas as pd
 import os
+from functools import partial
 
 import functions_dbs as dbs
 
@@ -45,18 +46,15 @@ def load_EPdata(data, results, dcol_label, grp_label):
     # raw measurement file pre-processed and saved per default as rawData file
     if loadData is True:
         dsheets, dignore = dbs._loadGlobData(file_str=data, dcol_label=dcol_label)
-        l = [k for k in dignore.keys() if 'EP' in dignore[k].keys()][0]
 
         # pre-check whether EP_all in sheet names
         sheet_select = dbs.sheetname_check(dsheets, para='EP')
         checked = dbs.checkDatavsPara(sheet_select, par='EP')
 
         if checked is True:
-            # prepare file depending on the type
-            ddata = dsheets[sheet_select].set_index('Nr')
-
-            # remove excluded profiles
-            ddata_update = dbs._excludeProfiles(analyt='EP', dignore=dignore[l], ddata=ddata)
+            # prepare file depending on the type and remove excluded profiles
+            ddata_update = dbs._prepAnalyteData(dsheets=dsheets, dignore=dignore, sheet_select=sheet_select,
+                                                analyt='EP')
 
             if grp_label is None:
                 grp_label = ddata_update.columns[0]
@@ -72,15 +70,8 @@ def load_EPdata(data, results, dcol_label, grp_label):
                                                        dEP_core[c].keys()))), dEP_core.keys()))
             results['EP adjusted'] = dEP_core
 
-            # separate storage of raw data
-            results['EP raw data'] = dict()
-            for c in results['EP adjusted'].keys():
-                ddic = dict()
-                for i in results['EP adjusted'][c].keys():
-                    df_i = pd.DataFrame(np.array(results['EP adjusted'][c][i]), index=results['EP adjusted'][c][i].index,
-                                        columns=results['EP adjusted'][c][i].columns)
-                    ddic[i] = df_i
-                results['EP raw data'][c] = ddic
+            # separate storage of raw data (columnar, read-only)
+            results['EP raw data'] = dbs.ProfileTable(dprofiles=results['EP adjusted'])
             return checked, results, grp_label, ls_core, dEP_core, ls_colname
         else:
             return False, results, grp_label, None, None, None
@@ -89,54 +80,87 @@ def load_EPdata(data, results, dcol_label, grp_label):
 
 
 def load_additionalInfo(data):
-    # convert potential str-list into list of strings
-    if '[' in data:
-        ls_file = [i.strip()[1:-1] for i in data[1:-1].split(',')]
-    else:
-        ls_file = list(data)
-
-    # load excel sheet with all measurements
-    dic_sheets = dict()
-    for f in enumerate(ls_file):
-        dic_sheets_ = pd.read_excel(f[1], sheet_name=None)
-        # get the metadata and correlation sheets
-        df_meta = None
-        for c in dic_sheets_.keys():
-            if 'Meta' in c or 'meta' in c:
-                df_meta = dic_sheets_[c]
-        dic_sheets[f[0]] = dict({'meta data': df_meta})
-
-    # merge and double check duplicates (especially for pH-H2S correlation)
-    dsheets_add = dic_sheets[0]
-    for en in range(len(ls_file) - 1):
-        # get meta data info
-        if 'meta data' in dic_sheets[en + 1].keys():
-            dfmeta_sum = pd.concat([dsheets_add['meta data'], dic_sheets[en + 1]['meta data']], axis=0)
-        else:
-            dfmeta_sum = dsheets_add['meta data']
-
-        dsheets_add = dict({'meta data': dfmeta_sum})
+    # get the metadata from the session data set (no re-loading of the excel files)
+    df_meta = dbs.loadDataset(file_str=data)['meta data']
+    dsheets_add = dict({'meta data': df_meta.copy() if df_meta is not None else None})
     return dsheets_add
 
 
+def EPdrift_order(df_meta):
+    # group number -> list of (core, sample) measured in this group (time order)
+    df = df_meta[df_meta['EP'] > 0][['deployment', 'code', 'EP']]
+    dorder = dict(map(lambda n: (n, list([(int(t[1].split(' ')[-1]), t[0]) for t in df[df['EP'] == n].values])),
+                      list(dict.fromkeys(df['EP'].to_numpy()))))
+    return dorder
+
+
+def EPdrift_correction(dataEP, dorder, fit_select, numP=3, resultsEP=None, ls_group=None):
+    """ Drift correction of all groups at once - the regressions of all groups are solved together and the corrected
+    profiles replace the ones in resultsEP:
+    :param dataEP:      dictionary of cores with a dictionary of (uncorrected) EP profiles each
+    :param dorder:      group number -> list of (core, sample), see EPdrift_order
+    :param fit_select:  '2nd order polynomial fit' or 'linear regression' - for all groups or as dictionary per group
+    :param numP:        number of measurement points averaged at the top of each profile
+    :param resultsEP:   EP profiles to be corrected; a copy of dataEP is created if None
+    :param ls_group:    groups to correct (all groups by default)
+    :return:            corrected profiles, profile stack and fit results of each corrected group
+    """
+    # create a similar dictionary as EP adjusted
+    if resultsEP is None:
+        resultsEP = dict(map(lambda c: (c, dict(map(lambda s: (s, pd.DataFrame(np.array(dataEP[c][s]),
+                                                                                index=dataEP[c][s].index,
+                                                                                columns=dataEP[c][s].columns)),
+                                                    dataEP[c].keys()))), dataEP.keys()))
+    ls_group = list(dorder.keys()) if ls_group is None else ls_group
+    dfit_select = fit_select if isinstance(fit_select, dict) else dict(map(lambda g: (g, fit_select), ls_group))
+
+    # stack profiles of each group and fit the drift of all groups in one go
+    dataDP = dict(map(lambda nP: (nP, dbs._getProfileStack(nP=nP, dataEP=dataEP, dorder=dorder)), ls_group))
+    dydata = dict(map(lambda nP: (nP, dbs._driftAverage(dfP_=dataDP[nP][0], numP=numP)), ls_group))
+    ls_arg, chi_squared = dbs.driftFitBatch(ls_ydata=[dydata[nP] for nP in ls_group],
+                                            ls_fit=[dfit_select[nP] for nP in ls_group])
+
+    # actual correction of all profiles | target value - actual value
+    dFit = dict()
+    for en, nP in enumerate(ls_group):
+        ydata, arg = dydata[nP], ls_arg[en]
+        c = t = arg[-1] if np.isfinite(arg[-1]) else 0
+        corr_f = list(c - ydata - t)
+        dbs.applyDriftCorrection(dfP_=dataDP[nP][0], corr_f=corr_f, nP=nP, dorder=dorder, resultsEP=resultsEP)
+        dFit[nP] = dict({'average EP': list(ydata), 'regression curve': dbs.driftRegression(ydata=ydata, arg=arg),
+                         'chi-square': chi_squared[en], 'correction factor': corr_f,
+                         'regression': dfit_select[nP], 'fit parameter': arg})
+    return resultsEP, dataDP, dFit
+
+
+def EPdrift_report(dFit):
+    # goodness of fit of each corrected group
+    dreport = dict(map(lambda g: (g, dict({'regression': dFit[g]['regression'], 'profiles': len(dFit[g]['average EP']),
+                                           'chi-square': dFit[g]['chi-square'],
+                                           'fit parameter': ', '.join(['{:.2e}'.format(a)
+                                                                       for a in dFit[g]['fit parameter']])})),
+                       dFit.keys()))
+    df_report = pd.DataFrame(dreport, index=['regression', 'profiles', 'chi-square', 'fit parameter']).T
+    df_report.index.name = 'group'
+    return df_report
+
+
 def prepDataEPoutput(dout, results):
     # handle raw profiles to one dataframe results['raw data']
     if 'EP raw data' in results.keys():
-        dcore_raw = dict()
-        for c in results['EP raw data'].keys():
-            dcore_raw[c] = pd.concat(results['EP raw data'][c], axis=1)
-        dout['EP raw data'] = pd.concat(dcore_raw, axis=1)
+        dout['EP raw data'] = partial(dbs.frameProfiles, ddata=results['EP raw data'])
 
     # adjusted data
     if 'EP adjusted' in results.keys():
-        dcore_adj = dict()
-        for c in results['EP adjusted'].keys():
-            dcore_adj[c] = pd.concat(results['EP adjusted'][c], axis=1)
-        dout['EP adjusted'] = pd.concat(dcore_adj, axis=1)
+        dout['EP adjusted'] = partial(dbs.frameProfiles, ddata=results['EP adjusted'])
+
+    # goodness of fit of the drift correction
+    if 'EP drift correction' in results.keys() and len(results['EP drift correction']) > 0:
+        dout['EP drift correction'] = EPdrift_report(dFit=results['EP drift correction'])
     return dout
 
 
-def save_EPfigure(save_para, path_save, ls_core, results, dobj_hidEP, grp_label, scaleEP):
+def save_EPfigure(save_para, path_save, ls_core, results, dobj_hidEP, grp_label, scaleEP, progress=None):
     ls_saveFig = list()
     [ls_saveFig.append(i) for i in save_para.split(',') if 'fig' in i]
     if len(ls_saveFig) > 0:
@@ -150,71 +174,64 @@ def save_EPfigure(save_para, path_save, ls_core, results, dobj_hidEP, grp_label,
         if not os.path.exists(save_path):
             os.makedirs(save_path)
 
-        # generate images of all all samples (don't plot them)
-        [dfigRaw, dfigBase, dfigDC,
-         dfigFit] = fig4saving_EP(ls_core=ls_core, draw=results['EP raw data'], dadj=results['EP adjusted'],
-                                  ddrift=results['EP profile drift'], dfit=results['EP drift correction'],
-                                  dobj_hidEP=dobj_hidEP, results=results, grp_label=grp_label, scaleEP=scaleEP)
-
+        # describe the figures of all cores and groups - they are rendered in parallel afterwards
+        ls_spec = list()
         # individual profiles / drift corrections
         if 'fig raw' in ls_saveFig:
-            save_figraw(save_path=save_path, dfigRaw=dfigRaw)
+            ls_spec += spec_figraw(save_path=save_path, ls_core=ls_core, draw=results['EP raw data'],
+                                   dobj_hidEP=dobj_hidEP, grp_label=grp_label)
         if 'fig adjusted' in ls_saveFig:
-            save_figdepth(save_path=save_path, dfigBase=dfigBase)
+            ls_spec += spec_figdepth(save_path=save_path, ls_core=ls_core, dadj=results['EP adjusted'],
+                                     dobj_hidEP=dobj_hidEP, grp_label=grp_label, scaleEP=scaleEP)
         if 'fig fit' in ls_saveFig:
-            save_figFit(save_path=save_path, dfigFit=dfigFit)
-            save_figDC(save_path=save_path, dfigDC=dfigDC)
+            ls_spec += spec_figFit(save_path=save_path, ddrift=results['EP profile drift'], dadj=results['EP adjusted'],
+                                   dorder=results['EP order'])
+            ls_spec += spec_figDC(save_path=save_path, ddrift=results['EP profile drift'],
+                                  dfit=results['EP drift correction'])
+        dbs.render_figures(ls_spec=ls_spec, progress=progress)
 
 
-def save_figraw(save_path, dfigRaw):
+def _saveFolder(save_path, cfolder):
     # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='rawProfile', rlabel='run')
+    save_folder = dbs._actualFolderName(savePath=save_path, cfolder=cfolder, rlabel='run')
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
+    return save_folder
 
-    for f in dfigRaw.keys():
-        for t in ls_figtype:
-            name = save_folder + 'rawDepthprofile_core-{}.'.format(f) + t
-            dfigRaw[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
-
-
-def save_figdepth(save_path, dfigBase):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='DepthProfile', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
 
-    for f in dfigBase.keys():
-        for t in ls_figtype:
-            name = save_folder + 'Depthprofile_core-{}_adjusted.'.format(f) + t
-            dfigBase[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+def spec_figraw(save_path, ls_core, draw, dobj_hidEP, grp_label):
+    save_folder = _saveFolder(save_path=save_path, cfolder='rawProfile')
+    return [dbs.figure_spec(module=__name__, func='plot_initalProfile', dpi=dpi,
+                            files=[save_folder + 'rawDepthprofile_core-{}.'.format(c) + t for t in ls_figtype],
+                            data=draw, para='EP', unit='mV', core=c, ls='-.', col_name='EP_mV', show=False,
+                            ls_core=ls_core, dobj_hidEP=dobj_hidEP, trimexact=False, grp_label=grp_label, scaleEP=None,
+                            fs_=fs_*0.8) for c in ls_core]
 
 
-def save_figFit(save_path, dfigFit):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='DriftCorrect', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
+def spec_figdepth(save_path, ls_core, dadj, dobj_hidEP, grp_label, scaleEP):
+    save_folder = _saveFolder(save_path=save_path, cfolder='DepthProfile')
+    return [dbs.figure_spec(module=__name__, func='plot_initalProfile', dpi=dpi,
+                            files=[save_folder + 'Depthprofile_core-{}_adjusted.'.format(c) + t for t in ls_figtype],
+                            data=dadj, para='EP', unit='mV', core=c, ls='-', col_name='EP_mV', show=False,
+                            ls_core=ls_core, dobj_hidEP=dobj_hidEP, trimexact=False, grp_label=grp_label,
+                            scaleEP=scaleEP, fs_=fs_*0.8) for c in ls_core]
 
-    for f in dfigFit.keys():
-        for t in ls_figtype:
-            name = save_folder + 'DriftCorrect_group-{}.'.format(f) + t
-            dfigFit[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
 
+def spec_figFit(save_path, ddrift, dadj, dorder):
+    save_folder = _saveFolder(save_path=save_path, cfolder='DriftCorrect')
+    return [dbs.figure_spec(module=__name__, func='plot_driftGroup', dpi=dpi,
+                            files=[save_folder + 'DriftCorrect_group-{}.'.format(g) + t for t in ls_figtype],
+                            g=g, ddrift=ddrift, dadj=dadj, dorder=dorder) for g in ddrift.keys()]
 
-def save_figDC(save_path, dfigDC):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='CurveReg', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
 
-    for f in dfigDC.keys():
-        for t in ls_figtype:
-            name = save_folder + 'CurveReg_group-{}.'.format(f) + t
-            dfigDC[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=100)
+def spec_figDC(save_path, ddrift, dfit):
+    save_folder = _saveFolder(save_path=save_path, cfolder='CurveReg')
+    return [dbs.figure_spec(module=__name__, func='plot_curveReg', dpi=100,
+                            files=[save_folder + 'CurveReg_group-{}.'.format(g) + t for t in ls_figtype],
+                            g=g, dfit=dfit) for g in ddrift.keys() if g in dfit.keys()]
 
 
-def save_EPdata(path_save, save_params, dout, data, ls_allData):
+def save_EPdata(path_save, save_params, dout, data, ls_allData, progress=None):
     # make a project folder for the specific analyte if it doesn't exist
     save_path = path_save + '/EP_project/'
     if not os.path.exists(save_path):
@@ -233,7 +250,7 @@ def save_EPdata(path_save, save_params, dout, data, ls_allData):
         [dout.pop(i, None) for i in ls_removeKey]
 
         # save to excel sheets
-        dbs.save_rawExcel(dout=dout, file=data, savePath=save_path)
+        dbs.save_rawExcel(dout=dout, file=data, savePath=save_path, progress=progress)
 
 
 def cropDF_EP(s, ls_cropy, ddata, Core):
@@ -275,29 +292,39 @@ def fig4saving_EP(ls_core, draw, dadj, ddrift, dfit, dobj_hidEP, results, grp_la
 
     # profile drift for individual groups + curve fitting
     for g in ddrift.keys():
-        df, ax = plot_profileTime(nP=g, df_pack=ddrift[g][1], resultsEP=dadj, dorder=results['EP order'], show=False)
-        dfP2_ = [dadj[p[0]][p[1]].sort_index(ascending=True) for p in results['EP order'][g]]
-        ax.plot(pd.concat(dfP2_, axis=0)['EP_mV'].to_numpy(), color='darkorange', lw=1., label='corrected')
-        sns.despine()
-        dfigFit[g] = df
+        dfigFit[g] = plot_driftGroup(g=g, ddrift=ddrift, dadj=dadj, dorder=results['EP order'])
 
         # add legend for fit info to curve fitting plot
         if g in dfit.keys():
-            figR, axR = plot_Fit(df_reg=dfit[g]['regression curve'], ydata=dfit[g]['average EP'], figR=None, axR=None,
-                                 show=False)
-
-            ls_label = [('drift correction:', g), ('function:', dfit[g]['regression']),
-                        ('fit parameter:', dfit[g]['fit parameter']), ('χ2:', dfit[g]['chi-square'])]
-            xpos, ypos = (axR.get_xlim()[1] - axR.get_xlim()[0])*0.75, (axR.get_ylim()[1] - axR.get_ylim()[0])*0.9
-            for en, label in enumerate(ls_label):
-                axR.annotate(label, xy=(xpos, ypos-en*1/500), xytext=(0, 5), textcoords='offset points',
-                             ha='center', va='bottom', fontsize=12)
-            sns.despine()
-            dfigDC[g] = figR
+            dfigDC[g] = plot_curveReg(g=g, dfit=dfit)
 
     return dfigRaw, dfigBase, dfigDC, dfigFit
 
 
+def plot_driftGroup(g, ddrift, dadj, dorder):
+    # profile drift for an individual group including the corrected profiles
+    df, ax = plot_profileTime(nP=g, df_pack=ddrift[g][1], resultsEP=dadj, dorder=dorder, show=False)
+    dfP2_ = [dadj[p[0]][p[1]].sort_index(ascending=True) for p in dorder[g]]
+    ax.plot(pd.concat(dfP2_, axis=0)['EP_mV'].to_numpy(), color='darkorange', lw=1., label='corrected')
+    sns.despine()
+    return df
+
+
+def plot_curveReg(g, dfit):
+    # curve fitting of an individual group with legend for the fit info
+    figR, axR = plot_Fit(df_reg=dfit[g]['regression curve'], ydata=dfit[g]['average EP'], figR=None, axR=None,
+                         show=False)
+
+    ls_label = [('drift correction:', g), ('function:', dfit[g]['regression']),
+                ('fit parameter:', dfit[g]['fit parameter']), ('χ2:', dfit[g]['chi-square'])]
+    xpos, ypos = (axR.get_xlim()[1] - axR.get_xlim()[0])*0.75, (axR.get_ylim()[1] - axR.get_ylim()[0])*0.9
+    for en, label in enumerate(ls_label):
+        axR.annotate(label, xy=(xpos, ypos-en*1/500), xytext=(0, 5), textcoords='offset points',
+                     ha='center', va='bottom', fontsize=12)
+    sns.despine()
+    return figR
+
+
 def plot_profileTime(nP, df_pack, resultsEP, dorder, fig=None, ax=None, show=True):
     plt.ioff()
     # plot all profiles belonging to the same package
@@ -443,6 +470,20 @@ def plot_initalProfile(data, para, unit, col_name, core, ls_core, dobj_hidEP, gr
         fig.canvas.mpl_connect('pick_event', onpick)
 
     # update layout
+    ax.set_xlim(_scaleRange(data=data, col_name=col_name, core_select=core_select, scaleEP=scaleEP,
+                            trimexact=trimexact))
+    fig.tight_layout(pad=1.5)
+
+    if show is True:
+        fig.canvas.draw()
+    else:
+        sns.despine()
+        plt.close()
+    return fig, dobj_hidEP
+
+
+def _scaleRange(data, col_name, core_select, scaleEP, trimexact):
+    # x-range of the EP profile plot - individual scale of the core or range of all samples
     if scaleEP and core_select in scaleEP.keys():
         min_ = np.nanmin(scaleEP[core_select])
         max_ = np.nanmax(scaleEP[core_select])
@@ -452,15 +493,35 @@ def plot_initalProfile(data, para, unit, col_name, core, ls_core, dobj_hidEP, gr
     if trimexact is False:
         min_ = min_*1.5 if min_ < 0 else min_*0.95
         max_ = max_*1.05
-    ax.set_xlim(min_, max_)
-    fig.tight_layout(pad=1.5)
+    return min_, max_
 
-    if show is True:
-        fig.canvas.draw()
-    else:
-        sns.despine()
-        plt.close()
-    return fig, dobj_hidEP
+
+def browse_initalProfile(browser, data, para, unit, col_name, core, ls_core, dobj_hidEP, grp_label, fs_, ls='-.',
+                         scaleEP=None, trimexact=False, cache=None):
+    # fast update of the EP profiles when another core is selected (see dbs.ProfileBrowser); the plot data and range of
+    # each core are prepared once and re-used from the cache (dbs.PlotCache) as long as the core is not changed
+    if isinstance(core, float) or isinstance(core, int):
+        core = dbs._findCoreLabel(option1=core, option2='core ' + str(core), ls=ls_core)
+    core_select = dbs.closest_core(ls_core=ls_core, core=core)
+    if core_select == 0:
+        return plot_initalProfile(data=data, para=para, unit=unit, col_name=col_name, core=core, ls_core=ls_core,
+                                  dobj_hidEP=dobj_hidEP, grp_label=grp_label, fs_=fs_, ls=ls, scaleEP=scaleEP,
+                                  fig=browser.fig, ax=browser.ax, trimexact=trimexact)
+
+    cache = dbs.PlotCache() if cache is None else cache
+    ls_profile, xrange = cache.profiles(dcore=data[core_select], core=core_select, col=col_name)
+    if scaleEP and core_select in scaleEP.keys():
+        xrange = np.nanmin(scaleEP[core_select]), np.nanmax(scaleEP[core_select])
+    min_, max_ = xrange
+    if trimexact is False:
+        min_ = min_*1.5 if min_ < 0 else min_*0.95
+        max_ = max_*1.05
+
+    style = dict(ls=ls, lw=0.75 if ls == '-.' else 1.5, marker='.' if ls == '-.' else None, ms=6)
+    browser.show(core=core_select, title='{} depth profile for {} {}'.format(grp_label, para, core_select),
+                 ls_profile=ls_profile, frame=('{} / {}'.format(para, unit), 'Depth / µm', fs_), style=style,
+                 dhidden=dobj_hidEP, layout=partial(browser.fig.tight_layout, pad=1.5), xlim=(min_, max_))
+    return browser.fig, dobj_hidEP
 
 
 def plot_adjustEP(core, sample, col, dfCore, grp_label, fig=None, ax=None):
@@ -23,6 +23,7 @@ import numpy as np
 import pandas as pd
 import os
 import re
+from functools import partial
 
 import functions_dbs as dbs
 
@@ -38,34 +39,25 @@ coords = dict()
 ls_figtype = ['png', 'tiff']
 dpi = 300
 fs_ = 9
+dgrid_pH_H2S = dict()               # aligned pH / H2S depth grids of each sample pair (fingerprint of both profiles)
+grid_depth = 1.                     # aligned depth grid: step in µm, 'union' of the measured depths or 'H2S' depths
+grid_dtype = 'float64'              # storage of the aligned profiles and the total sulfide, e.g. 'float32'
+dK1 = dict()                        # dissociation constant K1 for each (temperature K, salinity)
+dbs.ls_sessionCache += [dgrid_pH_H2S, dK1]
 
 
 # --------------------------------------------------------------------------------------------------------------------
 def prepDataH2Soutput(dout, results):
-    # handle raw profiles to one dataframe results['raw data']
+    # handle raw profiles to one dataframe results['raw data'] - built when the sheet is written
     if 'H2S profile raw data' in results.keys():
-        dcore_raw = dict()
-        for c in results['H2S profile raw data'].keys():
-            dcore_raw[c] = pd.concat(results['H2S profile raw data'][c], axis=1)
-        dout['H2S profile raw data'] = pd.concat(dcore_raw, axis=1)
+        dout['H2S profile raw data'] = partial(dbs.frameProfiles, ddata=results['H2S profile raw data'])
 
-    # adjusted data
+    # adjusted data -> take the last column
     if 'H2S profile total sulfide' in results.keys():
-        dcore_tsulf = dict()
-        ddata = results['H2S profile total sulfide']
-        for c in ddata.keys():
-            # -> take the last column
-            col = ddata[c][list(ddata[c].keys())[0]].columns[-1]
-            df = pd.concat([ddata[c][s][col] for s in ddata[c].keys()], axis=1)
-            df.columns = ddata[c].keys()
-            dcore_tsulf[c] = df
-        dout['Depth profile total sulfide'] = pd.concat(dcore_tsulf, axis=1)
+        dout['Depth profile total sulfide'] = partial(dbs.frameColumn, ddata=results['H2S profile total sulfide'])
 
     if 'H2S adjusted' in results.keys():
-        dcore_swi = dict()
-        for c in results['H2S adjusted'].keys():
-            dcore_swi[c] = pd.concat(results['H2S adjusted'][c], axis=1)
-        dout['H2S adjusted'] = pd.concat(dcore_swi, axis=1)
+        dout['H2S adjusted'] = partial(dbs.frameProfiles, ddata=results['H2S adjusted'])
 
     # handle penetration depth - results['penetration depth']
     if 'H2S sulfidic front' in results.keys():
@@ -83,12 +75,15 @@ def prepDataH2Soutput(dout, results):
 
     # meta data
     dm = pd.DataFrame([results['temperature degC'], results['salinity PSU']], index=['temp degC', 'salinity PSU'])
-    df_meta1 = results['pH - H2S correlation']
-    colNew = df_meta1.columns
-    df_meta1.loc[0, :] = colNew
-    df_meta1.columns = np.arange(len(df_meta1.columns))
-    dmeta = pd.concat([dm, results['pH - H2S correlation']], axis=0, ignore_index=True)
-    dmeta.index = ['temp degC', 'salinity PSU', 'pH - H2S correlation'] + list(np.arange(len(df_meta1.index)-1))
+    if 'pH - H2S correlation' in results.keys() and results['pH - H2S correlation'] is not None:
+        df_meta1 = results['pH - H2S correlation']
+        colNew = df_meta1.columns
+        df_meta1.loc[0, :] = colNew
+        df_meta1.columns = np.arange(len(df_meta1.columns))
+        dmeta = pd.concat([dm, results['pH - H2S correlation']], axis=0, ignore_index=True)
+        dmeta.index = ['temp degC', 'salinity PSU', 'pH - H2S correlation'] + list(np.arange(len(df_meta1.index)-1))
+    else:
+        dmeta = dm
     dout['meta data'] = dmeta
     return dout
 
@@ -181,48 +176,93 @@ def correlationInfo(dsheets_add, dic_sheets, en, key):
     return dfcorrel_sum
 
 
-def _calcTotalSulfide(tempK, sal_pmill, coreh2s, sampleS, pH_coreS, dH2S_core):
-    coreh2s = int(coreh2s.split(' ')[1])
+def _calcK1(tempK, sal_pmill):
+    # pK1 equation - computed once for each temperature and salinity
+    if (tempK, sal_pmill) not in dK1.keys():
+        pK1 = -98.08 + (5765.4/tempK) + 15.04555*np.log(tempK) + -0.157*(sal_pmill**0.5) + 0.0135*sal_pmill
+        dK1[(tempK, sal_pmill)] = 10**(-pK1)
+    return dK1[(tempK, sal_pmill)]
 
-    # pK1 equation
+
+def _calcK1_profiles(ls_TS):
+    # pK1 equation for all (temperature K, salinity) pairs in one pass - fills the K1 lookup
+    ls_new = [ts for ts in dict.fromkeys(ls_TS) if ts not in dK1.keys()]
+    if len(ls_new) == 0:
+        return
+    tempK, sal_pmill = np.array(ls_new, dtype=float).T
     pK1 = -98.08 + (5765.4/tempK) + 15.04555*np.log(tempK) + -0.157*(sal_pmill**0.5) + 0.0135*sal_pmill
-    K1 = 10**(-pK1)
+    dK1.update(dict(zip(ls_new, 10**(-pK1))))
+
+
+def _calcTotalSulfide(tempK, sal_pmill, coreh2s, sampleS, pH_coreS, dH2S_core):
+    coreh2s = int(coreh2s.split(' ')[1])
+    K1 = _calcK1(tempK=tempK, sal_pmill=sal_pmill)
 
     # get appropriate column of H2S
+    col = None
     for c in dH2S_core[coreh2s][sampleS].columns:
         if 'M' in c or 'mol' in c:
             col = c
     d_H2S = dH2S_core[coreh2s][sampleS][col] if col else dH2S_core[coreh2s][sampleS]
 
-    # interpolate profiles to align data to the same index
-    df_interpol = H2S_pH_interpolation(pd.DataFrame(pH_coreS), pd.DataFrame(d_H2S))
+    # interpolate profiles to align data to the same index - aligned grid is re-used for each temperature / salinity
+    df_interpol = alignedGrid(pd.DataFrame(pH_coreS), pd.DataFrame(d_H2S)).copy()
 
     # generate total sulfide DF
-    df_interpol['total sulfide_µmol/L'] = df_interpol['H2S'] * (1 + (K1 / 10**(-df_interpol['pH'])))
+    ts = df_interpol['H2S'].to_numpy(dtype=float) * (1 + K1 * 10**df_interpol['pH'].to_numpy(dtype=float))
+    df_interpol['total sulfide_µmol/L'] = ts.astype(grid_dtype)
 
     # zero correction -> everything that is negative is set to 0
-    df_ = df_interpol['total sulfide_µmol/L'].copy()
-    df_[df_ < 0] = 0
-    df_interpol['total sulfide zero corr_µmol/L'] = df_
+    df_interpol['total sulfide zero corr_µmol/L'] = np.where(ts < 0, 0, ts).astype(grid_dtype)
     return df_interpol
 
 
-def H2S_pH_interpolation(pH_coreS, d_H2S):
+def alignedGrid(pH_coreS, d_H2S, grid=None, dtype=None):
+    # pH and H2S profile of a sample pair interpolated to the same depth grid; cached for each pair of profiles
+    grid, dtype = grid_depth if grid is None else grid, grid_dtype if dtype is None else dtype
+    key = dbs.fingerprint(pH_coreS, d_H2S, grid, dtype)
+    if key not in dgrid_pH_H2S.keys():
+        dgrid_pH_H2S[key] = H2S_pH_interpolation(pH_coreS=pH_coreS, d_H2S=d_H2S, grid=grid, dtype=dtype)
+    return dgrid_pH_H2S[key]
+
+
+def _depthGrid(pH_coreS, d_H2S, grid):
+    # aligned depth grid within the overlapping depth range of both profiles
+    start, stop = max(pH_coreS.index[0], d_H2S.index[0]), min(pH_coreS.index[-1], d_H2S.index[-1])
+    if grid == 'union':
+        depth = np.union1d(pH_coreS.index.to_numpy(dtype=float), d_H2S.index.to_numpy(dtype=float))
+    elif grid == 'H2S':
+        depth = np.unique(d_H2S.index.to_numpy(dtype=float))
+    else:
+        # fixed step - 1µm by default
+        return np.arange(start, stop + float(grid), float(grid))
+    return depth[(depth >= start) & (depth <= stop)]
+
+
+def _interpolate2grid(df, depth_interpol):
+    # linear interpolation of the valid data within the grid; constant after the last data point, nan before the first
+    xdata = df.index.to_numpy(dtype=float)
+    ydata = pd.to_numeric(df[df.columns[0]], errors='coerce').to_numpy(dtype=float)
+    valid = np.isfinite(ydata) & (xdata >= depth_interpol[0]) & (xdata <= depth_interpol[-1])
+    if valid.sum() == 0:
+        return np.full(len(depth_interpol), np.nan)
+    xdata, ydata = xdata[valid], ydata[valid]
+    ynew = np.interp(depth_interpol, xdata, ydata)
+    ynew[depth_interpol < xdata[0]] = np.nan
+    return ynew
+
+
+def H2S_pH_interpolation(pH_coreS, d_H2S, grid=None, dtype=None):
     # new index
-    depth_interpol = np.arange(max(pH_coreS.index[0], d_H2S.index[0]), min(pH_coreS.index[-1], d_H2S.index[-1]) + 1)
-    df_combo = pd.DataFrame(np.nan, index=depth_interpol, columns=['pH', 'H2S'])
-
-    # fill NaN values first with actual values, then by interpolation
-    col_pH, col_H2S = pH_coreS.columns[0], d_H2S.columns[0]
-    d_pH_crop = pH_coreS.loc[depth_interpol[0]:depth_interpol[-1]]
-    d_H2S_crop = d_H2S.loc[depth_interpol[0]:depth_interpol[-1]]
-    df_combo.loc[d_pH_crop.index, 'pH'] = d_pH_crop[col_pH].to_numpy()
-    df_combo.loc[d_H2S_crop.index, 'H2S'] = d_H2S_crop[col_H2S].to_numpy()
-    for col in df_combo:
-        df_combo[col] = pd.to_numeric(df_combo[col], errors='coerce')
-
-    # interpolate(method='linear')
-    df_interpol = df_combo.interpolate(method='linear').dropna()
+    grid, dtype = grid_depth if grid is None else grid, grid_dtype if dtype is None else dtype
+    depth_interpol = _depthGrid(pH_coreS=pH_coreS, d_H2S=d_H2S, grid=grid)
+    if len(depth_interpol) == 0:
+        return pd.DataFrame(columns=['pH', 'H2S'], dtype=dtype)
+
+    # interpolate(method='linear') of both profiles onto the new index
+    df_combo = pd.DataFrame({'pH': _interpolate2grid(df=pH_coreS, depth_interpol=depth_interpol),
+                             'H2S': _interpolate2grid(df=d_H2S, depth_interpol=depth_interpol)}, index=depth_interpol)
+    df_interpol = df_combo.dropna().astype(dtype)
     return df_interpol
 
 
@@ -264,15 +304,36 @@ def updateH2Sscale(H2Strim_edit, scaleh2s, scale_, Core):
     return scaleh2s, scale_
 
 
-def calc_total_sulfide(results, dH2S_core, tempC_edit, sal_edit, convC2K):
+def calc_total_sulfide(results, dH2S_core, tempC_edit, sal_edit, convC2K, dTS=None):
     # convert parameter
-    tempK, sal_pmill = float(tempC_edit.text()) + convC2K, float(sal_edit.text())
+    temp_degC, sal_pmill = float(tempC_edit.text()), float(sal_edit.text())
+    return calc_total_sulfide_TS(results=results, dH2S_core=dH2S_core, temp_degC=temp_degC, sal_pmill=sal_pmill,
+                                 convC2K=convC2K, dTS=dTS)
+
+
+def _profileTS(dTS, coreh2s, s, temp_degC, sal_pmill):
+    # temperature / salinity of the H2S profile as listed in the metadata - global values otherwise
+    key = (int(coreh2s.split(' ')[1]), int(s))
+    if dTS is None or key not in dTS.index:
+        return temp_degC, sal_pmill
+    return float(dTS.loc[key, 'temperature degC']), float(dTS.loc[key, 'salinity PSU'])
+
+
+def calc_total_sulfide_TS(results, dH2S_core, temp_degC, sal_pmill, convC2K, dTS=None, progress=None):
     df_corr = results['pH - H2S correlation']
 
     # get all cores of H2S profiles
     ls_coreH2S = list()
     [ls_coreH2S.append(l) for l in df_corr['H2S code'].to_numpy() if l not in ls_coreH2S]
 
+    # temperature (K) and salinity of each H2S profile (per deployment if given in dTS) -> K1 for all of them at once
+    dTS_h2s = dict()
+    for coreh2s in ls_coreH2S:
+        for s in df_corr[df_corr['H2S code'] == coreh2s]['H2S Nr'].to_numpy():
+            t, sal = _profileTS(dTS=dTS, coreh2s=coreh2s, s=s, temp_degC=temp_degC, sal_pmill=sal_pmill)
+            dTS_h2s[(coreh2s, s)] = (t + convC2K, sal)
+    _calcK1_profiles(ls_TS=list(dTS_h2s.values()))
+
     # calculate total sulfide
     dsulfide, n = dict(), 0
     for em, coreh2s in enumerate(ls_coreH2S):
@@ -283,16 +344,57 @@ def calc_total_sulfide(results, dH2S_core, tempC_edit, sal_edit, convC2K):
             # get the original pH profile
             pH_coreS = getOriginal_pH(corepH=df_corr.loc[n]['pH code'], sample=df_corr.loc[n]['pH Nr'], results=results)
 
-            # calculate total sulfide for specific core and sample according to associated pH profile
-            df = _calcTotalSulfide(coreh2s=coreh2s, sampleS=s, tempK=tempK, sal_pmill=sal_pmill, pH_coreS=pH_coreS,
-                                   dH2S_core=dH2S_core)
-            dsulfideS[s] = df
+            # calculate total sulfide for specific core and sample according to associated pH profile - only when
+            # the pH or H2S profile, temperature, salinity or the aligned depth grid changed since the last calculation
+            tempK, salS = dTS_h2s[(coreh2s, s)]
+            fp = dbs.fingerprint(pH_coreS, dH2S_core[int(coreh2s.split(' ')[1])][s], tempK, salS, grid_depth,
+                                 grid_dtype)
+            df = dbs.storedResult(product='H2S profile total sulfide', key=(coreh2s, s), fp=fp)
+            if df is None:
+                df = _calcTotalSulfide(coreh2s=coreh2s, sampleS=s, tempK=tempK, sal_pmill=salS,
+                                       pH_coreS=pH_coreS, dH2S_core=dH2S_core)
+                dbs.storeResult(product='H2S profile total sulfide', key=(coreh2s, s), fp=fp, result=df)
+            dsulfideS[s] = df.copy()
             n += 1
         dsulfide[coreh2s] = dsulfideS
+        if progress is not None:
+            progress(em + 1, len(ls_coreH2S), coreh2s)
 
     return dsulfide, results
 
 
+def sulfidicFront(results, threshold, dobj_hidH2S):
+    # identify data to use for the sulfidic front
+    label1, label2 = 'H2S total sulfide adjusted', 'H2S adjusted'
+    df_sulfFront = results[label1] if label1 in results.keys() else results[label2]
+    df_sFront = dict()
+    for coreS in df_sulfFront.keys():
+        ls_sample = list()
+        for en, s in enumerate(df_sulfFront[coreS].keys()):
+            df_, col = df_sulfFront[coreS][s], df_sulfFront[coreS][s].columns[-1]
+            sulFront = df_[col][df_[col] >= threshold]
+            if sulFront.empty:
+                ls_sample.append(np.nan)
+            else:
+                ls_sample.append(sulFront.index[0])
+        ind = ['sample '+str(i) for i in df_sulfFront[coreS].keys()]
+        dfCore = pd.DataFrame(ls_sample, index=ind, columns=['sulfidic front'])
+
+        # average when object not hidden
+        if coreS in dobj_hidH2S.keys():
+            smp_all = list(dfCore.index)
+            [smp_all.remove(i) for i in dobj_hidH2S[coreS] if i in smp_all]
+        else:
+            smp_all = list(dfCore.index)
+        if np.nanmean(dfCore.loc[smp_all]) >= 0:
+            dfCore.loc['mean', 'sulfidic front'] = np.nanmean(dfCore.loc[smp_all])
+        else:
+            dfCore.loc['mean', 'sulfidic front'] = 0
+        dfCore.loc['std', 'sulfidic front'] = np.nanstd(dfCore.loc[smp_all])
+        df_sFront[coreS] = dfCore
+    return df_sFront
+
+
 def select_h2sDF_core(core, results, dic_H2S, rawPlot, main=False, reset=False):
     if main is True:
         if 'H2S profile total sulfide' in results:
@@ -331,19 +433,14 @@ def load_H2Sdata(data, dcol_label, grp_label, results):
     # raw measurement file pre-processed and saved per default as rawData file
     if loadData is True:
         dsheets, dignore = dbs._loadGlobData(file_str=data, dcol_label=dcol_label)
-        for k in dignore.keys():
-            if 'H2S' in dignore[k].keys():
-                l = k
 
         # pre-check whether pH_all in sheet names
         sheet_select = dbs.sheetname_check(dsheets, para='H2S')
         checked = dbs.checkDatavsPara(sheet_select, par='H2S')
         if checked is True:
-            # prepare file depending on the type
-            ddata = dsheets[sheet_select].set_index('Nr')
-
-            # remove excluded profiles
-            ddata_update = dbs._excludeProfiles(analyt='H2S', dignore=dignore[l], ddata=ddata)
+            # prepare file depending on the type and remove excluded profiles
+            ddata_update = dbs._prepAnalyteData(dsheets=dsheets, dignore=dignore, sheet_select=sheet_select,
+                                                analyt='H2S')
 
             if grp_label is None:
                 grp_label = ddata_update.columns[0]
@@ -356,14 +453,8 @@ def load_H2Sdata(data, dcol_label, grp_label, results):
             label = 'H2S adjusted'
             results[label] = dH2S_core
 
-            # separate storage of raw data
-            results['H2S profile raw data'] = dict()
-            for c in results[label].keys():
-                ddic = dict()
-                for i in results[label][c].keys():
-                    ddic[i] = pd.DataFrame(np.array(results[label][c][i]), index=results[label][c][i].index,
-                                           columns=results[label][c][i].columns)
-                results['H2S profile raw data'][c] = ddic
+            # separate storage of raw data (columnar, read-only)
+            results['H2S profile raw data'] = dbs.ProfileTable(dprofiles=results[label])
             return checked, ls_core, results, ls_colname, dH2S_core, grp_label
         else:
             return False, None, results, None, None, grp_label
@@ -372,28 +463,15 @@ def load_H2Sdata(data, dcol_label, grp_label, results):
 
 
 def load_additionalInfo_h2s(data):
-    # convert potential str-list into list of strings
-    if '[' in data:
-        ls_file = [i.strip()[1:-1] for i in data[1:-1].split(',')]
-    else:
-        ls_file = list(data)
-
-    # load excel sheet with all measurements
-    dic_sheets = dict()
-    for f in enumerate(ls_file):
-        dic_sheets_ = pd.read_excel(f[1], sheet_name=None)
-        # get the metadata and correlation sheets
-        df_meta, df_correl = None, None
-        for c in dic_sheets_.keys():
-            if 'Meta' in c or 'meta' in c:
-                df_meta = dic_sheets_[c]
-            if 'Corr' in c or 'corr' in c:
-                df_correl = dic_sheets_[c]
-        dic_sheets[f[0]] = dict({'meta data': df_meta, 'pH - H2S correlation': df_correl})
+    # get the metadata and correlation sheets from the session data set (no re-loading of the excel files)
+    dfile = dbs.loadDataset(file_str=data)['data']
+    dic_sheets = dict(map(lambda f: (f, dict({'meta data': dfile[f]['meta data'],
+                                              'pH - H2S correlation': dfile[f]['pH - H2S correlation']})),
+                          dfile.keys()))
 
     # merge and double check duplicates (especially for pH-H2S correlation)
     dsheets_add = dic_sheets[0]
-    for en in range(len(ls_file) - 1):
+    for en in range(len(dic_sheets) - 1):
         # get meta data info
         if 'meta data' in dic_sheets[en + 1].keys():
             dfmeta_sum = pd.concat([dsheets_add['meta data'], dic_sheets[en + 1]['meta data']], axis=0)
@@ -407,6 +485,10 @@ def load_additionalInfo_h2s(data):
         else:
             dfcorrel_sum = dsheets_add['pH - H2S correlation']
         dsheets_add = dict({'meta data': dfmeta_sum, 'pH - H2S correlation': dfcorrel_sum})
+
+    # the session data set remains untouched
+    dsheets_add = dict(map(lambda k: (k, dsheets_add[k].copy() if dsheets_add[k] is not None else None),
+                           dsheets_add.keys()))
     return dsheets_add
 
 
@@ -456,7 +538,7 @@ def getOriginal_pH(results, corepH, sample):
     return pH_coreS
 
 
-def save_H2Sdata(save_path, save_para, data, ls_allData, dout):
+def save_H2Sdata(save_path, save_para, data, ls_allData, dout, progress=None):
     # make a project folder for the specific analyte if it doesn't exist
     save_path = save_path + '/H2S_project/'
     if not os.path.exists(save_path):
@@ -475,10 +557,10 @@ def save_H2Sdata(save_path, save_para, data, ls_allData, dout):
         [dout.pop(i, None) for i in ls_removeKey]
 
         # save to excel sheets
-        dbs.save_rawExcel(dout=dout, file=data, savePath=save_path)
+        dbs.save_rawExcel(dout=dout, file=data, savePath=save_path, progress=progress)
 
 
-def save_H2Sfigure(save_para, save_path, ls_core, grp_label, dunit, dobj_hidH2S, fs_, results):
+def save_H2Sfigure(save_para, save_path, ls_core, grp_label, dunit, dobj_hidH2S, fs_, results, progress=None):
     ls_saveFig = list()
     [ls_saveFig.append(i) for i in save_para.split(',') if 'fig' in i]
     if len(ls_saveFig) > 0:
@@ -492,57 +574,76 @@ def save_H2Sfigure(save_para, save_path, ls_core, grp_label, dunit, dobj_hidH2S,
         if not os.path.exists(save_path):
             os.makedirs(save_path)
 
-        # generate images of all all samples (don't plot them)
-        [dfigRaw, dfigBase,
-         dfigPen] = fig4saving_H2S(ls_core=ls_core, draw=results['H2S profile raw data'], dadj=results['H2S adjusted'],
-                                   grp_label=grp_label, dunit=dunit, fs_=fs_, dobj_hidH2S=dobj_hidH2S,
-                                   dsulFront=results['H2S sulfidic front'])
-
+        # describe the figures of all cores - they are rendered in parallel afterwards
+        ls_spec = list()
         # Depth profiles
         if 'fig raw' in ls_saveFig:
-            save_figraw(save_path=save_path, dfigRaw=dfigRaw)
+            ls_spec += spec_figraw(save_path=save_path, ls_core=ls_core, draw=results['H2S profile raw data'],
+                                   grp_label=grp_label, dunit=dunit, fs_=fs_)
         if 'fig adjusted' in ls_saveFig:
-            save_figdepth(save_path=save_path, dfigBase=dfigBase)
+            ls_spec += spec_figdepth(save_path=save_path, ls_core=ls_core, dadj=results['H2S adjusted'],
+                                     grp_label=grp_label, dunit=dunit, fs_=fs_, dobj_hidH2S=dobj_hidH2S)
         # Penetration depth
-        if 'fig penetration' in ls_saveFig:
-            if dfigPen:
-                save_figPen(save_path=save_path, dfigPen=dfigPen)
+        if 'fig penetration' in ls_saveFig and results['H2S sulfidic front']:
+            ls_spec += spec_figPen(save_path=save_path, ls_core=ls_core, dadj=results['H2S adjusted'],
+                                   grp_label=grp_label, dunit=dunit, fs_=fs_, dobj_hidH2S=dobj_hidH2S,
+                                   dsulFront=results['H2S sulfidic front'])
+        dbs.render_figures(ls_spec=ls_spec, progress=progress)
 
 
-def save_figraw(save_path, dfigRaw):
+def _saveFolder(save_path, cfolder):
     # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='rawProfile', rlabel='run')
+    save_folder = dbs._actualFolderName(savePath=save_path, cfolder=cfolder, rlabel='run')
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
+    return save_folder
 
-    for f in dfigRaw.keys():
-        for t in ls_figtype:
-            name = save_folder + 'rawDepthprofile_core-{}.'.format(f) + t
-            dfigRaw[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
 
+def spec_figraw(save_path, ls_core, draw, grp_label, dunit, fs_):
+    save_folder = _saveFolder(save_path=save_path, cfolder='rawProfile')
+    return [dbs.figure_spec(module=__name__, func='plot_H2SProfile', dpi=dpi,
+                            files=[save_folder + 'rawDepthprofile_core-{}.'.format(c) + t for t in ls_figtype],
+                            data_H2S=draw, core=c, ls_core=ls_core, scale=None, col='H2S_uM', dobj_hidH2S=None,
+                            ls='-.', show=False, trimexact=False, grp_label=grp_label, dunit=dunit, fs_=fs_)
+            for c in ls_core]
 
-def save_figdepth(save_path, dfigBase):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='DepthProfile', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
 
-    for f in dfigBase.keys():
-        for t in ls_figtype:
-            name = save_folder + 'Depthprofile_core-{}_adjusted.'.format(f) + t
-            dfigBase[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+def spec_figdepth(save_path, ls_core, dadj, grp_label, dunit, fs_, dobj_hidH2S):
+    save_folder = _saveFolder(save_path=save_path, cfolder='DepthProfile')
+    ls_spec = list()
+    for c in ls_core:
+        cC = dbs._findCoreLabel(option1=c, option2='core ' + str(c), ls=dadj)
+        s = list(dadj[cC].keys())
+        ls_spec.append(dbs.figure_spec(module=__name__, func='plot_H2SProfile', dpi=dpi,
+                                       files=[save_folder + 'Depthprofile_core-{}_adjusted.'.format(c) + t
+                                              for t in ls_figtype],
+                                       data_H2S=dadj, core=c, ls_core=ls_core, scale=None,
+                                       col=dadj[cC][s[0]].columns[-1], ls='-', show=False, dobj_hidH2S=dobj_hidH2S,
+                                       trimexact=False, grp_label=grp_label, dunit=dunit, fs_=fs_))
+    return ls_spec
+
 
+def spec_figPen(save_path, ls_core, dadj, grp_label, dunit, fs_, dobj_hidH2S, dsulFront):
+    save_folder = _saveFolder(save_path=save_path, cfolder='SulfidicFront')
+    return [dbs.figure_spec(module=__name__, func='plot_sulfidicFrontSave', dpi=dpi,
+                            files=[save_folder + 'SulfidicFront_core-{}.'.format(c) + t for t in ls_figtype],
+                            dadj=dadj, core=c, ls_core=ls_core, grp_label=grp_label, dunit=dunit, fs_=fs_,
+                            dobj_hidH2S=dobj_hidH2S, dsulFront=dsulFront) for c in ls_core]
 
-def save_figPen(save_path, dfigPen):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='SulfidicFront', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
 
-    for f in dfigPen.keys():
-        for t in ls_figtype:
-            name = save_folder + 'SulfidicFront_core-{}.'.format(f) + t
-            dfigPen[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+def plot_sulfidicFrontSave(dadj, core, ls_core, grp_label, dunit, fs_, dobj_hidH2S, dsulFront):
+    # sulfidic front in adjusted profile
+    cC = dbs._findCoreLabel(option1=core, option2='core ' + str(core), ls=dadj)
+    s = list(dadj[cC].keys())
+    df, ax, _ = plot_H2SProfile(data_H2S=dadj, core=core, ls_core=ls_core, scale=None, grp_label=grp_label,
+                                col=dadj[cC][s[0]].columns[-1], ls='-', show=False, dobj_hidH2S=dobj_hidH2S,
+                                trimexact=False, dunit=dunit, fs_=fs_)
+    cC = dbs._findCoreLabel(option1=core, option2='core ' + str(core), ls=dsulFront.keys())
+    ax.axhline(dsulFront[cC].loc['mean'].values[0], color='crimson', lw=0.75, ls=':')
+    ax.fill_betweenx([dsulFront[cC].loc['mean'].values[0] - dsulFront[cC].loc['std'].values[0],
+                      dsulFront[cC].loc['mean'].values[0] + dsulFront[cC].loc['std'].values[0]],
+                     ax.get_xlim()[0], ax.get_xlim()[1], lw=0, alpha=0.5, color='grey')
+    return df
 
 
 def fig4saving_H2S(ls_core, draw, dadj, grp_label, dunit, fs_, dobj_hidH2S, dsulFront=None):
@@ -562,17 +663,8 @@ def fig4saving_H2S(ls_core, draw, dadj, grp_label, dunit, fs_, dobj_hidH2S, dsul
     # sulfidic front in adjusted profile
     if dsulFront:
         for c in ls_core:
-            cC = dbs._findCoreLabel(option1=c, option2='core ' + str(c), ls=dadj)
-            s = list(dadj[cC].keys())
-            df, ax, _ = plot_H2SProfile(data_H2S=dadj, core=c, ls_core=ls_core, scale=None, grp_label=grp_label,
-                                        col=dadj[cC][s[0]].columns[-1], ls='-', show=False, dobj_hidH2S=dobj_hidH2S,
-                                        trimexact=False, dunit=dunit, fs_=fs_)
-            cC = dbs._findCoreLabel(option1=c, option2='core ' + str(c), ls=dsulFront.keys())
-            ax.axhline(dsulFront[cC].loc['mean'].values[0], color='crimson', lw=0.75, ls=':')
-            ax.fill_betweenx([dsulFront[cC].loc['mean'].values[0] - dsulFront[cC].loc['std'].values[0],
-                              dsulFront[cC].loc['mean'].values[0] + dsulFront[cC].loc['std'].values[0]],
-                             ax.get_xlim()[0], ax.get_xlim()[1], lw=0, alpha=0.5, color='grey')
-            dfigPen[c] = df
+            dfigPen[c] = plot_sulfidicFrontSave(dadj=dadj, core=c, ls_core=ls_core, grp_label=grp_label, dunit=dunit,
+                                                fs_=fs_, dobj_hidH2S=dobj_hidH2S, dsulFront=dsulFront)
 
     return dfigRaw, dfigBase, dfigPen
 
@@ -690,14 +782,7 @@ def plot_H2SProfile(data_H2S, core, ls_core, col, grp_label, dunit, dobj_hidH2S,
 
     # update layout
     if scale:
-        if trimexact is True:
-            min_ = -1 * scale[1] / 10 if scale[0] == 0 else scale[0]
-            scale_max = scale[1]
-        else:
-            min_ = -1 * scale[1] / 100 if scale[0] == 0 else scale[0] * 0.95
-            scale_max = scale[1] * 1.05
-        scale_min = min_ if min_ < -0.15 else -0.15
-        ax.set_xlim(scale_min, scale_max)
+        ax.set_xlim(_scaleRange(scale=scale, trimexact=trimexact))
         fig.subplots_adjust(bottom=0.2, right=0.95, top=0.85, left=0.15)
     else:
         x_ = ax.get_xlim()
@@ -714,6 +799,63 @@ def plot_H2SProfile(data_H2S, core, ls_core, col, grp_label, dunit, dobj_hidH2S,
     return fig, ax, dobj_hidH2S
 
 
+def _scaleRange(scale, trimexact):
+    # x-range of the H2S / total sulfide profile plot
+    if trimexact is True:
+        min_ = -1 * scale[1] / 10 if scale[0] == 0 else scale[0]
+        scale_max = scale[1]
+    else:
+        min_ = -1 * scale[1] / 100 if scale[0] == 0 else scale[0] * 0.95
+        scale_max = scale[1] * 1.05
+    scale_min = min_ if min_ < -0.15 else -0.15
+    return scale_min, scale_max
+
+
+def _profiles4plot(dcore, para):
+    # samples of a core as (label, x, y) arrays; H2S column if the selected parameter is not available
+    ls_profile = list()
+    for nr in list(dcore.keys())[:len(ls_col)]:
+        if para not in dcore[nr].columns:
+            para = dcore[nr].filter(like='H2S').columns[0]
+        df = dcore[nr][para].dropna()
+        ls_profile.append(('sample ' + str(nr), df.to_numpy(), df.index.to_numpy()))
+    return ls_profile
+
+
+def profileRange(ddata, col, cache):
+    # common x-range of the H2S profiles of all cores
+    return cache.xrange(ddata=ddata, col=col, build=partial(_profiles4plot, para=col))
+
+
+def browse_H2SProfile(browser, data_H2S, core, ls_core, col, grp_label, dunit, dobj_hidH2S, fs_, ls='-.', scale=None,
+                      trimexact=False, cache=None):
+    # fast update of the H2S / total sulfide profiles when another core is selected (see dbs.ProfileBrowser); the plot
+    # data of each core are prepared once and re-used from the cache (dbs.PlotCache) as long as the core is not changed
+    core_select = dbs.closest_core(ls_core=ls_core, core=core)
+    if core_select == 0 or not scale:
+        return plot_H2SProfile(data_H2S=data_H2S, core=core, ls_core=ls_core, col=col, grp_label=grp_label,
+                               dunit=dunit, dobj_hidH2S=dobj_hidH2S, fs_=fs_, ls=ls, scale=scale, fig=browser.fig,
+                               ax=browser.ax, trimexact=trimexact)
+    labCore = core_select if core_select in data_H2S.keys() else 'core ' + str(core_select)
+    lab = int(labCore.split(' ')[-1]) if isinstance(labCore, str) else labCore
+    s0 = list(data_H2S[labCore].keys())[0]
+    para = 'total sulfide zero corr_µmol/L'
+    para = para if para in data_H2S[labCore][s0].columns else col
+    unit = dunit['total sulfide'] if 'total sulfide' in dunit.keys() else dunit['H2S']
+    analyte = para.split('zero')[0].split('_')[0]
+
+    cache = dbs.PlotCache() if cache is None else cache
+    ls_profile = cache.profiles(dcore=data_H2S[labCore], core=lab, col=para,
+                                build=partial(_profiles4plot, para=para))[0]
+
+    style = dict(ls=ls, lw=.75 if ls == '-.' else 1.5, marker='.' if ls == '-.' else None)
+    browser.show(core=lab, title='{} depth profile for {} {}'.format(analyte, grp_label, core_select),
+                 ls_profile=ls_profile, frame=('{} / {}'.format(analyte, unit), 'Depth / µm', fs_ * 0.9), style=style,
+                 dhidden=dobj_hidH2S, xlim=_scaleRange(scale=scale, trimexact=trimexact),
+                 layout=partial(browser.fig.subplots_adjust, bottom=0.2, right=0.95, top=0.85, left=0.15))
+    return browser.fig, browser.ax, dobj_hidH2S
+
+
 def plot_H2SProfile_sample(data_H2S, core, sample, col, grp_label, dunit, dobj_hidH2S, fs_, ls='-.', scale=None,
                            fig=None, ax=None, show=True, trimexact=False):
     plt.ioff()
@@ -20,8 +20,8 @@ import seaborn as sns
 import numpy as np
 import pandas as pd
 from lmfit import Model
-from scipy import stats
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import functions_dbs as dbs
 
@@ -37,6 +37,8 @@ coords = dict()
 ls_figtype = ['png', 'tiff']
 dpi = 300
 fs_ = 9
+fit_workers = None                  # worker processes for the SWI fits; None = number of processors, 1 = serial
+fit_backend = 'lmfit'               # 'numpy' = batched Levenberg-Marquardt for all profiles, lmfit only as fallback
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -47,20 +49,15 @@ def load_O2data(data, grp_label, dcol_label):
     # raw measurement file pre-processed and saved per default as rawData file
     if loadData is True:
         dsheets, dignore = dbs._loadGlobData(file_str=data, dcol_label=dcol_label)
-        for k in dignore.keys():
-            if 'O2' in dignore[k].keys():
-                l = k
 
         # pre-check whether O2_all in sheet names
         sheet_select = dbs.sheetname_check(dsheets, para='O2')
         checked = dbs.checkDatavsPara(sheet_select, par='O2')
 
         if checked is True:
-            # prepare file depending on the type
-            ddata = dsheets[sheet_select].set_index('Nr')
-
-            # remove excluded profiles
-            ddata_update = dbs._excludeProfiles(analyt='O2', dignore=dignore[l], ddata=ddata)
+            # prepare file depending on the type and remove excluded profiles
+            ddata_update = dbs._prepAnalyteData(dsheets=dsheets, dignore=dignore, sheet_select=sheet_select,
+                                                analyt='O2')
 
             if grp_label is None:
                 grp_label = ddata_update.columns[0]
@@ -72,60 +69,76 @@ def load_O2data(data, grp_label, dcol_label):
         return None, None, False, grp_label
 
 
-def save_figraw(save_path, dfigRaw):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='rawProfile', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
+def save_O2data(save_path, save_params, data, ls_allData, dout, progress=None):
+    # make a project folder for the specific analyte if it doesn't exist
+    save_path = save_path + '/O2_project/'
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
 
-    for f in dfigRaw.keys():
-        for t in ls_figtype:
-            name = save_folder + 'rawDepthprofile_core-{}.'.format(f) + t
-            dfigRaw[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+    ls_saveData = list()
+    [ls_saveData.append(i) for i in save_params.split(',') if 'fig' not in i]
+    if len(ls_saveData) > 0:
+        # all keys that shall be removed
+        ls_removeKey = list()
+        [ls_removeKey.append(i) for i in ls_allData if i not in ls_saveData]
+        if 'fit_mV' in ls_removeKey:
+            ls_removeKey += ['derivative_mV', 'fit parameters']
 
+        # delete a keys not in that list regardless of whether it is in the dictionary
+        [dout.pop(i, None) for i in ls_removeKey]
 
-def save_figdepth(save_path, dfigBase):
+        # save to excel sheets
+        dbs.save_rawExcel(dout=dout, file=data, savePath=save_path, progress=progress)
+
+
+def _saveFolder(save_path, cfolder):
     # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='DepthProfile', rlabel='run')
+    save_folder = dbs._actualFolderName(savePath=save_path, cfolder=cfolder, rlabel='run')
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
+    return save_folder
 
-    for f in dfigBase.keys():
-        for t in ls_figtype:
-            name = save_folder + 'Depthprofile_core-{}_SWI_corrected.'.format(f) + t
-            dfigBase[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
 
+def spec_figraw(save_path, ls_core, draw, grp_label):
+    save_folder = _saveFolder(save_path=save_path, cfolder='rawProfile')
+    return [dbs.figure_spec(module=__name__, func='GUI_rawProfile', dpi=dpi,
+                            files=[save_folder + 'rawDepthprofile_core-{}.'.format(c) + t for t in ls_figtype],
+                            O2data=draw, core=c, show=False, ls_core=ls_core, grp_label=grp_label) for c in ls_core]
 
-def save_figFit(save_path, dfigFit):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='Fit', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
 
-    for f in dfigFit.keys():
-        for ff in dfigFit[f].keys():
-            for t in ls_figtype:
-                if isinstance(ff, tuple):
-                    name = save_folder + 'Fit_core-{}_sample-{}.'.format(f, ff[0]) + t
-                else:
-                    name = save_folder + 'Fit_core-{}_sample-{}.'.format(f, ff) + t
-                dfigFit[f][ff].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+def spec_figdepth(save_path, ls_core, ddata_shift, grp_label):
+    save_folder = _saveFolder(save_path=save_path, cfolder='DepthProfile')
+    return [dbs.figure_spec(module=__name__, func='GUI_baslineShift', dpi=dpi,
+                            files=[save_folder + 'Depthprofile_core-{}_SWI_corrected.'.format(c) + t
+                                   for t in ls_figtype],
+                            data_shift=ddata_shift, grp_label=grp_label, core=c, show=False, ls_core=ls_core,
+                            plot_col='mV') for c in ls_core]
 
 
-def save_figPen(save_path, dfigPen):
-    # find the actual running number
-    save_folder = dbs._actualFolderName(savePath=save_path, cfolder='PenetrationDepth', rlabel='run')
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
+def spec_figFit(save_path, ls_core, ddcore, dfit, deriv, dunit, grp_label):
+    save_folder = _saveFolder(save_path=save_path, cfolder='Fit')
+    ls_spec = list()
+    for c in ls_core:
+        for s in ddcore[c].keys():
+            s_ = s[0] if isinstance(s, tuple) else s
+            ls_spec.append(dbs.figure_spec(module=__name__, func='GUI_FitDepth', dpi=dpi,
+                                           files=[save_folder + 'Fit_core-{}_sample-{}.'.format(c, s_) + t
+                                                  for t in ls_figtype],
+                                           core=c, nr=s, dfCore=ddcore[c], dfFit=dfit[c], dfDeriv=deriv[c], dunit=dunit,
+                                           grp_label=grp_label, show=False))
+    return ls_spec
+
 
-    for f in dfigPen.keys():
-        for t in ls_figtype:
-            name = save_folder + 'PenetrationDepth_core-{}.'.format(f) + t
-            dfigPen[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+def spec_figPen(save_path, ls_core, dpen_glob, grp_label, dcore_pen, dO2_core, dobj_hid):
+    save_folder = _saveFolder(save_path=save_path, cfolder='PenetrationDepth')
+    return [dbs.figure_spec(module=__name__, func='GUI_penetration_av_save', dpi=dpi,
+                            files=[save_folder + 'PenetrationDepth_core-{}.'.format(c) + t for t in ls_figtype],
+                            core=c, ls_core=ls_core, dpen_glob=dpen_glob, grp_label=grp_label, dcore_pen=dcore_pen,
+                            dO2_core=dO2_core, dobj_hid=dobj_hid, fs_=fs_, show=False) for c in ls_core]
 
 
 def save_figure(save_params, path_save, analyte, ls_core, ddata_shift, dic_deriv, dcore_pen, results, dO2_core, dunit,
-                dobj_hid, grp_label, dpen_glob):
+                dobj_hid, grp_label, dpen_glob, progress=None):
     ls_saveFig = list()
     [ls_saveFig.append(i) for i in save_params.split(',') if 'fig' in i]
     if len(ls_saveFig) > 0:
@@ -139,25 +152,32 @@ def save_figure(save_params, path_save, analyte, ls_core, ddata_shift, dic_deriv
         if not os.path.exists(save_path):
             os.makedirs(save_path)
 
-        # generate images of all all samples (don't plot them)
-        [dfigRaw, dfigBase, dfigFit,
-         dfigPen] = figures4saving(ls_core=ls_core, draw=results['O2 raw data'], ddcore=results['O2 profile'],
-                                   deriv=dic_deriv, ddata_shift=ddata_shift, dfit=results['O2 fit'], dunit=dunit,
-                                   dcore_pen=dcore_pen, dO2_core=dO2_core, dobj_hid=dobj_hid, dpen_glob=dpen_glob,
-                                   grp_label=grp_label)
+        # averaged penetration depth (visible samples only) as updated when drawing the penetration figures
+        if dcore_pen:
+            for c in ls_core:
+                core_select = dbs.closest_core(ls_core=ls_core, core=c)
+                if core_select != 0:
+                    ls_remain = _supplPlot(core_select=core_select, dobj_hid=dobj_hid, dpen_glob=dpen_glob)
+                    dpen_glob = av_penetrationDepth(dpen_glob=dpen_glob, core_select=core_select,
+                                                    ls_remain=ls_remain)[0]
+
+        # describe the figures of all samples - they are rendered in parallel afterwards
+        ls_spec = list()
         # Depth profiles
-        if 'fig raw' in ls_saveFig:
-            save_figraw(save_path=save_path, dfigRaw=dfigRaw)
-        if 'fig adjusted' in ls_saveFig:
-            save_figdepth(save_path=save_path, dfigBase=dfigBase)
+        if 'fig raw' in ls_saveFig and results['O2 raw data']:
+            ls_spec += spec_figraw(save_path=save_path, ls_core=ls_core, draw=results['O2 raw data'],
+                                   grp_label=grp_label)
+        if 'fig adjusted' in ls_saveFig and ddata_shift:
+            ls_spec += spec_figdepth(save_path=save_path, ls_core=ls_core, ddata_shift=ddata_shift, grp_label=grp_label)
         # Fit profiles
-        if 'fig fit' in ls_saveFig:
-            if dfigFit:
-                save_figFit(save_path=save_path, dfigFit=dfigFit)
+        if 'fig fit' in ls_saveFig and results['O2 profile']:
+            ls_spec += spec_figFit(save_path=save_path, ls_core=ls_core, ddcore=results['O2 profile'],
+                                   dfit=results['O2 fit'], deriv=dic_deriv, dunit=dunit, grp_label=grp_label)
         # Penetration depth
-        if 'fig penetration' in ls_saveFig:
-            if dfigPen:
-                save_figPen(save_path=save_path, dfigPen=dfigPen)
+        if 'fig penetration' in ls_saveFig and dcore_pen:
+            ls_spec += spec_figPen(save_path=save_path, ls_core=ls_core, dpen_glob=dpen_glob, grp_label=grp_label,
+                                   dcore_pen=dcore_pen, dO2_core=dO2_core, dobj_hid=dobj_hid)
+        dbs.render_figures(ls_spec=ls_spec, progress=progress)
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -185,36 +205,466 @@ def _gompertz_curve_adv(x, a, b, c, d):
     return y
 
 
+def _gompertz_jacobian(params, data, weights, x, **kws):
+    """ Analytic jacobian of the lmfit residual (data - model) of both Gompertz curves (col_deriv=True):
+    :param params:  actual lmfit parameters a, b, c (and d for the advanced curve)
+    :param data:    measured data (not required for the derivatives)
+    :param weights: optional weights of the residual
+    :param x:       depth
+    :return:        array of the partial derivatives (parameter, x)
+    """
+    a, b, c = params['a'].value, params['b'].value, params['c'].value
+    x = np.asarray(x, dtype=float)
+    with np.errstate(over='ignore'):
+        # u*exp(-u) evaluated in one exponent - no inf*0 for large (b - c*x)
+        eu, ueu = np.exp(-1 * np.exp(b - c * x)), np.exp((b - c * x) - np.exp(b - c * x))
+    jac = [1 - eu, a * ueu, -a * x * ueu]
+    if 'd' in params.keys():
+        jac.append(-1 * np.ones(len(x)))
+    jac = np.array(jac)
+    if weights is not None:
+        jac = jac * weights
+    return jac
+
+
+# analytic jacobian for all Gompertz fits (Levenberg-Marquardt via leastsq)
+fit_kws = dict({'Dfun': _gompertz_jacobian, 'col_deriv': True})
+
+
+def _modelFit(model, ydata, para, xdata):
+    # fit with the analytic jacobian; finite differences if the jacobian is not finite along the way or if the fit
+    # did not move away from the start values
+    try:
+        res = model.fit(ydata, para, x=xdata, fit_kws=fit_kws)
+        if np.isfinite(res.chisqr) and any([res.params[p].value != para[p].value for p in para.keys()]):
+            return res
+    except ValueError:
+        pass
+    print('warning - fit with the analytic jacobian failed; fit is repeated with finite differences')
+    return model.fit(ydata, para, x=xdata)
+
+
+def check_fitBackends(ls_xdata, ls_ydata, adv, rtol=1e-3):
+    """ Consistency check of the Gompertz fits - sum of squares of the lmfit fit with analytic jacobian, with finite
+    differences and of the batched numpy fit for each profile:
+    :param ls_xdata:    list of depth arrays
+    :param ls_ydata:    list of O2 arrays
+    :param adv:         advanced Gompertz curve including the offset d
+    :param rtol:        relative tolerance of the sum of squares
+    :return:            DataFrame of the sum of squares and whether all fits agree
+    """
+    model = Model(_gompertz_curve_adv) if adv is True else Model(_gompertz_curve)
+    P, chisqr_batch, converged = fit_gompertzBatch(ls_xdata=ls_xdata, ls_ydata=ls_ydata, adv=adv)
+
+    dchisqr = dict()
+    for i, (x, y) in enumerate(zip(ls_xdata, ls_ydata)):
+        para = model.make_params(**_initialGuess(xdata=x, ydata=y, adv=adv))
+        res_jac = model.fit(np.asarray(y, dtype=float), para, x=np.asarray(x, dtype=float), fit_kws=fit_kws)
+        res_fd = model.fit(np.asarray(y, dtype=float), para, x=np.asarray(x, dtype=float))
+        dchisqr[i] = dict({'jacobian': res_jac.chisqr, 'finite differences': res_fd.chisqr,
+                           'batch': chisqr_batch[i] if converged[i] else np.nan})
+    df = pd.DataFrame(dchisqr).T
+    ref = df[['finite differences', 'batch']].min(axis=1)
+    df['consistent'] = (df[['jacobian', 'finite differences', 'batch']].sub(ref, axis=0).abs().max(axis=1, skipna=True)
+                        <= rtol * ref)
+    if not df['consistent'].all():
+        print('warning - Gompertz fits differ for profiles {}'.format(list(df.index[~df['consistent']])))
+    return df
+
+
+def _initialGuess(xdata, ydata, adv):
+    """ Data-driven initial parameters for the Gompertz curves:
+    :param xdata:   depth of the profile
+    :param ydata:   O2 signal / concentration of the profile
+    :param adv:     advanced Gompertz curve including the offset d
+    :return:        dictionary of the initial parameters
+    """
+    x, y = np.asarray(xdata, dtype=float), np.asarray(ydata, dtype=float)
+
+    # amplitude from the plateaus in the water column (top) and in the sediment (bottom)
+    top, bottom = y[:3].mean(), y[-3:].mean()
+    d = bottom if adv is True else 0.
+    a = bottom - top if adv is True else -top
+
+    # the normalised curve f = exp(-exp(b - c*x)) crosses 1/e at the inflection (b = c*x) and the 20% / 80% levels
+    # (1.976/c apart) - crossings of the smoothed profile are robust to noise and uneven spacing
+    b, c = .001, .001
+    if len(x) > 4 and a != 0:
+        order = np.argsort(x)
+        xs = x[order]
+        f = np.convolve((y[order] - top) / a, np.ones(3) / 3, mode='same')
+        f[0], f[-1] = (y[order][0] - top) / a, (y[order][-1] - top) / a
+        x20, xe, x80 = [_levelCrossing(x=xs, f=f, level=l) for l in [0.2, 1 / np.e, 0.8]]
+        if None not in [x20, xe, x80] and x80 > x20:
+            c_ = (np.log(-np.log(0.2)) - np.log(-np.log(0.8))) / (x80 - x20)
+            # plausible start values only - slope resolvable by the data and inflection within the profile
+            if np.isfinite(c_) and 0 < c_ * (xs[-1] - xs[0]) < 10 * len(xs) and xs[0] <= xe <= xs[-1]:
+                b, c = c_ * xe, c_
+
+    dpara = dict({'a': a, 'b': b, 'c': c})
+    if adv is True:
+        dpara['d'] = d
+    return dpara
+
+
+def _levelCrossing(x, f, level):
+    # depth where the (increasing) normalised profile first reaches the level - linear interpolation
+    n = np.flatnonzero(f >= level)
+    if len(n) == 0 or n[0] == 0:
+        return None
+    k = n[0]
+    return x[k - 1] + (level - f[k - 1]) * (x[k] - x[k - 1]) / (f[k] - f[k - 1])
+
+
+def _gompertzBatch_residual(P, X, Y, W, adv):
+    # residual (model - data) and jacobian of all padded profiles; padded points are masked by W
+    a, b, c = P[:, 0:1], P[:, 1:2], P[:, 2:3]
+    with np.errstate(over='ignore', invalid='ignore'):
+        eu, ueu = np.exp(-1 * np.exp(b - c * X)), np.exp((b - c * X) - np.exp(b - c * X))
+        f = a * (eu - 1) + P[:, 3:4] if adv is True else a * (eu - 1)
+        ls_jac = [eu - 1, -a * ueu, a * X * ueu]
+    if adv is True:
+        ls_jac.append(np.ones(X.shape))
+    r = np.where(W, f - Y, 0.)
+    J = np.where(W[:, :, None], np.stack(ls_jac, axis=2), 0.)
+    return r, J
+
+
+def fit_gompertzBatch(ls_xdata, ls_ydata, adv, maxiter=200, ftol=1.49012e-08, xtol=1.49012e-08, gtol=1e-8,
+                      lam_conv=1e-2):
+    """ Batched Levenberg-Marquardt fit of the Gompertz curve to many profiles at once. Profiles of different length
+    are padded into 2-D arrays and masked, all iterations are done simultaneously in numpy:
+    :param ls_xdata:    list of depth arrays
+    :param ls_ydata:    list of O2 arrays
+    :param adv:         advanced Gompertz curve including the offset d
+    :param maxiter:     maximal number of iterations
+    :param ftol:        relative tolerance of the sum of squares (as in scipy's leastsq)
+    :param xtol:        relative tolerance of the parameters (as in scipy's leastsq)
+    :param gtol:        orthogonality between residuals and jacobian columns (gradient test as in scipy's leastsq)
+    :param lam_conv:    maximal damping at which a stagnating step counts as converged - with a large damping the
+                        steps are tiny without being close to the minimum
+    :return:            fitted parameters (profiles, parameters), sum of squares, converged profiles
+    """
+    ls_para = ['a', 'b', 'c', 'd'] if adv is True else ['a', 'b', 'c']
+    nprof, npoint, npara = len(ls_xdata), max([len(x) for x in ls_xdata]), len(ls_para)
+
+    # padding of all profiles
+    X, Y, W = np.zeros(shape=(nprof, npoint)), np.zeros(shape=(nprof, npoint)), np.zeros(shape=(nprof, npoint),
+                                                                                           dtype=bool)
+    P = np.zeros(shape=(nprof, npara))
+    for i, (x, y) in enumerate(zip(ls_xdata, ls_ydata)):
+        X[i, :len(x)], Y[i, :len(y)], W[i, :len(x)] = x, y, True
+        dguess = _initialGuess(xdata=x, ydata=y, adv=adv)
+        P[i] = [dguess[p] for p in ls_para]
+
+    r, J = _gompertzBatch_residual(P=P, X=X, Y=Y, W=W, adv=adv)
+    chisqr = (r**2).sum(axis=1)
+    lam = np.full(nprof, 1e-3)
+    active, converged = np.isfinite(chisqr), np.zeros(nprof, dtype=bool)
+    for i in range(maxiter):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+
+        # damped normal equations (Marquardt scaling) for all active profiles
+        JtJ = np.einsum('nmp,nmq->npq', J[idx], J[idx])
+        g = np.einsum('nmp,nm->np', J[idx], r[idx])
+        D = np.eye(npara) * (JtJ.diagonal(axis1=1, axis2=2)[:, None, :] + 1e-12)
+        A = JtJ + lam[idx, None, None] * D
+        try:
+            delta = np.linalg.solve(A, -g[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            delta = np.einsum('npq,nq->np', np.linalg.pinv(A), -g)
+
+        # accept the step only where the sum of squares decreases
+        P_new = P[idx] + delta
+        r_new, J_new = _gompertzBatch_residual(P=P_new, X=X[idx], Y=Y[idx], W=W[idx], adv=adv)
+        chisqr_new = (r_new**2).sum(axis=1)
+        better = np.isfinite(chisqr_new) & (chisqr_new <= chisqr[idx])
+
+        # actual and predicted reduction of the sum of squares (linearised model) or a vanishing parameter step ...
+        pred = -2 * np.einsum('np,np->n', g, delta) - np.einsum('np,npq,nq->n', delta, JtJ, delta)
+        stagnant = ((((chisqr[idx] - chisqr_new) <= ftol * chisqr[idx]) & (pred <= ftol * chisqr[idx])) |
+                    (np.abs(delta).max(axis=1) <= xtol * (np.abs(P[idx]).max(axis=1) + xtol)))
+        # ... counts only close to the Gauss-Newton step or when the gradient vanishes (residuals orthogonal to J)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gcos = np.abs(np.einsum('nmp,nm->np', J_new, r_new)) / (np.sqrt((J_new**2).sum(axis=1)) *
+                                                                     np.sqrt(chisqr_new)[:, None])
+        gsmall = np.nan_to_num(gcos, nan=0.).max(axis=1) <= gtol
+        conv = better & ((stagnant & (lam[idx] <= lam_conv)) | gsmall)
+        ib = idx[better]
+        P[ib], r[ib], J[ib], chisqr[ib] = P_new[better], r_new[better], J_new[better], chisqr_new[better]
+        lam[idx] = np.where(better, lam[idx] / 10, lam[idx] * 10)
+
+        # stop converged profiles as well as those where the damping exploded
+        converged[idx[conv]] = True
+        active[idx[conv | (lam[idx] > 1e10)]] = False
+    return P, chisqr, converged
+
+
+class FitResult:
+    """ Lightweight fit result - only the fit parameters and statistics are kept (no copies of data, residuals or best
+    fit as in the lmfit ModelResult). Provides the attributes and methods of the ModelResult used in Rootics (params,
+    chisqr, redchi, plot, fit_report).
+    :param params:  lmfit Parameters of the fit
+    :param chisqr:  sum of squared residuals
+    :param ndata:   number of data points
+    :param model:   lmfit Model of the fit (curve function)
+    :param method:  fit method
+    """
+    def __init__(self, params, chisqr, ndata, model=None, method='batched leastsq'):
+        self.params, self.chisqr, self.ndata = params, chisqr, ndata
+        self.nvarys = len(params)
+        self.nfree = ndata - self.nvarys
+        self.redchi = chisqr / self.nfree if self.nfree > 0 else np.nan
+        self.success, self.method = True, method
+        self.func = model.func if model is not None else (_gompertz_curve_adv if 'd' in params.keys()
+                                                          else _gompertz_curve)
+        self.xdata, self.ydata = None, None
+
+    @classmethod
+    def fromModelResult(cls, res, xdata=None, ydata=None):
+        # compress a lmfit ModelResult; the fitted data are kept (as references) for plot()
+        fit = cls(params=res.params, chisqr=res.chisqr, ndata=res.ndata, model=res.model, method=res.method)
+        fit.success, fit.xdata, fit.ydata = res.success, xdata, ydata
+        return fit
+
+    def eval(self, x):
+        return self.func(np.asarray(x, dtype=float), **dict(map(lambda p: (p, self.params[p].value),
+                                                               self.params.keys())))
+
+    def fit_report(self):
+        ls_line = ['[[Model]]', '    Model({})'.format(self.func.__name__), '[[Fit Statistics]]',
+                   '    # fitting method   = {}'.format(self.method), '    # data points      = {}'.format(self.ndata),
+                   '    # variables        = {}'.format(self.nvarys),
+                   '    chi-square         = {:.8g}'.format(self.chisqr),
+                   '    reduced chi-square = {:.8g}'.format(self.redchi), '[[Variables]]']
+        for p in self.params.keys():
+            stderr = self.params[p].stderr
+            ls_line.append('    {}: {:.8g}'.format(p, self.params[p].value) +
+                           (' +/- {:.8g}'.format(stderr) if stderr is not None else ''))
+        return '\n'.join(ls_line)
+
+    def plot(self, fig=None):
+        # residuals (top) and data with the best fit (bottom) as lmfit ModelResult.plot
+        fig = plt.figure() if fig is None else fig
+        gs = fig.add_gridspec(2, 1, height_ratios=[1, 4])
+        ax_res, ax = fig.add_subplot(gs[0]), fig.add_subplot(gs[1])
+        if self.xdata is not None:
+            x, y = np.asarray(self.xdata, dtype=float), np.asarray(self.ydata, dtype=float)
+            xnew = np.linspace(x.min(), x.max(), num=5*len(x))
+            ax_res.plot(x, self.eval(x) - y, 'o', ms=3)
+            ax_res.axhline(0, color='k', lw=0.5)
+            ax.plot(x, y, 'o', ms=3, label='data')
+            ax.plot(xnew, self.eval(xnew), '-', label='best fit')
+            ax.legend()
+        ax_res.set_ylabel('residuals'), ax.set_xlabel('x'), ax.set_ylabel('y')
+        return fig
+
+
+class GompertzFit:
+    """ Result of the Gompertz fit of a depth profile. The fit parameters are the stored result; the point of
+    inflection (x = b/c), slope and curvature are given in closed form and the fit curve and its derivatives are
+    evaluated on a depth grid whenever they are requested.
+    :param res:     fit result (FitResult or lmfit ModelResult) of the curve fit
+    :param xdata:   depth of the fitted profile
+    :param steps:   default resolution of the depth grid for the curves
+    :param adv:     advanced Gompertz curve including the offset d
+    """
+    def __init__(self, res, xdata, steps, adv):
+        self.res, self.steps, self.adv = res, steps, adv
+        self.arg = [res.params[p].value for p in res.params.keys()]
+        self.xrange = (xdata[0], xdata[-1])
+
+    def __getitem__(self, i):
+        # compatible to the former (res, df_fit, xshift) tuple
+        if i == 0:
+            return self.res
+        elif i == 1:
+            return self.curve
+        elif i == 2:
+            return self.inflection
+        raise IndexError(i)
+
+    @property
+    def params(self):
+        return dict(zip(['a', 'b', 'c', 'd'], self.arg))
+
+    @property
+    def inflection(self):
+        return self.arg[1] / self.arg[2]
+
+    @property
+    def slope(self):
+        return self.derivative(x=self.inflection, order=1)
+
+    @property
+    def curvature(self):
+        return self.derivative(x=self.inflection, order=2)
+
+    def derivative(self, x, order=1):
+        # analytic derivatives: y' = a*c*u*exp(-u), y'' = -a*c^2*u*exp(-u)*(1-u) with u = exp(b-c*x)
+        a, b, c = self.arg[:3]
+        u = np.exp(b - c * np.asarray(x, dtype=float))
+        if order == 1:
+            return a * c * u * np.exp(-u)
+        return -a * c**2 * u * np.exp(-u) * (1 - u)
+
+    def depth_grid(self, steps=None):
+        steps = self.steps if steps is None else steps
+        return np.linspace(self.xrange[0], self.xrange[1], num=int((self.xrange[1] - self.xrange[0]) / steps + 1))
+
+    def fit_curve(self, steps=None):
+        xnew = self.depth_grid(steps=steps)
+        if self.adv is True:
+            yfit = _gompertz_curve_adv(x=xnew, a=self.arg[0], b=self.arg[1], c=self.arg[2], d=self.arg[3])
+        else:
+            yfit = _gompertz_curve(x=xnew, a=self.arg[0], b=self.arg[1], c=self.arg[2])
+        return pd.DataFrame(yfit, index=xnew)
+
+    @property
+    def curve(self):
+        return self.fit_curve()
+
+    def derivative_curve(self, order=1, steps=None):
+        xnew = self.depth_grid(steps=steps)
+        return pd.DataFrame(self.derivative(x=xnew, order=order), index=xnew)
+
+    @property
+    def derivatives(self):
+        return _DerivativeCurves(fit=self)
+
+
+class _DerivativeCurves:
+    # lazy (1st derivative, 2nd derivative) pair of a Gompertz fit
+    def __init__(self, fit):
+        self.fit = fit
+
+    def __getitem__(self, i):
+        if i not in [0, 1]:
+            raise IndexError(i)
+        return self.fit.derivative_curve(order=i + 1)
+
+    def __len__(self):
+        return 2
+
+
 # --------------------------------------------------------------------------------------------------------------------
+def _stackProfiles(data_shift, col=None):
+    """ Stack the profiles of all samples of all cores into flat arrays (long format):
+    :param data_shift:  dictionary of cores with a dictionary of sample profiles each
+    :param col:         column to stack; first column of each profile if None
+    :return:            keys (core, sample) of the profiles, group code per row, depth, values
+    """
+    ls_key, ls_depth, ls_val = list(), list(), list()
+    for core in data_shift.keys():
+        for s in data_shift[core].keys():
+            df = pd.DataFrame(data_shift[core][s])
+            ls_key.append((core, s))
+            ls_depth.append(df.index.to_numpy(dtype=float))
+            ls_val.append((df[col] if col is not None else df[df.columns[0]]).to_numpy(dtype=float))
+    codes = np.repeat(np.arange(len(ls_key)), [len(d) for d in ls_depth])
+    if len(ls_key) == 0:
+        return ls_key, codes, np.array([]), np.array([])
+    return ls_key, codes, np.concatenate(ls_depth), np.concatenate(ls_val)
+
+
+def _windowStats(codes, depth, val, xcenter, lim, ngroup):
+    # number of points as well as mean and standard deviation (ddof=1) within +/- lim around the center of each profile
+    inwin = np.abs(depth - xcenter[codes]) <= lim[codes]
+    nrow = np.bincount(codes, weights=inwin, minlength=ngroup)
+    inwin &= np.isfinite(val)
+    n = np.bincount(codes, weights=inwin, minlength=ngroup)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(codes, weights=np.where(inwin, val, 0.), minlength=ngroup) / n
+        ss = np.bincount(codes, weights=np.where(inwin, (val - mean[codes])**2, 0.), minlength=ngroup)
+        std = np.where(n > 1, np.sqrt(ss / (n - 1)), np.nan)
+    return nrow, mean, std
+
+
+def _extremeDepth(codes, depth, val, ngroup, func):
+    # depth of the maximal (idxmax) / minimal (idxmin) value of each profile
+    df = pd.DataFrame({'code': codes, 'val': val}).dropna()
+    idx = df.groupby('code')['val'].agg(func)
+    xext = np.full(ngroup, np.nan)
+    xext[idx.index.to_numpy()] = depth[idx.to_numpy()]
+    return xext
+
+
+def potentialLimits(data_shift, lim, lim_min):
+    """ Minimal and maximal potential of all samples of all cores in one windowed reduction:
+    :param data_shift:  dictionary of cores with a dictionary of sample profiles each
+    :param lim:         depth window around the maximal potential
+    :param lim_min:     depth window around the minimal potential
+    :return:            dictionary of cores with the averaged potential limits (index mean/std, columns max/min)
+    """
+    ls_key, codes, depth, val = _stackProfiles(data_shift=data_shift)
+    ngroup = len(ls_key)
+    core_codes = pd.Series([k[0] for k in ls_key])
+
+    dpot = dict()
+    for lab, func, lim_, lim_fallback in [('max', 'idxmax', lim, 200), ('min', 'idxmin', np.abs(lim_min), 50)]:
+        xcenter = _extremeDepth(codes=codes, depth=depth, val=val, ngroup=ngroup, func=func)
+
+        # too narrow windows (< 3 points) are widened - for this and all following samples of the core
+        n, _, _ = _windowStats(codes=codes, depth=depth, val=val, xcenter=xcenter, lim=np.full(ngroup, lim_),
+                               ngroup=ngroup)
+        widen = pd.Series(n < 3).groupby(core_codes, sort=False).cumsum().to_numpy() > 0
+        n, mean, std = _windowStats(codes=codes, depth=depth, val=val, xcenter=xcenter,
+                                    lim=np.where(widen, lim_fallback, lim_), ngroup=ngroup)
+        if lab == 'min':
+            # update nan by 0 for minimal potential
+            mean, std = np.nan_to_num(mean, nan=0.), np.nan_to_num(std, nan=0.)
+        dpot[(lab, 'mean')], dpot[(lab, 'std')] = mean, std
+
+    # averaged min/max potential of all samples of each core
+    dfpot = pd.DataFrame(dpot, index=pd.MultiIndex.from_tuples(ls_key)).groupby(level=0, sort=False).mean()
+    dpot_av = dict()
+    for core in dfpot.index:
+        pot_av = pd.DataFrame([[dfpot.loc[core, ('max', 'mean')], dfpot.loc[core, ('min', 'mean')]],
+                               [dfpot.loc[core, ('max', 'std')], dfpot.loc[core, ('min', 'std')]]],
+                              index=['mean', 'std'], columns=['max', 'min'])
+        dpot_av[core] = pot_av
+    return dpot_av
+
+
 def findPotentialLimits(df, lim, lim_min):
     # for all samples in selected core - find (absolute) minima/maxima potential
-    dpot = dict()
-    for s in df.keys():
-        # maximal O2 concentration - potential for selected core
-        df[s] = pd.DataFrame(df[s]).astype(float)
-        idxmax = df[s].idxmax()[0]
-        if len(df[s].loc[idxmax - lim:idxmax + lim]) < 3:
-            lim = 200
-        pot_max = (df[s].loc[idxmax - lim:idxmax + lim].mean()[0], df[s].loc[idxmax - lim:idxmax + lim].std()[0])
-
-        # minimal O2 concentration - potential for selected core
-        idxmin = df[s].idxmin()[0]
-        if len(df[s].loc[idxmin - np.abs(lim_min):idxmin + np.abs(lim_min)]) < 3:
-            lim_min = -50
-        pot_min = (df[s].loc[idxmin - np.abs(lim_min):idxmin + np.abs(lim_min)].mean()[0],
-                   df[s].loc[idxmin - np.abs(lim_min):idxmin + np.abs(lim_min)].std()[0])
-        # update nan by 0 for minimal potential
-        pot_min = [0 if x != x else x for x in pot_min]
-
-        # combine all samples of selected core in dictionary
-        pot_o2 = pd.DataFrame([pot_max, pot_min], columns=['mean', 'std'], index=['max', 'min'])
-        dpot[s] = pot_o2
-
-    # find averaged min/max potential of all samples in selected core
-    pot_av = pd.concat([pd.DataFrame(pd.concat(dpot).T.filter(like='max').mean(axis=1)),
-                        pd.DataFrame(pd.concat(dpot).T.filter(like='min').mean(axis=1))], axis=1)
-    pot_av.columns = ['max', 'min']
-    return pot_av
+    return list(potentialLimits(data_shift=dict({0: df}), lim=lim, lim_min=lim_min).values())[0]
+
+
+def calibration_2point(dpot_av, o2_dis):
+    # linear calibration (2-point) - slope and intercept of the sorted potential / O2 pairs. One calibration per core
+    # for a global O2 solubility (0, O2 max) or one per profile for the solubility of each (core, sample)
+    if isinstance(o2_dis, dict):
+        ls_key = [k for k in o2_dis.keys() if k[0] in dpot_av.keys()]
+        o2 = np.sort(np.array([[o2_dis[k][1], o2_dis[k][0]] for k in ls_key], dtype=float), axis=1)
+    else:
+        ls_key = list(dpot_av.keys())
+        o2 = np.sort(np.array([[o2_dis[1], o2_dis[0]]] * len(ls_key), dtype=float), axis=1)
+    pot = np.sort(np.array([dpot_av[k[0] if isinstance(o2_dis, dict) else k].loc['mean'].to_numpy(dtype=float)
+                            for k in ls_key]), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (o2[:, 1] - o2[:, 0]) / (pot[:, 1] - pot[:, 0])
+    intercept = o2[:, 0] - slope * pot[:, 0]
+    return dict(map(lambda i: (ls_key[i], (slope[i], intercept[i])), range(len(ls_key))))
+
+
+def apply_calibration(data_shift, dcalib, col, unit):
+    # calibration of all samples of all cores as a single broadcast over the stacked profiles; dcalib either per core
+    # or per (core, sample)
+    ls_key, codes, depth, val = _stackProfiles(data_shift=data_shift, col=col)
+    ls_calib = [dcalib[k] if k in dcalib.keys() else dcalib[k[0]] for k in ls_key]
+    slope = np.array([a[0] for a in ls_calib])
+    intercept = np.array([a[1] for a in ls_calib])
+    o2 = slope[codes] * val + intercept[codes]
+
+    # split the calibrated profiles again into cores and samples
+    ls_o2 = np.split(o2, np.cumsum(np.bincount(codes, minlength=len(ls_key)))[:-1]) if len(ls_key) > 0 else list()
+    do2_core = dict(map(lambda c: (c, dict()), data_shift.keys()))
+    for (core, s), o2_s in zip(ls_key, ls_o2):
+        do2_core[core][s] = pd.DataFrame(o2_s, columns=['O2_' + unit], index=data_shift[core][s].index)
+    return dict(map(lambda c: (c, pd.concat(do2_core[c], axis=1)), do2_core.keys()))
 
 
 def av_penetrationDepth(dpen_glob, core_select, ls_remain):
@@ -232,22 +682,97 @@ def av_penetrationDepth(dpen_glob, core_select, ls_remain):
 
 
 # --------------------------------------------------------------------------------------------------------------------
-def fit_baseline(ls_core, ls_nr, dunit_O2, dic_dcore, steps, gmod, adv):
-    dfit, dic_deriv = dict(), dict()
-    for core in ls_core:
-        dfit_, dic_deriv_ = dict(), dict()
-        for nr in ls_nr[core]:
-            [res, df_fit, df_fitder, df_fitder2,
-             xshift] = baseline_finder(dic_dcore=dic_dcore, core=core, nr=nr, dunit_O2=dunit_O2, steps=steps, adv=adv,
-                                       model=gmod)
-            dfit_[nr], dic_deriv_[nr] = (res, df_fit, xshift), (df_fitder, df_fitder2)
-        dfit[core] = dfit_
-        dic_deriv[core] = dic_deriv_
+def fit_baseline(ls_core, ls_nr, dunit_O2, dic_dcore, steps, gmod, adv, workers=None, backend=None, progress=None):
+    workers = fit_workers if workers is None else workers
+    backend = fit_backend if backend is None else backend
+
+    # one job per profile - only the profile itself is passed on to the worker
+    ls_job = [(core, nr) for core in ls_core for nr in ls_nr[core]]
+    ls_args, ls_fp = list(), list()
+    for (core, nr) in ls_job:
+        n = nr[0] if isinstance(nr, tuple) else nr
+        ls_args.append(dict({'dic_dcore': dict({core: dict({n: dic_dcore[core][n]})}), 'core': core, 'nr': nr,
+                             'dunit_O2': dunit_O2, 'steps': steps, 'model': gmod, 'adv': adv}))
+        ls_fp.append(dbs.fingerprint(dic_dcore[core][n], dunit_O2, steps, gmod.name, adv))
+
+    # fits of unchanged profiles are re-used - only new or edited profiles are fitted
+    ls_res = [dbs.storedResult(product='O2 fit', key=job, fp=fp) for job, fp in zip(ls_job, ls_fp)]
+    ls_refit = [i for i in range(len(ls_args)) if ls_res[i] is None]
+
+    # batched fit of all profiles at once - lmfit is only used for the profiles that did not converge
+    if backend == 'numpy' and len(ls_refit) > 0:
+        for i, fit in zip(ls_refit, baseline_finderBatch(ls_args=[ls_args[i] for i in ls_refit])):
+            ls_res[i] = fit
+    ls_open = [i for i in ls_refit if ls_res[i] is None]
+    ndone = len(ls_job) - len(ls_open)
+    if progress is not None:
+        progress(ndone, len(ls_job), 'batched fit')
+
+    # curve fit for all (remaining) profiles - results are collected in the order of submission
+    ls_fit = None
+    if workers != 1 and len(ls_open) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                ls_future = [executor.submit(_fitProfile, ls_args[i]) for i in ls_open]
+                ls_fit = list()
+                try:
+                    for en, future in enumerate(ls_future):
+                        ls_fit.append(future.result())
+                        if progress is not None:
+                            progress(ndone + en + 1, len(ls_job), 'core {}'.format(ls_job[ls_open[en]][0]))
+                except dbs.TaskCancelled:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        except dbs.TaskCancelled:
+            raise
+        except Exception as e:
+            ls_fit = None
+            print('warning - parallel curve fit failed ({}); continue with serial fit'.format(e))
+    if ls_fit is None:
+        ls_fit = list()
+        for en, i in enumerate(ls_open):
+            ls_fit.append(_fitProfile(ls_args[i]))
+            if progress is not None:
+                progress(ndone + en + 1, len(ls_job), 'core {}'.format(ls_job[i][0]))
+    for i, fit in zip(ls_open, ls_fit):
+        ls_res[i] = fit
+    for i in ls_refit:
+        dbs.storeResult(product='O2 fit', key=ls_job[i], fp=ls_fp[i], result=ls_res[i])
+
+    dfit, dic_deriv = dict(map(lambda core: (core, dict()), ls_core)), dict(map(lambda core: (core, dict()), ls_core))
+    for (core, nr), fit in zip(ls_job, ls_res):
+        dfit[core][nr], dic_deriv[core][nr] = fit, fit.derivatives
     return dfit, dic_deriv
 
 
-def baseline_finder(dic_dcore, core, nr, dunit_O2, steps, model, adv):
-    # curve fit according to selected model
+def _fitProfile(kwargs):
+    return baseline_finder(**kwargs)
+
+
+def baseline_finderBatch(ls_args):
+    # profiles of all jobs (same arguments as for baseline_finder)
+    ls_ydata = [_profile4fit(dic_dcore=a['dic_dcore'], core=a['core'], nr=a['nr'], dunit_O2=a['dunit_O2'])
+                for a in ls_args]
+    adv, model = ls_args[0]['adv'], ls_args[0]['model']
+    P, chisqr, converged = fit_gompertzBatch(ls_xdata=[y.index.to_numpy(dtype=float) for y in ls_ydata],
+                                             ls_ydata=[y.to_numpy(dtype=float) for y in ls_ydata], adv=adv)
+
+    ls_res = list()
+    for i, a in enumerate(ls_args):
+        if not converged[i]:
+            ls_res.append(None)
+            continue
+        res = FitResult(params=model.make_params(**dict(zip(model.param_names, P[i]))), chisqr=chisqr[i],
+                        ndata=len(ls_ydata[i]), model=model)
+        res.xdata, res.ydata = ls_ydata[i].index.to_numpy(), ls_ydata[i].to_numpy()
+        fit = GompertzFit(res=res, xdata=ls_ydata[i].index, steps=a['steps'], adv=adv)
+        _checkInflection(fit=fit, xdata=ls_ydata[i].index, core=a['core'], nr=a['nr'])
+        ls_res.append(fit)
+    return ls_res
+
+
+def _profile4fit(dic_dcore, core, nr, dunit_O2):
+    # O2 profile (without nan) to be fitted
     if isinstance(nr, tuple):
         nr = nr[0]
         if '/L' in dunit_O2 or '/l' in dunit_O2:
@@ -268,41 +793,35 @@ def baseline_finder(dic_dcore, core, nr, dunit_O2, steps, model, adv):
         ydata = ydata_[ydata_.columns[0]]
     else:
         ydata = dic_dcore[core][nr][col_plot].dropna()
-    xdata = ydata.index
-
-    # initial parameters
-    if adv is True:
-        para = model.make_params(a=-int(ydata.loc[xdata[:3]].mean()), b=.001, c=.001,
-                                 d=-int(ydata.loc[xdata[-3:]].mean()))
-    else:
-        para = model.make_params(a=-int(ydata.loc[xdata[:3]].mean()), b=.001, c=.001)
-    res = model.fit(ydata.to_numpy(), para, x=xdata)
-
-    # 1st derivative
-    arg = [res.params[p].value for p in res.params.keys()]
-    xnew = np.linspace(xdata[0], xdata[-1], num=int((xdata[-1]-xdata[0])/steps+1))
-    if adv is True:
-        yfit = _gompertz_curve_adv(x=xnew, a=arg[0], b=arg[1], c=arg[2], d=arg[3])
-    else:
-        yfit = _gompertz_curve(x=xnew, a=arg[0], b=arg[1], c=arg[2])
-    df_fit = pd.DataFrame(yfit, index=xnew)
-    df_fitder = df_fit.diff()
+    return ydata
 
-    # 2nd derivative
-    df_fitder2 = df_fitder.diff()
 
-    # identify type of extrema
-    xshift = df_fitder.idxmin()[0]
-    xturn = np.abs(df_fitder2.loc[xshift - 2:xshift + 2]).idxmin()[0]
-    if xturn in [xshift-steps, xshift, xshift+steps]:
+def _checkInflection(fit, xdata, core, nr):
+    # point of inflection (SWI) has to be within the profile and the O2 has to decrease there
+    if xdata[0] <= fit.inflection <= xdata[-1] and fit.slope < 0:
         pass
     else:
         print('Warning! Extreme point for core {}-sample {} might not be a real point of inflection'.format(core, nr))
 
-    return res, df_fit, df_fitder, df_fitder2, xshift
 
+def baseline_finder(dic_dcore, core, nr, dunit_O2, steps, model, adv):
+    # curve fit according to selected model
+    ydata = _profile4fit(dic_dcore=dic_dcore, core=core, nr=nr, dunit_O2=dunit_O2)
+    xdata = ydata.index
+
+    # initial parameters
+    para = model.make_params(**_initialGuess(xdata=xdata, ydata=ydata, adv=adv))
+    res = _modelFit(model=model, ydata=ydata.to_numpy(), para=para, xdata=xdata)
+
+    # only the fit parameters and statistics are kept - curves are evaluated on demand
+    res = FitResult.fromModelResult(res=res, xdata=xdata.to_numpy(), ydata=ydata.to_numpy())
+    fit = GompertzFit(res=res, xdata=xdata, steps=steps, adv=adv)
+    _checkInflection(fit=fit, xdata=xdata, core=core, nr=nr)
 
-def baseline_finder_DF(dic_dcore, dunit_O2, steps, model, adv):
+    return fit
+
+
+def baseline_finder_DF(dic_dcore, dunit_O2, steps, model, adv, params=None):
     # curve fit according to selected model
     if '/L' in dunit_O2 or '/l' in dunit_O2:
         col_plot = [c for c in dic_dcore.columns if '/L' in c or '/l' in c][0]
@@ -312,27 +831,15 @@ def baseline_finder_DF(dic_dcore, dunit_O2, steps, model, adv):
     ydata = dic_dcore[col_plot].dropna()
     xdata = ydata.index
 
-    # initial parameters
-    if adv is True:
-        para = model.make_params(a=-int(ydata.loc[xdata[:3]].mean()), b=.001, c=.001,
-                                 d=-int(ydata.loc[xdata[-3:]].mean()))
-    else:
-        para = model.make_params(a=-int(ydata.loc[xdata[:3]].mean()), b=.001, c=.001)
-    res = model.fit(ydata.to_numpy(), para, x=xdata)
-
-    # ................................................................
-    # 1st derivative
-    arg = [res.params[p].value for p in res.params.keys()]
-    xnew = np.linspace(xdata[0], xdata[-1], num=int((xdata[-1]-xdata[0])/steps+1))
-    if adv is True:
-        yfit = _gompertz_curve_adv(x=xnew, a=arg[0], b=arg[1], c=arg[2], d=arg[3])
+    # initial parameters - warm start from a previous fit if available
+    if params is not None:
+        para = params.copy()
     else:
-        yfit = _gompertz_curve(x=xnew, a=arg[0], b=arg[1], c=arg[2])
+        para = model.make_params(**_initialGuess(xdata=xdata, ydata=ydata, adv=adv))
+    res = _modelFit(model=model, ydata=ydata.to_numpy(), para=para, xdata=xdata)
+    fit = GompertzFit(res=res, xdata=xdata, steps=steps, adv=adv)
 
-    df_fit = pd.DataFrame(yfit, index=xnew)
-    df_fitder = df_fit.diff()
-
-    return res, df_fit, df_fitder
+    return res, fit.curve, fit.derivative_curve(order=1), fit.inflection
 
 
 def baseline_shift(dic_dcore, dfit):
@@ -344,39 +851,58 @@ def baseline_shift(dic_dcore, dfit):
     return data_shift
 
 
-def penetration_depth(df, unit, steps, model, adv):
+def _penetrationProfile(df, unit):
     xdata = df.index
     # find column to be fitted
     col_plot = dbs.find_col2plot(unit=unit, df=df)
     ydata = df[col_plot]
 
     # baseline correction
-    ydata = ydata - ydata.loc[xdata[-3:]].mean()
+    return ydata - ydata.loc[xdata[-3:]].mean()
 
-    # initial parameters
-    if adv is True:
-        para = model.make_params(a=-int(ydata.loc[xdata[:3]].mean()), b=-.0001, c=0.002,
-                                 d=-int(ydata.loc[xdata[-3:]].mean()))
-    else:
-        model = Model(_gompertz_curve)
-        para = model.make_params(a=-int(ydata.loc[xdata[:3]].mean()), b=-.0001, c=0.002)
-    res = model.fit(ydata.to_numpy(), para, x=xdata)
 
-    # ................................................................
-    # 1st derivative
-    arg = [res.params[p].value for p in res.params.keys()]
-    xnew = np.linspace(xdata[0], xdata[-1], num=int((xdata[-1]-xdata[0])/steps+1))
-    if adv is True:
-        yfit = _gompertz_curve_adv(x=xnew, a=arg[0], b=arg[1], c=arg[2], d=arg[3])
-    else:
-        yfit = _gompertz_curve(x=xnew, a=arg[0], b=arg[1], c=arg[2])
+def penetration_depth(df, unit, steps, model, adv):
+    ydata = _penetrationProfile(df=df, unit=unit)
+    xdata = ydata.index
 
-    df_fit = pd.DataFrame(yfit, index=xnew)
+    # initial parameters
+    if adv is not True:
+        model = Model(_gompertz_curve)
+    para = model.make_params(**_initialGuess(xdata=xdata, ydata=ydata, adv=adv))
+    res = _modelFit(model=model, ydata=ydata.to_numpy(), para=para, xdata=xdata)
 
+    # fit curve on the depth grid
+    df_fit = GompertzFit(res=res, xdata=xdata, steps=steps, adv=adv).curve
     return df_fit
 
 
-def sigmoidalFit(ddata, sheet_select, dunit, results, steps):
+def penetration_fits(dO2_core, unit, steps, gmod, backend=None, progress=None):
+    # fit curves of all samples of all cores; batched fit when selected and lmfit for the non-converged profiles
+    backend = fit_backend if backend is None else backend
+    ls_job = [(core, s[0] if isinstance(s, tuple) else s) for core in dO2_core.keys() for s in dO2_core[core].keys()]
+    dfit_pen = dict(map(lambda core: (core, dict()), dO2_core.keys()))
+
+    if backend == 'numpy' and len(ls_job) > 0:
+        ls_ydata = [_penetrationProfile(df=dO2_core[core][s].dropna(), unit=unit) for (core, s) in ls_job]
+        P, chisqr, converged = fit_gompertzBatch(ls_xdata=[y.index.to_numpy(dtype=float) for y in ls_ydata],
+                                                 ls_ydata=[y.to_numpy(dtype=float) for y in ls_ydata], adv=False)
+        model = Model(_gompertz_curve)
+        for i, (core, s) in enumerate(ls_job):
+            if converged[i]:
+                res = FitResult(params=model.make_params(**dict(zip(model.param_names, P[i]))), chisqr=chisqr[i],
+                                ndata=len(ls_ydata[i]), model=model)
+                dfit_pen[core][s] = GompertzFit(res=res, xdata=ls_ydata[i].index, steps=steps, adv=False).curve
+
+    for en, (core, s) in enumerate(ls_job):
+        if s not in dfit_pen[core].keys():
+            dfit_pen[core][s] = penetration_depth(df=dO2_core[core][s].dropna(), unit=unit, steps=steps, model=gmod,
+                                                  adv=False)
+        if progress is not None:
+            progress(en + 1, len(ls_job), 'core {}'.format(core))
+    return dfit_pen
+
+
+def sigmoidalFit(ddata, sheet_select, dunit, results, steps, progress=None):
     # pre-set of parameters
     gmod = Model(_gompertz_curve_adv)
 
@@ -388,24 +914,17 @@ def sigmoidalFit(ddata, sheet_select, dunit, results, steps):
     [dic_dcore, ls_nr, ls_colname] = dbs.load_measurements(dsheets=ddata, ls_core=ls_core, para=sheet_select)
     results['O2 profile'] = dic_dcore
 
-    # separate storage of raw data
-    results['O2 raw data'] = dict()
-    for c in results['O2 profile'].keys():
-        ddic = dict()
-        for i in results['O2 profile'][c].keys():
-            df_i = pd.DataFrame(np.array(results['O2 profile'][c][i]), index=results['O2 profile'][c][i].index,
-                                columns=results['O2 profile'][c][i].columns)
-            ddic[i] = df_i
-        results['O2 raw data'][c] = ddic
+    # separate storage of raw data (columnar, read-only)
+    results['O2 raw data'] = dbs.ProfileTable(dprofiles=results['O2 profile'])
 
     # curve fit and baseline finder
     dfit, dic_deriv = fit_baseline(ls_core=ls_core, ls_nr=ls_nr, dunit_O2=dunit['O2'], dic_dcore=dic_dcore, steps=steps,
-                                   gmod=gmod, adv=True)
+                                   gmod=gmod, adv=True, progress=progress)
     results['O2 fit'], results['O2 derivative'] = dfit, dic_deriv
     return ls_core, ls_colname, gmod, dic_dcore, dic_deriv, dfit, results
 
 
-def updateBaseline_O2Fit(results, dunit, steps, gmod):
+def updateBaseline_O2Fit(results, dunit, steps, gmod, progress=None):
     # get the relevant parameters ls_core and samples of each core (dls_nr)
     ls_core = list(dict.fromkeys(results['O2 profile'].keys()))
 
@@ -416,7 +935,7 @@ def updateBaseline_O2Fit(results, dunit, steps, gmod):
 
     # update baseline finding fit function
     dfit, dic_deriv = fit_baseline(ls_core=ls_core, ls_nr=dls_nr, dunit_O2=dunit['O2'], dic_dcore=results['O2 profile'],
-                                   steps=steps, gmod=gmod, adv=True)
+                                   steps=steps, gmod=gmod, adv=True, progress=progress)
 
     # update results dictionary for fit and derivative
     results['O2 fit'], results['O2 derivative'] = dfit, dic_deriv
@@ -429,18 +948,12 @@ def O2converter4conc(data_shift, o2_dis, lim_min, lim, unit):
     dex = pd.concat(data_shift[list(data_shift.keys())[0]], axis=1)
     col = [c for c in dex.columns.levels[1] if 'M' not in c][0]
 
-    dO2_core = dict()
-    for core in data_shift.keys():
-        # find minimal and maximal potential for all samples of the core
-        pot_av = findPotentialLimits(df=data_shift[core], lim=lim, lim_min=lim_min)
-
-        # linear calibration (2-point) for this core
-        arg = stats.linregress(sorted(list(pot_av.loc['mean'].to_numpy())), sorted([o2_dis[1], o2_dis[0]]))
+    # find minimal and maximal potential for all samples of all cores
+    dpot_av = potentialLimits(data_shift=data_shift, lim=lim, lim_min=lim_min)
 
-        do2_calib = dict(map(lambda s:
-                             (s, pd.DataFrame(arg[0]*data_shift[core][s][col].to_numpy() + arg[1], columns=['O2_'+unit],
-                                              index=data_shift[core][s].index)), data_shift[core].keys()))
-        dO2_core[core] = pd.concat(do2_calib, axis=1)
+    # linear calibration (2-point) for each core
+    dcalib = calibration_2point(dpot_av=dpot_av, o2_dis=o2_dis)
+    dO2_core = apply_calibration(data_shift=data_shift, dcalib=dcalib, col=col, unit=unit)
     return dO2_core
 
 
@@ -463,6 +976,23 @@ def dissolvedO2_calc(T, sal):
     return 0, dO2_max
 
 
+def dissolvedO2_profiles(dTS, data_shift, T, sal):
+    """ Minimal/maximal dissolved O2 of each profile according to its temperature and salinity (Weiss 1970) - all
+    profiles in one vectorized pass:
+    :param dTS:         temperature / salinity of each (core, sample), see dbs.profileTS
+    :param data_shift:  dictionary of cores with a dictionary of sample profiles each
+    :param T:           global temperature in degC for profiles not listed in dTS
+    :param sal:         global salinity for profiles not listed in dTS
+    :return:            dictionary (core, sample) -> (0, O2 max)
+    """
+    ls_key = [(c, s) for c in data_shift.keys() for s in data_shift[c].keys()]
+    dfTS = pd.DataFrame([dTS.loc[k].to_numpy() if k in dTS.index else [T, sal] for k in ls_key],
+                        columns=['temperature degC', 'salinity PSU'])
+    _, o2_max = dissolvedO2_calc(T=dfTS['temperature degC'].to_numpy(dtype=float),
+                                 sal=dfTS['salinity PSU'].to_numpy(dtype=float))
+    return dict(map(lambda i: (ls_key[i], (0, o2_max[i])), range(len(ls_key))))
+
+
 def O2calc4conc_one4all(core_sel, data_shift, o2_dis, lim, lim_min, unit):
     # get the correct column
     dex = pd.concat(data_shift[list(data_shift.keys())[0]], axis=1)
@@ -472,17 +1002,12 @@ def O2calc4conc_one4all(core_sel, data_shift, o2_dis, lim, lim_min, unit):
         col = [c for c in dex.columns.levels[1] if unit in c][0]
 
     # find minimal/maximal potential for samples of selected core
-    pot_av = findPotentialLimits(df=data_shift[core_sel], lim=lim, lim_min=lim_min)
-
-    # linear calibration (2-point) for this core
-    arg = stats.linregress(sorted(list(pot_av.loc['mean'].to_numpy())), sorted([o2_dis[1], o2_dis[0]]))
+    dpot_av = potentialLimits(data_shift=dict({core_sel: data_shift[core_sel]}), lim=lim, lim_min=lim_min)
 
-    # apply now the calibration to all samples of all cores
-    do2_core = dict(map(lambda c:
-                        (c, pd.concat(dict(map(lambda s:
-                                               (s, pd.DataFrame(arg[0] * data_shift[c][s][col].to_numpy() + arg[1],
-                                                                columns=['O2_' + unit], index=data_shift[c][s].index)),
-                                               data_shift[c].keys())), axis=1)), data_shift.keys()))
+    # linear calibration (2-point) for this core - applied to all samples of all cores
+    dpot_all = dict(map(lambda c: (c, dpot_av[core_sel]), data_shift.keys()))
+    dcalib = calibration_2point(dpot_av=dpot_all, o2_dis=o2_dis)
+    do2_core = apply_calibration(data_shift=data_shift, dcalib=dcalib, col=col, unit=unit)
     return do2_core
 
 
@@ -638,6 +1163,37 @@ def GUI_baslineShift(data_shift, core, ls_core, plot_col, grp_label, fig=None, a
     return fig
 
 
+def browse_baslineShift(browser, data_shift, core, ls_core, plot_col, grp_label, fs=8, cache=None):
+    # fast update of the SWI corrected profiles when another core is selected (see dbs.ProfileBrowser); the plot data
+    # and range of each core are prepared once and re-used from the cache (dbs.PlotCache) as long as the core is not
+    # changed
+    core_select = dbs.closest_core(ls_core=ls_core, core=core)
+    if core_select == 0 or not data_shift:
+        return GUI_baslineShift(data_shift=data_shift, core=core, ls_core=ls_core, plot_col=plot_col, fs=fs,
+                                grp_label=grp_label, fig=browser.fig, ax=browser.ax)
+
+    # identify column to plot
+    df = data_shift[core_select]
+    col2plot, unit = dbs._find_unit_in_column(ls_columns=df[list(df.keys())[0]].columns, plot_col=plot_col)
+    cache = dbs.PlotCache() if cache is None else cache
+    ls_profile, (minPot, max_) = cache.profiles(dcore=df, core=core_select, col=col2plot)
+
+    # x-range of all samples of the core
+    min_ = minPot*0.5 if int(minPot) > 0 else -1 * np.abs(max_) * 0.15
+
+    def _layout():
+        [x.set_linewidth(.5) for x in browser.ax.spines.values()]
+        browser.ax.tick_params(axis='both', bottom=True, top=False, direction='out', length=5, width=0.75,
+                               labelsize=fs * 0.9)
+        browser.fig.tight_layout()
+
+    browser.show(core=core_select, ls_profile=ls_profile, xlim=(min_, np.abs(max_)*1.05), layout=_layout,
+                 title='Sediment water interface profile (SWI) for {} {}'.format(grp_label, core_select),
+                 frame=('$O_2$ concentration / {}'.format(unit), 'Depth / µm', fs),
+                 style=dict(ls='-.', lw=.75, marker='.', ms=6, alpha=.75))
+    return browser.fig
+
+
 def GUI_baslineShiftCore(data_shift, core_select, plot_col, grp_label, fig, ax):
     ax.cla()
     # identify the columns to plot
@@ -710,7 +1266,7 @@ def plot_Fitselect(core, sample, dfCore, dfFit, dfDeriv, dunit, grp_label, fig,
     return fig3
 
 
-def plot_FitUpdate(core, nr, grp_label, dic_dcore, dfit, dic_deriv, fig, ax, ax1, dunit):
+def plot_FitUpdate(core, nr, grp_label, dic_dcore, dfit, dic_deriv, fig, ax, ax1, dunit, xshift=None):
     # clear coordinate system but keep the labels
     ax.cla(), ax1.cla()
     ax.title.set_text('Fit characteristics for {} {} - sample {}'.format(grp_label, core, nr))
@@ -721,13 +1277,16 @@ def plot_FitUpdate(core, nr, grp_label, dic_dcore, dfit, dic_deriv, fig, ax, ax1
     ax.plot(dic_dcore.index, dic_dcore[col_plot], lw=0, marker='o', ms=4, color='k')
     ax.plot(dfit[dfit.columns[0]], lw=0.75, ls=':', color='k')
 
+    # point of inflection - closed form if available
+    if xshift is None:
+        xshift = dic_deriv.idxmin().values[0]
     ax1.plot(dic_deriv, lw=1., color='#0077b6')
-    ax1.axvline(dic_deriv.idxmin().values[0], ls='-.', color='darkorange', lw=1.5)
+    ax1.axvline(xshift, ls='-.', color='darkorange', lw=1.5)
 
     # text annotation to indicate depth correction
     text = 'surface level \nat {:.1f}µm'
     c = 'O2_mV' if 'O2' in dic_dcore.columns else dic_dcore.columns[0]
-    ax.text(dic_dcore[c].index[-1] * 0.6, dic_dcore[c].max() * 0.5, text.format(dic_deriv.idxmin().values[0]),
+    ax.text(dic_dcore[c].index[-1] * 0.6, dic_dcore[c].max() * 0.5, text.format(xshift),
             ha="left", va="center", color='k', size=9.5, bbox=dict(fc='lightgrey', alpha=0.25))
 
     # general layout
@@ -872,20 +1431,22 @@ def GUI_O2depth(core, ls_core, grp_label, dcore_pen, dobj_hid, dO2_core, fig, ax
     return fig, dobj_hid
 
 
-def GUI_calcO2penetration(O2_pen, dO2_core, unit, steps, gmod, dpen_glob):
-    dcore_pen, dcore_fig = dict(), dict()
+def GUI_calcO2penetration(O2_pen, dO2_core, unit, steps, gmod, dpen_glob, progress=None):
+    # fit and penetration depth of all samples of all cores - no figures required
+    dfit_pen = penetration_fits(dO2_core=dO2_core, unit=unit, steps=steps, gmod=gmod, progress=progress)
+    ddepth_pen = calc_penetrationDepth(dfit_pen=dfit_pen, O2_pen=O2_pen)
+
+    dcore_pen = dict()
     for core in dO2_core.keys():
-        dic_pen, dfig_pen = dict(), dict()
+        dic_pen = dict()
         for s in dO2_core[core].keys():
             s_col = s[0] if isinstance(s, tuple) else s
-            df_fit = penetration_depth(df=dO2_core[core][s_col].dropna(), unit=unit, steps=steps, model=gmod, adv=False)
-            dic_pen[str(s_col) + '-Fit'] = df_fit
-            [fig, depth_pen] = plot_penetrationDepth(core=core, s=s_col, df_fit=df_fit, O2_pen=O2_pen, unit=unit,
-                                                     show=False)
+            dic_pen[str(s_col) + '-Fit'] = dfit_pen[core][s_col]
+            dic_pen[str(s_col) + '-penetration'] = ddepth_pen[core][s_col]
+        dcore_pen[core] = dic_pen
 
-            dic_pen[str(s_col) + '-penetration'] = depth_pen
-            dfig_pen[int(s_col)] = fig
-        dcore_pen[core], dcore_fig[core] = dic_pen, dfig_pen
+    # figures are only created for the samples that are displayed or exported
+    dcore_fig = PenetrationFigures(dfit_pen=dfit_pen, O2_pen=O2_pen, unit=unit)
 
     # store all penetration depth information for all samples of the same core in a dictionary
     dpenetration = dict()
@@ -905,6 +1466,51 @@ def GUI_calcO2penetration(O2_pen, dO2_core, unit, steps, gmod, dpen_glob):
     return dcore_pen, dcore_fig
 
 
+def calc_penetrationDepth(dfit_pen, O2_pen):
+    """ Penetration depth of all samples of all cores without creating any figure. The penetration depth is the first
+    depth of the fit curve where O2 falls below the threshold:
+    :param dfit_pen:    dictionary of cores with the fit curves of each sample
+    :param O2_pen:      O2 threshold for the penetration depth
+    :return:            dictionary of cores with (depth, O2) of each sample; (None, None) if the threshold isn't reached
+    """
+    ls_key, codes, depth, o2 = _stackProfiles(data_shift=dfit_pen)
+
+    # first point below the threshold of each curve
+    pos_below = np.flatnonzero(o2 < O2_pen)
+    grp, ind = np.unique(codes[pos_below], return_index=True)
+    first = np.full(len(ls_key), -1)
+    first[grp] = pos_below[ind]
+
+    ddepth_pen = dict(map(lambda c: (c, dict()), dfit_pen.keys()))
+    for n, (core, s) in enumerate(ls_key):
+        ddepth_pen[core][s] = (depth[first[n]], o2[first[n]]) if first[n] >= 0 else (None, None)
+    return ddepth_pen
+
+
+class PenetrationFigures:
+    """ Figures of the penetration depth for each core and sample. A figure is only created (and cached) when it is
+    requested, e.g. for display or export.
+    :param dfit_pen:    dictionary of cores with the fit curves of each sample
+    :param O2_pen:      O2 threshold for the penetration depth
+    :param unit:        O2 unit
+    """
+    def __init__(self, dfit_pen, O2_pen, unit):
+        self.dfit_pen, self.O2_pen, self.unit = dfit_pen, O2_pen, unit
+        self._dfig = dict()
+
+    def figure(self, core, s):
+        if (core, s) not in self._dfig.keys():
+            self._dfig[(core, s)] = plot_penetrationDepth(core=core, s=s, df_fit=self.dfit_pen[core][s],
+                                                          O2_pen=self.O2_pen, unit=self.unit, show=False)[0]
+        return self._dfig[(core, s)]
+
+    def keys(self):
+        return self.dfit_pen.keys()
+
+    def __getitem__(self, core):
+        return dict(map(lambda s: (int(s), self.figure(core=core, s=s)), self.dfit_pen[core].keys()))
+
+
 def _supplPlot(core_select, dobj_hid, dpen_glob):
     # samples that should not be included in averaging
     ls_shid = [int(i.split('-')[1]) for i in dobj_hid[core_select]] if core_select in dobj_hid.keys() else list()
@@ -0,0 +1,286 @@
+__author__ = 'Silvia E Zieger'
+__project__ = 'soil profile analysis'
+
+"""Copyright 2022. All rights reserved.
+
+This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+for any damages arising from the use of this software.
+Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter it
+and redistribute it freely, subject to the following restrictions:
+1. The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+   If you use this software in a product, an acknowledgment in the product documentation would be appreciated but is
+   not required
+2. Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software
+3. This notice may not be removed or altered from any source distribution.
+"""
+
+import numpy as np
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import functions_dbs as dbs
+import functions_O2 as fO2
+import functions_pH as fph
+import functions_H2S as fh2s
+import functions_EP as fep
+
+# global parameter
+convC2K = 273.15                    # temperature conversion from degC into Kelvin
+ls_allData = ['meta data', 'raw data', 'fit_mV', 'adjusted data', 'penetration depth']
+ls_allFig = ['fig raw', 'fig adjusted', 'fig fit', 'fig penetration']
+ls_analyte = ['O2', 'pH', 'H2S', 'EP']  # processing order - pH is required before H2S (total sulfide)
+fs_ = 8
+
+# default settings - same presets as used in the GUI
+dsettings_default = dict({'analytes': ls_analyte, 'temperature degC': 25., 'salinity PSU': 0., 'steps': 0.5,
+                          'lim': 150, 'lim_min': -1, 'calibration': 'internal', 'O2 penetration': 0.5,
+                          'sulfidic front': 0.5, 'drift correction': '2nd order polynomial fit',
+                          'saving parameters': ','.join(ls_allData + ls_allFig), 'workers': None, 'fit backend': 'numpy',
+                          'depth grid': 1., 'dtype': 'float64', 'export formats': ['xlsx'],
+                          'fit export': None})
+
+
+# --------------------------------------------------------------------------------------------------------------------
+def load_settings(file):
+    dsettings = dict(dsettings_default)
+    if file is not None:
+        with open(file, 'r') as f:
+            dsettings_user = json.load(f)
+        for k in dsettings_user.keys():
+            if k not in dsettings_default.keys():
+                print('warning - unknown setting {} is ignored'.format(k))
+            else:
+                dsettings[k] = dsettings_user[k]
+
+    # double check the analytes and the calibration type
+    dsettings['analytes'] = [a for a in ls_analyte if a in dsettings['analytes']]
+    if dsettings['calibration'] not in ['internal', 'core by core']:
+        raise ValueError("calibration must be either 'internal' or 'core by core'")
+    return dsettings
+
+
+def find_measurementFiles(folder):
+    ls_file = list()
+    [ls_file.append(os.path.join(folder, f)) for f in sorted(os.listdir(folder))
+     if f.split('.')[-1] in ['xls', 'xlsx'] and not f.startswith('~')]
+    return ls_file
+
+
+def _analyteData(dsheets, dignore, analyt):
+    # pre-check whether the analyte was measured at all
+    sheet_select = dbs.sheetname_check(dsheets, para=analyt)
+    if sheet_select is None:
+        return None, None
+
+    # prepare file depending on the type and remove excluded profiles
+    ddata_update = dbs._prepAnalyteData(dsheets=dsheets, dignore=dignore, sheet_select=sheet_select, analyt=analyt)
+    return ddata_update, sheet_select
+
+
+def _profileTS(data, dsettings):
+    # temperature / salinity of each deployment in case the metadata sheet lists them
+    return dbs.profileTS(df_meta=fep.load_additionalInfo(data=data)['meta data'],
+                         temp_degC=dsettings['temperature degC'], sal_PSU=dsettings['salinity PSU'])
+
+
+# --------------------------------------------------------------------------------------------------------------------
+def batch_O2(dsheets, dignore, data, save_path, results, dunit, dsettings):
+    ddata, sheet_select = _analyteData(dsheets=dsheets, dignore=dignore, analyt='O2')
+    if ddata is None:
+        return False, results
+    steps, grp_label = dsettings['steps'], ddata.columns[0]
+
+    # SWI correction based on the sigmoidal fit of the raw profiles (in mV)
+    dunit['O2'] = 'mV'
+    [ls_core, ls_colname, gmod, dic_dcore, dic_deriv, dfit,
+     results] = fO2.sigmoidalFit(ddata=ddata, sheet_select=sheet_select, dunit=dunit, results=results, steps=steps)
+    ddata_shift = fO2.baseline_shift(dic_dcore=results['O2 profile'], dfit=dfit)
+    results['O2 SWI corrected'], results['O2 profile'] = ddata_shift, ddata_shift
+
+    # calibration - convert O2 potential into concentration
+    dunit['O2'] = 'µmol/L'
+    o2_dis = fO2.dissolvedO2_calc(T=dsettings['temperature degC'], sal=dsettings['salinity PSU'])
+    if dsettings['calibration'] == 'internal':
+        typeCalib = 'internal calibration from measurement file'
+        results['O2 profile'] = fO2.O2rearrange(df=ddata_shift, unit='µmol/L')
+    else:
+        typeCalib = 'recalibration core by core'
+        dTS = _profileTS(data=data, dsettings=dsettings)
+        o2_profile = o2_dis if dTS is None else fO2.dissolvedO2_profiles(dTS=dTS, data_shift=ddata_shift,
+                                                                         T=dsettings['temperature degC'],
+                                                                         sal=dsettings['salinity PSU'])
+        dO2_core = fO2.O2converter4conc(data_shift=ddata_shift, o2_dis=o2_profile, lim_min=dsettings['lim_min'],
+                                        lim=dsettings['lim'], unit='µmol/L')
+        for c in dO2_core.keys():
+            for i in dO2_core[c].columns:
+                col2sub = [k for k in results['O2 profile'][c][i[0]].columns if 'M' in k or 'mol' in k][0]
+                results['O2 profile'][c][i[0]][col2sub] = dO2_core[c][i].dropna().to_numpy()
+    results = fO2.updateBaseline_O2Fit(results=results, dunit=dunit, steps=steps, gmod=gmod)
+
+    # penetration depth
+    dpen_glob = dict()
+    dcore_pen, _ = fO2.GUI_calcO2penetration(O2_pen=dsettings['O2 penetration'], dO2_core=results['O2 profile'],
+                                             unit='µmol/L', steps=steps, gmod=gmod, dpen_glob=dpen_glob)
+    results['O2 penetration depth'], results['O2 hidden objects'] = dcore_pen, dict()
+
+    # export data and figures
+    dout = dbs.prep4saveRes(dout=dict(), results=results, dpenStat=dpen_glob, typeCalib=typeCalib, o2_dis=o2_dis,
+                            temperature=dsettings['temperature degC'], salinity=dsettings['salinity PSU'],
+                            pene2=dsettings['O2 penetration'])
+    fO2.save_O2data(save_path=save_path, save_params=dsettings['saving parameters'], data=data, ls_allData=ls_allData,
+                    dout=dout)
+    fO2.save_figure(save_params=dsettings['saving parameters'], path_save=save_path, analyte='O2', results=results,
+                    ls_core=ls_core, dic_deriv=dic_deriv, ddata_shift=ddata_shift, dcore_pen=dcore_pen,
+                    dO2_core=results['O2 profile'], dobj_hid=dict(), dunit=dunit, grp_label=grp_label,
+                    dpen_glob=dpen_glob)
+    return True, results
+
+
+def batch_pH(dsheets, dignore, data, save_path, results, dunit, dsettings):
+    ddata, sheet_select = _analyteData(dsheets=dsheets, dignore=dignore, analyt='pH')
+    if ddata is None:
+        return False, results
+    dunit['pH'], grp_label = '', ddata.columns[0]
+
+    # import all measurements for given parameter
+    ls_core = list(dict.fromkeys(ddata[ddata.columns[0]]))
+    [dpH_core, _, _] = dbs.load_measurements(dsheets=ddata, ls_core=ls_core, para=sheet_select)
+    results['pH profile raw data'] = dbs.ProfileTable(dprofiles=dpH_core)
+    results['pH adjusted'] = results['pH profile raw data'].edit()
+
+    # export data and figures
+    save_folder = save_path + '/pH_project/'
+    if not os.path.exists(save_folder):
+        os.makedirs(save_folder)
+    fph.save_pHdata(save_path=save_folder, save_params=dsettings['saving parameters'], data=data, results=results)
+    fph.save_pHfigures(save_para=dsettings['saving parameters'], path_save=save_path, results=results,
+                       grp_label=grp_label, fs_=fs_)
+    return True, results
+
+
+def batch_H2S(dsheets, dignore, data, save_path, results, dunit, dsettings):
+    ddata, sheet_select = _analyteData(dsheets=dsheets, dignore=dignore, analyt='H2S')
+    if ddata is None:
+        return False, results
+    dunit['H2S'], grp_label = 'µmol/L', ddata.columns[0]
+
+    # import all measurements for given parameter and keep a separate copy of the raw data
+    ls_core = list(dict.fromkeys(ddata[ddata.columns[0]].to_numpy()))
+    [dH2S_core, _, _] = dbs.load_measurements(dsheets=ddata, ls_core=ls_core, para=sheet_select)
+    results['H2S adjusted'] = dH2S_core
+    results['H2S profile raw data'] = dbs.ProfileTable(dprofiles=dH2S_core)
+
+    # total sulfide in case pH was measured and the correlation between both sensors is given
+    if 'pH profile raw data' in results.keys():
+        dsheets_add = fh2s.load_additionalInfo_h2s(data=data)
+        results['pH - H2S correlation'] = dsheets_add['pH - H2S correlation']
+        if results['pH - H2S correlation'] is not None:
+            dunit['total sulfide'] = 'µmol/L'
+            dsulfide, results = fh2s.calc_total_sulfide_TS(results=results, dH2S_core=dH2S_core, convC2K=convC2K,
+                                                           temp_degC=dsettings['temperature degC'],
+                                                           sal_pmill=dsettings['salinity PSU'],
+                                                           dTS=_profileTS(data=data, dsettings=dsettings))
+            results['H2S profile total sulfide'] = dsulfide
+            results['H2S total sulfide adjusted'] = dict(map(lambda c: (c, dict(map(lambda i: (i, dsulfide[c][i].copy()),
+                                                                                    dsulfide[c].keys()))),
+                                                             dsulfide.keys()))
+
+    # sulfidic front
+    results['H2S sulfidic front'] = fh2s.sulfidicFront(results=results, threshold=dsettings['sulfidic front'],
+                                                       dobj_hidH2S=dict())
+    results['H2S hidden objects'] = dict()
+
+    # export data and figures
+    dout = fh2s.prepDataH2Soutput(dout=dict(), results=results)
+    fh2s.save_H2Sdata(save_path=save_path, save_para=dsettings['saving parameters'], data=data, ls_allData=ls_allData,
+                      dout=dout)
+    fh2s.save_H2Sfigure(save_para=dsettings['saving parameters'], save_path=save_path, ls_core=ls_core, fs_=fs_,
+                        grp_label=grp_label, dunit=dunit, dobj_hidH2S=dict(), results=results)
+    return True, results
+
+
+def batch_EP(dsheets, dignore, data, save_path, results, dunit, dsettings):
+    ddata, sheet_select = _analyteData(dsheets=dsheets, dignore=dignore, analyt='EP')
+    if ddata is None:
+        return False, results
+    dunit['EP'], grp_label = 'mV', ddata.columns[0]
+
+    # import all measurements for given parameter (depth in ascending order)
+    ls_core = list(dict.fromkeys(ddata[ddata.columns[0]]))
+    [dEP_core, _, _] = dbs.load_measurements(dsheets=ddata, ls_core=ls_core, para=sheet_select)
+    dEP_core = dict(map(lambda c: (c, dict(map(lambda s: (s, dEP_core[c][s].sort_index(ascending=True)),
+                                               dEP_core[c].keys()))), dEP_core.keys()))
+    results['EP adjusted'] = dEP_core
+    results['EP raw data'] = dbs.ProfileTable(dprofiles=dEP_core)
+
+    # drift correction for all groups defined in the meta data
+    results['EP profile drift'], results['EP drift correction'], results['EP order'] = dict(), dict(), dict()
+    if dsettings['drift correction']:
+        df_meta = fep.load_additionalInfo(data=data)['meta data']
+        if df_meta is not None and 'EP' in df_meta.columns:
+            dorder = fep.EPdrift_order(df_meta=df_meta)
+            [results['EP adjusted'], results['EP profile drift'],
+             results['EP drift correction']] = fep.EPdrift_correction(dataEP=dEP_core, dorder=dorder,
+                                                                      fit_select=dsettings['drift correction'])
+            results['EP order'] = dorder
+
+    scaleEP = dict()
+    for c in results['EP adjusted'].keys():
+        min_ = round(np.nanmin([results['EP adjusted'][c][s]['EP_mV'].min() for s in results['EP adjusted'][c].keys()]), 2)
+        max_ = round(np.nanmax([results['EP adjusted'][c][s]['EP_mV'].max() for s in results['EP adjusted'][c].keys()]), 2)
+        scaleEP[c] = (min_, max_)
+
+    # export data and figures
+    dout = fep.prepDataEPoutput(dout=dict(), results=results)
+    fep.save_EPdata(path_save=save_path, save_params=dsettings['saving parameters'], dout=dout, data=data,
+                    ls_allData=ls_allData)
+    fep.save_EPfigure(save_para=dsettings['saving parameters'], path_save=save_path, ls_core=ls_core, results=results,
+                      dobj_hidEP=dict(), grp_label=grp_label, scaleEP=scaleEP)
+    return True, results
+
+
+# --------------------------------------------------------------------------------------------------------------------
+def process_file(file, dsettings, save_path):
+    # files are already processed in parallel - fit the profiles of each file serially
+    fO2.fit_workers, fO2.fit_backend = 1, dsettings['fit backend']
+    dbs.export_workers, dbs.export_formats = 1, dsettings['export formats']
+    dbs.export_fit = dsettings['fit export']
+    fh2s.grid_depth, fh2s.grid_dtype = dsettings['depth grid'], dsettings['dtype']
+
+    # each measurement file gets its own storage folder
+    save_path = os.path.join(save_path, os.path.splitext(os.path.basename(file))[0])
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+
+    # load the measurement file
+    data = str([file])
+    results, dunit, dcol_label = dict(), dict(), dict()
+    results['temperature degC'], results['salinity PSU'] = dsettings['temperature degC'], dsettings['salinity PSU']
+    dsheets, dignore = dbs._loadGlobData(file_str=data, dcol_label=dcol_label)
+
+    # run the analysis for each analyte
+    dfunc = dict({'O2': batch_O2, 'pH': batch_pH, 'H2S': batch_H2S, 'EP': batch_EP})
+    ls_done = list()
+    for para in dsettings['analytes']:
+        done, results = dfunc[para](dsheets=dsheets, dignore=dignore, data=data, save_path=save_path, results=results,
+                                    dunit=dunit, dsettings=dsettings)
+        if done is True:
+            ls_done.append(para)
+    return ls_done
+
+
+def run_batch(ls_file, dsettings, save_path, workers=None):
+    # each file is processed in an individual worker process
+    dstatus = dict()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        dfuture = dict(map(lambda f: (executor.submit(process_file, f, dsettings, save_path), f), ls_file))
+        for en, future in enumerate(as_completed(dfuture)):
+            f = dfuture[future]
+            try:
+                dstatus[f] = future.result()
+                print('{}/{} done: {} - {}'.format(en + 1, len(ls_file), os.path.basename(f), ', '.join(dstatus[f])))
+            except Exception as e:
+                dstatus[f] = e
+                print('{}/{} failed: {} - {}'.format(en + 1, len(ls_file), os.path.basename(f), e))
+    return dstatus
@@ -26,12 +26,29 @@ import numpy as np
 import pandas as pd
 from mergedeep import merge
 from lmfit import Model
-from scipy import stats
 from datetime import datetime
 from os import walk
+import os
+import json
+import hashlib
+import importlib
+import importlib.util
+import threading
+from functools import partial
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # global parameter
 sns.set_context('paper'), sns.set_style('ticks')
+use_cache = True                    # parse each measurement file only once and re-use the binary copy afterwards
+cache_folder = '.rootics_cache'     # stored next to the measurement file
+ddataset = dict()                   # session data set - loaded once and shared by all analyte pages
+export_workers = None               # worker processes for the figure export; None = number of processors, 1 = serial
+export_formats = ['xlsx']           # output formats of the results; additionally 'parquet' and / or 'csv' per sheet
+export_fit = None                   # depth resolution (µm) of exported fit curves; None = fit resolution, 'parameters'
+export_chunk = 5000                 # rows per block when streaming a table into the excel sheet
+dresults_store = dict()             # derived results with the fingerprint of their inputs: product -> key -> (fp, result)
+ls_sessionCache = list()            # further caches of the analyte modules - cleared with the data set
 
 # color list for samples: grey, orange, petrol, green, yellow, light grey, blue
 ls_col = list(['#4c5558', '#eb9032', '#21a0a8', '#9ec759', '#f9d220', '#96a6ab', '#1B08AA', '#3D14E1', '#D20D41',
@@ -103,9 +120,8 @@ def splitIntoSamples(dprof, df_meta):
         if 'Sensor' in label_par:
             label_par = label_par.split(' ')[-1]
 
-        # metadata sheet
-        ls_empty = list()
-        [ls_empty.append(i) for i in dprof[par].index if pd.isna(dprof[par].loc[i]).all()]
+        # metadata sheet - blank rows separate the profiles
+        ls_empty = list(dprof[par].index[dprof[par].isna().all(axis=1).to_numpy()])
 
         # identify index column (Time)
         colInd = None
@@ -136,23 +152,26 @@ def splitDF2samples(dfex, ls_empty, dprof, par, colInd):
             colD = c
         else:
             pass
-
-    dprofile, start = dict(), 0
-    for r in range(len(ls_empty)):
-        if r != 0:
-            start = ls_empty[r - 1]
-        df = dprof[par].loc[start:ls_empty[r] - 1].dropna().sort_values(by=colD)
-        # add sample-ID and group info for all but the last profile
-        df.loc[:, 'Nr'] = [dfex.loc[r].to_numpy()[0]] * len(df.index)
-        df.loc[:, group] = [int(dfex.loc[r].to_numpy()[1].split(' ')[1])] * len(df.index)
-        dprofile[tuple(dfex.loc[r].to_numpy()[:2])] = df.set_index(colInd)
-
-        if r == len(ls_empty) - 1:
-            # separate procedure for the last profile
-            df = dprof[par].loc[ls_empty[r] + 1:].dropna().sort_values(by=colD)
-            df.loc[:, 'Nr'] = [dfex.loc[r].to_numpy()[0] + 1] * len(df.index)
-            df.loc[:, group] = [int(dfex.loc[r].to_numpy()[1].split(' ')[1])] * len(df.index)
-            dprofile[tuple(dfex.loc[r + 1].to_numpy()[:2])] = df.set_index(colInd)
+    if len(ls_empty) == 0:
+        return dict()
+
+    # segment id for each row: number of blank rows above -> profile r lies between blank row r-1 and r
+    seg = dprof[par].index.isin(ls_empty).cumsum()
+    dgrp = dict(list(dprof[par].dropna().groupby(seg[dprof[par].notna().all(axis=1).to_numpy()])))
+    df_empty = dprof[par].iloc[:0]
+
+    # sample-ID and group info from the meta data. The last profile takes the ID of the previous one + 1
+    arr_meta = dfex.to_numpy()
+    ls_nr = list(arr_meta[:len(ls_empty), 0]) + [arr_meta[len(ls_empty) - 1, 0] + 1]
+    ls_grp = [int(arr_meta[r, 1].split(' ')[1]) for r in range(len(ls_empty))]
+    ls_grp = ls_grp + [ls_grp[-1]]
+
+    dprofile = dict()
+    for r in range(len(ls_empty) + 1):
+        df = dgrp[r] if r in dgrp.keys() else df_empty
+        df = df.sort_values(by=colD)
+        df.loc[:, 'Nr'], df.loc[:, group] = ls_nr[r], ls_grp[r]
+        dprofile[tuple(arr_meta[r, :2])] = df.set_index(colInd)
     return dprofile
 
 
@@ -193,34 +212,37 @@ def addInfo2DF(dprofile):
 
 
 def _excludeProfiles(analyt, dignore, ddata):
-    # get the deployment (ID) and code information
-    hide_nr = dignore[analyt]['deployment'].to_numpy()
-    hide_code = dignore[analyt]['code'].to_numpy()
-
-    l = 0
-    for en, i in enumerate(list(dict.fromkeys(list(ddata.index)))):
-        if i in hide_nr:
-            # position of i in hide_nr
-            for em, j in enumerate(hide_nr):
-                if j == i:
-                    k = em
-            # double-check code
-            chid = _findCoreLabel(option1=hide_code[k], option2=int(hide_code[k].split(' ')[1]),
-                                  ls=ddata.loc[i, ddata.columns[0]].to_numpy())
-            if chid not in list(dict.fromkeys(list(ddata.loc[i, ddata.columns[0]]))):
-                if l == 0:
-                    ddata_update = ddata.loc[i]
-                else:
-                    ddata_update2 = ddata.loc[i]
-                    ddata_update = pd.concat([ddata_update, ddata_update2], axis=0)
-            l += 1
-        else:
-            if l == 0:
-                ddata_update = ddata.loc[i]
-            else:
-                ddata_update2 = ddata.loc[i]
-                ddata_update = pd.concat([ddata_update, ddata_update2], axis=0)
-            l += 1
+    # get the deployment (ID) and code information - the last entry of each deployment counts
+    dhide = dict(zip(dignore[analyt]['deployment'].to_numpy(), dignore[analyt]['code'].to_numpy()))
+
+    # (deployment, code) pairs to exclude - code either as full label or as group number
+    ls_nr = set(ddata.index)
+    pairs_hide = set()
+    for i in dhide.keys():
+        if i in ls_nr:
+            pairs_hide.update([(i, dhide[i]), (i, int(dhide[i].split(' ')[1]))])
+
+    # remove all rows of a deployment when the code matches (double-check)
+    mask_hit = np.array([p in pairs_hide for p in zip(ddata.index, ddata[ddata.columns[0]].to_numpy())], dtype=bool)
+    mask_keep = ~ddata.index.isin(set(ddata.index[mask_hit]))
+
+    # rows are grouped by deployment in order of appearance
+    order = np.argsort(pd.factorize(ddata.index)[0], kind='stable')
+    ddata_update = ddata.iloc[order[mask_keep[order]]]
+    return ddata_update
+
+
+def _prepAnalyteData(dsheets, dignore, sheet_select, analyt):
+    # identify the file (meta data) that contains information about the selected analyte - EP from the first file,
+    # all others from the last one
+    ls_file = [k for k in dignore.keys() if analyt in dignore[k].keys()]
+    l = ls_file[0] if analyt == 'EP' else ls_file[-1]
+
+    # prepare file depending on the type
+    ddata = dsheets[sheet_select].set_index('Nr')
+
+    # remove excluded profiles
+    ddata_update = _excludeProfiles(analyt=analyt, dignore=dignore[l], ddata=ddata)
     return ddata_update
 
 
@@ -302,8 +324,7 @@ def prepAnalytes(dprof):
 
 def splitProfiles2Samples(dfsens):
     # split where blank line is
-    ls_end = list()
-    [ls_end.append(en) for en, i in enumerate(dfsens.index) if pd.isna(dfsens.loc[i].to_numpy()).all()]
+    ls_end = np.flatnonzero(dfsens.isna().all(axis=1).to_numpy())
     arrSens = np.array(dfsens.loc[:ls_end[0] - 1])
     return arrSens
 
@@ -377,9 +398,10 @@ def load_av_profile(ddata):
     return dcore_para
 
 
-def loadMeas4GUI(file):
+def loadMeas4GUI(file, df_excel=None):
     # load sheets from excel file
-    df_excel = pd.read_excel(file, sheet_name=None)
+    if df_excel is None:
+        df_excel = pd.read_excel(file, sheet_name=None)
 
     # identify sensors used
     dfsens = df_excel['Sensors'][['Type', 'Unit']]
@@ -399,6 +421,89 @@ def loadMeas4GUI(file):
     return dprofiles
 
 
+def loadMeasFile(file):
+    # parse-once: re-use the binary copy of the workbook if it is still up-to-date
+    dfile = _loadCache(file=file) if use_cache is True else None
+    if dfile is None:
+        df_excel = pd.read_excel(file, sheet_name=None)
+        # get the metadata and correlation sheets
+        df_meta, df_correl = None, None
+        for c in df_excel.keys():
+            if 'Meta' in c or 'meta' in c:
+                df_meta = df_excel[c]
+            if 'Corr' in c or 'corr' in c:
+                df_correl = df_excel[c]
+        dfile = dict({'profiles': loadMeas4GUI(file=file, df_excel=df_excel), 'meta data': df_meta,
+                      'pH - H2S correlation': df_correl})
+        if use_cache is True:
+            _saveCache(file=file, dfile=dfile)
+    return dfile
+
+
+def _fileHash(file):
+    sha = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _cacheFolder(file):
+    path, name = os.path.split(os.path.abspath(file))
+    return os.path.join(path, cache_folder, name + '_' + hashlib.sha1(os.path.abspath(file).encode()).hexdigest()[:10])
+
+
+def _loadCache(file):
+    # cache is keyed on file path (folder), modification time and content hash
+    folder = _cacheFolder(file=file)
+    if not os.path.exists(os.path.join(folder, 'key.json')):
+        return None
+    try:
+        with open(os.path.join(folder, 'key.json'), 'r') as f:
+            dkey = json.load(f)
+        mtime = os.path.getmtime(file)
+        if dkey['mtime'] != mtime:
+            # file was touched - only reload when the content changed
+            if dkey['hash'] != _fileHash(file=file):
+                return None
+            dkey['mtime'] = mtime
+            with open(os.path.join(folder, 'key.json'), 'w') as f:
+                json.dump(dkey, f)
+
+        # load tables from the binary (feather) files
+        _read = lambda t: pd.read_feather(os.path.join(folder, t)).set_index('index').rename_axis(None)
+        dfile = dict({'profiles': dict(map(lambda p: (p, _read(dkey['profiles'][p])), dkey['profiles'].keys()))})
+        for k in ['meta data', 'pH - H2S correlation']:
+            dfile[k] = _read(dkey[k]) if dkey[k] else None
+    except Exception as e:
+        print('warning - cache for {} could not be loaded: {}'.format(file, e))
+        dfile = None
+    return dfile
+
+
+def _saveCache(file, dfile):
+    folder = _cacheFolder(file=file)
+    try:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        dkey = dict({'file': os.path.abspath(file), 'mtime': os.path.getmtime(file), 'hash': _fileHash(file=file),
+                     'profiles': dict()})
+        for en, p in enumerate(dfile['profiles'].keys()):
+            dkey['profiles'][p] = 'profile_{}.feather'.format(en)
+            dfile['profiles'][p].reset_index().to_feather(os.path.join(folder, dkey['profiles'][p]))
+        for en, k in enumerate(['meta data', 'pH - H2S correlation']):
+            dkey[k] = None
+            if dfile[k] is not None:
+                dkey[k] = 'sheet_{}.feather'.format(en)
+                dfile[k].reset_index().to_feather(os.path.join(folder, dkey[k]))
+
+        # key file is written last - incomplete caches are never used
+        with open(os.path.join(folder, 'key.json'), 'w') as f:
+            json.dump(dkey, f)
+    except Exception as e:
+        print('warning - measurement file could not be cached: {}'.format(e))
+
+
 def check4LoadingData(stringFile):
     loadData = False
     try:
@@ -425,33 +530,114 @@ def check4LoadingData(stringFile):
     return loadData
 
 
-def _loadGlobData(file_str, dcol_label):
+def _fileList(file_str):
     # convert potential str-list into list of strings
     if '[' in file_str:
         ls_file = [i.strip()[1:-1] for i in file_str[1:-1].split(',')]
     else:
-        ls_file = list(file_str)
+        ls_file = [file_str]
+    return ls_file
+
+
+class TaskCancelled(Exception):
+    # raised by a progress callback to stop a running computation (e.g. cancelled by the user)
+    pass
+
+
+def loadDataset(file_str, progress=None):
+    # session data set - each excel file is loaded only once; re-loaded only when a file has changed meanwhile
+    ls_file = _fileList(file_str=file_str)
+    key = tuple([(f, os.path.getmtime(f)) for f in ls_file])
+    if key not in ddataset.keys():
+        ddataset.clear(), dresults_store.clear()
+        [c.clear() for c in ls_sessionCache]
+        dfile = dict()
+        for en, f in enumerate(ls_file):
+            dfile[en] = loadMeasFile(file=f)
+            if progress is not None:
+                progress(en + 1, len(ls_file), os.path.basename(f))
+
+        # meta data of all files
+        ls_meta = [dfile[f]['meta data'] for f in dfile.keys() if dfile[f]['meta data'] is not None]
+        ddataset[key] = dict({'files': ls_file, 'data': dfile,
+                              'meta data': pd.concat(ls_meta, axis=0) if len(ls_meta) > 0 else None})
+    return ddataset[key]
+
+
+def fingerprint(*args):
+    # hash of all inputs (DataFrame, Series, array, number, string) a derived result depends on
+    h = hashlib.sha1()
+    for a in args:
+        if isinstance(a, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(a, index=True).to_numpy().tobytes())
+            h.update(str(list(pd.DataFrame(a).columns)).encode())
+        elif isinstance(a, np.ndarray):
+            h.update(a.tobytes())
+        else:
+            h.update(repr(a).encode())
+    return h.hexdigest()
+
+
+def storedResult(product, key, fp):
+    # derived result (e.g. product='O2 fit', key=(core, sample)) if its inputs did not change - None otherwise
+    entry = dresults_store[product].get(key) if product in dresults_store.keys() else None
+    return entry[1] if entry is not None and entry[0] == fp else None
+
+
+def storeResult(product, key, fp, result):
+    if product not in dresults_store.keys():
+        dresults_store[product] = dict()
+    dresults_store[product][key] = (fp, result)
+
+
+def markDirty(product, key=None):
+    # enforce the recomputation of a single entry (key) or of all entries of a derived product
+    if product in dresults_store.keys():
+        if key is None:
+            dresults_store.pop(product)
+        else:
+            dresults_store[product].pop(key, None)
+
+
+def profileTS(df_meta, temp_degC, sal_PSU):
+    """ Temperature and salinity of each deployment (profile) as given in the metadata sheet (optional columns
+    'temperature degC' and 'salinity PSU'). Missing entries are filled with the global temperature / salinity.
+    :param df_meta:     metadata sheet with the columns 'code' (core) and 'deployment' (sample)
+    :param temp_degC:   global temperature in degC
+    :param sal_PSU:     global salinity
+    :return:            DataFrame with index (core, sample) or None if the metadata carry no temperature / salinity
+    """
+    ls_col = ['temperature degC', 'salinity PSU']
+    if df_meta is None or len([c for c in ls_col if c in df_meta.columns]) == 0:
+        return None
+    df = df_meta.dropna(subset=['code', 'deployment'])
+    index = pd.MultiIndex.from_arrays([[int(str(c).split(' ')[-1]) for c in df['code'].to_numpy()],
+                                       df['deployment'].astype(int).to_numpy()])
+    dTS = pd.DataFrame(dict(map(lambda c: (c, pd.to_numeric(df[c], errors='coerce').to_numpy() if c in df.columns
+                                           else np.nan), ls_col)), index=index)
+    dTS = dTS.fillna({'temperature degC': temp_degC, 'salinity PSU': sal_PSU})
+    return dTS[~dTS.index.duplicated(keep='first')]
+
+
+def _loadGlobData(file_str, dcol_label, progress=None):
+    # each excel file is loaded only once per session (profiles and meta data)
+    dfile = loadDataset(file_str=file_str, progress=progress)['data']
 
     # get meta data file
-    dmeta_ = dict(map(lambda f: (f[0], pd.read_excel(f[1], sheet_name=None)), enumerate(ls_file)))
     dignore = dict()
-    for f in dmeta_.keys():
-        if 'Metadata' in dmeta_[f].keys():
-            dfmeta = dmeta_[f]['Metadata']
-        elif 'metadata' in dmeta_[f].keys():
-            dfmeta = dmeta_[f]['metadata']
-        else:
+    for f in dfile.keys():
+        dfmeta = dfile[f]['meta data']
+        if dfmeta is None:
             print('warning - no meta file found!')
-            dfmeta = None
 
         # get the profiles that shall be excluded
         dignore[f] = dict(map(lambda p: (p, dfmeta[dfmeta[p].isnull()]), dfmeta.columns[2:]))
 
-    # load excel sheet with all measurements
-    ls_dsheets = dict(map(lambda f: (f[0], loadMeas4GUI(file=f[1])), enumerate(ls_file)))
+    # all measurements
+    ls_dsheets = dict(map(lambda f: (f, dfile[f]['profiles']), dfile.keys()))
 
-    dsheets = ls_dsheets[0]
-    for en in range(len(ls_file)-1):
+    dsheets = dict(ls_dsheets[0])
+    for en in range(len(ls_dsheets)-1):
         dsheets = merge(dsheets, ls_dsheets[en+1])
 
     # get the information how the columns for depth, concentration, and signal are labeled for each analyte
@@ -481,31 +667,42 @@ def loadProfile(dfsens, dfprof):
     return dprof
 
 
-def load_measurements(dsheets, ls_core, para):
-    dic_dcore, dls_nr = dict(), dict()
-    for core in ls_core:
-        ls_nr = list(dict.fromkeys(dsheets[dsheets[dsheets.columns[0]] == core].index))
-        dls_nr[core] = ls_nr
+def profileStore(dsheets):
+    # (core, sample) indexed store of all profiles - built with one groupby, O(1) look-up of each sample afterwards
+    dstore = dict(list(dsheets.groupby([dsheets[dsheets.columns[0]].to_numpy(), dsheets.index.to_numpy()],
+                                       sort=False)))
+    return dstore
+
+
+def load_measurements(dsheets, ls_core, para, dstore=None):
+    if dstore is None:
+        dstore = profileStore(dsheets=dsheets)
+
+    # samples of each core in order of appearance
+    dls_nr = dict(map(lambda core: (core, list()), ls_core))
+    [dls_nr[k[0]].append(k[1]) for k in dstore.keys() if k[0] in dls_nr.keys()]
 
+    # identify the depth column
+    col_ = [c for c in dsheets.columns if 'Depth' in c]
+    name0 = dsheets.loc[:, : col_[0]].columns[-2]
+    ls_name = [name0]
+
+    dic_dcore = dict()
+    for core in ls_core:
         # prepare table (index = depth)
         dcore = dict()
-        for n in ls_nr:
-            # identify the depth column
-            col_ = [c for c in dsheets.columns if 'Depth' in c]
-            ls_name = [dsheets.loc[:, : col_[0]].columns[-2]]
-
-            # get individual samples belonging to the same core
-            dfcore = dsheets[dsheets[dsheets.columns[0]] == core]
+        for n in dls_nr[core]:
+            ls_name = [name0]
 
             # oxygen profiles
             if 'O2' in para or 'o2' in para:
-                df = dfcore[dfcore.index == n].set_index(col_[0]).dropna()
+                df = dstore[(core, n)].set_index(col_[0]).dropna()
                 # crop dataframe of sample --> remove core information
                 ls_col = list()
                 [ls_col.append(i) for i in list(df.columns) if 'M' in i or 'mV' in i or 'mol' in i]
                 dcore[n] = df[ls_col].sort_index()
             elif 'H2S' in para or 'h2s' in para:
-                df = dfcore[dfcore.index == n].set_index(col_[0]).dropna()
+                df = dstore[(core, n)].set_index(col_[0]).dropna()
                 # crop dataframe of sample --> remove core information
                 [ls_name.append(i) for i in list(df.columns) if 'H2S' in i and 'M' in i]
                 [ls_name.append(i) for i in list(df.columns) if 'H2S' in i and 'mV' in i]
@@ -514,11 +711,11 @@ def load_measurements(dsheets, ls_core, para):
                     df[c] = df[c] - df[c].min()
                 dcore[n] = df[ls_name].sort_index()
             elif 'EP' in para or 'Ep' in para or 'ep' in para:
-                [ls_name.append(i) for i in dsheets.loc[n].columns if 'EP' in i and '_mV' in i]
-                df = dsheets.loc[n].set_index(col_[0])[ls_name].dropna()
-                dcore[n] = df[df[ls_name[0]] == core].sort_index()
+                [ls_name.append(i) for i in dsheets.columns if 'EP' in i and '_mV' in i]
+                df = dstore[(core, n)].set_index(col_[0])[ls_name].dropna()
+                dcore[n] = df.sort_index()
             elif 'pH' in para:
-                df = dfcore[dfcore.index == n].set_index(col_[0]).dropna()
+                df = dstore[(core, n)].set_index(col_[0]).dropna()
                 dcore[n] = df.sort_index()
             else:
                 df = dsheets.set_index(col_[0]).dropna()
@@ -527,50 +724,194 @@ def load_measurements(dsheets, ls_core, para):
     return dic_dcore, dls_nr, ls_name
 
 
+class ProfileTable(Mapping):
+    """ Columnar storage of all profiles of an analyte - one contiguous array for the depth and for each column plus the
+    offsets of each (core, sample). Behaves like the dictionary of cores with a dictionary of sample profiles each,
+    whereas each profile is a (read-only) zero-copy view on the columns. Use edit() for an adjustable version.
+    :param dprofiles:   dictionary of cores with a dictionary of sample profiles (DataFrame, index = depth) each
+    """
+    def __init__(self, dprofiles):
+        ls_key = [(c, s) for c in dprofiles.keys() for s in dprofiles[c].keys()]
+        ls_df = [dprofiles[k[0]][k[1]] for k in ls_key]
+        self.ls_core = list(dprofiles.keys())
+        self.dsample = dict(map(lambda c: (c, list(dprofiles[c].keys())), self.ls_core))
+        self.dcolumns = dict(map(lambda en: (ls_key[en], list(ls_df[en].columns)), range(len(ls_key))))
+        self.index_name = ls_df[0].index.name if len(ls_df) > 0 else None
+
+        # offsets of each profile in the contiguous arrays
+        nrow = np.array([len(df.index) for df in ls_df], dtype=int)
+        stop = np.cumsum(nrow)
+        self.offsets = dict(map(lambda en: (ls_key[en], (stop[en] - nrow[en], stop[en])), range(len(ls_key))))
+
+        # one array for the depth and each column - missing columns of a profile are filled with nan
+        self.depth = np.concatenate([df.index.to_numpy() for df in ls_df]) if len(ls_df) > 0 else np.array([])
+        ls_col = list(dict.fromkeys([col for df in ls_df for col in df.columns]))
+        self.data = dict(map(lambda col: (col, np.concatenate([df[col].to_numpy() if col in df.columns
+                                                               else np.full(len(df.index), np.nan) for df in ls_df])),
+                             ls_col))
+        [a.setflags(write=False) for a in [self.depth] + list(self.data.values())]
+        self._dviews = dict()
+
+    def profile(self, core, s):
+        # zero-copy view of a single profile (cached)
+        if (core, s) not in self._dviews.keys():
+            start, stop = self.offsets[(core, s)]
+            self._dviews[(core, s)] = pd.DataFrame(dict(map(lambda col: (col, self.data[col][start:stop]),
+                                                            self.dcolumns[(core, s)])),
+                                                   index=pd.Index(self.depth[start:stop], name=self.index_name),
+                                                   columns=self.dcolumns[(core, s)], copy=False)
+        return self._dviews[(core, s)]
+
+    def __getitem__(self, core):
+        if core not in self.dsample.keys():
+            raise KeyError(core)
+        return dict(map(lambda s: (s, self.profile(core=core, s=s)), self.dsample[core]))
+
+    def __iter__(self):
+        return iter(self.ls_core)
+
+    def __len__(self):
+        return len(self.ls_core)
+
+    def __getstate__(self):
+        # views are re-created after pickling, e.g. in worker processes
+        state = self.__dict__.copy()
+        state['_dviews'] = dict()
+        return state
+
+    def shift_depth(self, core, s, ynew):
+        # new depth of a single profile (e.g. SWI correction) - the depth array is re-allocated (upcast, e.g. int depth
+        # and fractional shift) so that views handed out before stay untouched; the cached view is re-created
+        start, stop = self.offsets[(core, s)]
+        ynew = np.asarray(ynew)
+        if len(ynew) != stop - start:
+            raise ValueError('depth of {} - {} has {} values, got {}'.format(core, s, stop - start, len(ynew)))
+        depth = self.depth.astype(np.result_type(self.depth, ynew))
+        depth[start:stop] = ynew
+        depth.setflags(write=False)
+        self.depth = depth
+        self._dviews.pop((core, s), None)
+
+    def edit(self):
+        # adjustable version - each profile is copied only when it is accessed for the first time
+        return dict(map(lambda c: (c, ProfileEdit(table=self, core=c)), self.ls_core))
+
+    def copy(self):
+        return self.edit()
+
+    def nbytes(self):
+        return self.depth.nbytes + sum([a.nbytes for a in self.data.values()])
+
+
+class ProfileEdit(MutableMapping):
+    """ Adjustable samples of a core in a ProfileTable: untouched profiles are shared with the (read-only) table and a
+    private copy of a profile is only created on its first access; replaced or removed samples do not affect the table.
+    """
+    def __init__(self, table, core):
+        self.table, self.core = table, core
+        self.ls_sample, self._dprofile = list(table.dsample[core]), dict()
+
+    def __getitem__(self, s):
+        if s not in self._dprofile.keys():
+            if s not in self.ls_sample:
+                raise KeyError(s)
+            self._dprofile[s] = self.table.profile(core=self.core, s=s).copy()
+        return self._dprofile[s]
+
+    def __setitem__(self, s, df):
+        if s not in self.ls_sample:
+            self.ls_sample.append(s)
+        self._dprofile[s] = df
+
+    def __delitem__(self, s):
+        self.ls_sample.remove(s)
+        self._dprofile.pop(s, None)
+
+    def __iter__(self):
+        return iter(list(self.ls_sample))
+
+    def __len__(self):
+        return len(self.ls_sample)
+
+    def copy(self):
+        return dict(map(lambda s: (s, self[s].copy()), self.ls_sample))
+
+
+def frameProfiles(ddata):
+    # wide table of all profiles - columns (core, sample, parameter)
+    return pd.concat(dict(map(lambda c: (c, pd.concat(ddata[c], axis=1)), ddata.keys())), axis=1)
+
+
+def frameColumn(ddata):
+    # wide table of the last column of each profile - columns (core, sample)
+    dcore = dict()
+    for c in ddata.keys():
+        col = ddata[c][list(ddata[c].keys())[0]].columns[-1]
+        df = pd.concat([ddata[c][s][col] for s in ddata[c].keys()], axis=1)
+        df.columns = ddata[c].keys()
+        dcore[c] = df
+    return pd.concat(dcore, axis=1)
+
+
+def _frameO2fit(dfit, order, steps=None):
+    # fit curve (order=0) or 1st derivative (order=1) of all samples re-evaluated from the fit parameters
+    dcore = dict()
+    for c in dfit.keys():
+        if order == 0:
+            df = pd.concat([dfit[c][s].fit_curve(steps=steps) for s in dfit[c].keys()], axis=1)
+            df.columns = dfit[c].keys()
+        else:
+            df = pd.concat([dfit[c][s].derivative_curve(order=order, steps=steps) for s in dfit[c].keys()], axis=1)
+        dcore[c] = df
+    return pd.concat(dcore, axis=1)
+
+
+def _frameO2params(dfit):
+    # fit parameters, point of inflection and goodness of fit of all samples
+    dparams = dict()
+    for c in dfit.keys():
+        for s in dfit[c].keys():
+            fit = dfit[c][s]
+            dparams[(c, s)] = dict(fit.params, **dict({'inflection': fit.inflection, 'depth min': fit.xrange[0],
+                                                        'depth max': fit.xrange[1], 'reduced chi2': fit.res.redchi}))
+    return pd.DataFrame(dparams).T
+
+
+def _frameO2profile(ddata):
+    dic = dict()
+    for c in ddata.keys():
+        if isinstance(ddata[c], (dict, Mapping)):
+            dic[c] = pd.concat(ddata[c], axis=1)
+        else:
+            dic[c] = ddata[c]
+    return pd.concat(dic, axis=1)
+
+
 def prep4saveRes(dout, results, dpenStat, typeCalib=None, o2_dis=None, temperature=None, salinity=None, pene2=None):
+    # the large tables (profiles, fit, derivative) are only built when their sheet is written, see write_sheets
     # handle raw profiles to one dataframe results['raw data']
     if 'O2 raw data' in results.keys():
-        dcore_raw = dict()
-        for c in results['O2 raw data'].keys():
-            dcore_raw[c] = pd.concat(results['O2 raw data'][c], axis=1)
-        dout['O2 raw data'] = pd.concat(dcore_raw, axis=1)
+        dout['O2 raw data'] = partial(frameProfiles, ddata=results['O2 raw data'])
 
     # handle fit and derivative - results['fit'], results['derivative']
     if 'O2 fit' in results.keys():
-        dcore_fit, dcore_der = dict(), dict()
-        for c in results['O2 fit'].keys():
-            # fit
-            df_fit = pd.concat([results['O2 fit'][c][s][1] for s in results['O2 fit'][c].keys()], axis=1)
-            df_fit.columns = results['O2 fit'][c].keys()
-            dcore_fit[c] = df_fit
-            # 1st derivative
-            dcore_der[c] = pd.concat([results['O2 derivative'][c][s][0] for s in results['O2 derivative'][c].keys()],
-                                     axis=1)
-        dout['fit_mV'] = pd.concat(dcore_fit, axis=1)
-        dout['derivative_mV'] = pd.concat(dcore_der, axis=1)
+        dout['fit parameters'] = partial(_frameO2params, dfit=results['O2 fit'])
+        if export_fit != 'parameters':
+            dout['fit_mV'] = partial(_frameO2fit, dfit=results['O2 fit'], order=0, steps=export_fit)
+            dout['derivative_mV'] = partial(_frameO2fit, dfit=results['O2 fit'], order=1, steps=export_fit)
 
     # handle SWI corrected - results['SWI corrected']
     if 'O2 SWI corrected' in results.keys():
-        dcore_swi = dict()
         # only potential data 'O2_mV'
         ddata = results['O2 SWI corrected']
-        for c in ddata.keys():
-            # either µmol/L or mV -> take the first columns
-            col = ddata[c][list(ddata[c].keys())[0]].columns[-1]
-            df = pd.concat([ddata[c][s][col] for s in ddata[c].keys()], axis=1)
-            df.columns = ddata[c].keys()
-            dcore_swi[c] = df
-        dout['SWIcorrected {}'.format(col)] = pd.concat(dcore_swi, axis=1)
+        # either µmol/L or mV -> take the first columns
+        c = list(ddata.keys())[-1]
+        col = ddata[c][list(ddata[c].keys())[0]].columns[-1]
+        dout['SWIcorrected {}'.format(col)] = partial(frameColumn, ddata=ddata)
 
     # handle o2 profiles - results['O2 profile']
     if 'O2 profile' in results.keys():
-        dic = dict()
-        for c in results['O2 profile'].keys():
-            if isinstance(results['O2 profile'][c], dict):
-                dic[c] = pd.concat(results['O2 profile'][c], axis=1)
-            else:
-                dic[c] = results['O2 profile'][c]
-        dout['O2 profile'] = pd.concat(dic, axis=1)
+        dout['O2 profile'] = partial(_frameO2profile, ddata=results['O2 profile'])
 
     # handle penetration depth - results['penetration depth']
     if 'O2 penetration depth' in results.keys():
@@ -591,15 +932,168 @@ def prep4saveRes(dout, results, dpenStat, typeCalib=None, o2_dis=None, temperatu
     return dout
 
 
-def save_rawExcel(dout, file, savePath):
+def _cell(v):
+    # python value that can be written into an excel cell - empty for nan
+    if v is None or (isinstance(v, (float, np.floating)) and np.isnan(v)):
+        return None
+    if isinstance(v, (np.integer, np.floating, np.bool_)):
+        return v.item()
+    if isinstance(v, (str, int, float, bool, datetime)):
+        return v
+    return str(v)
+
+
+def _writeSheet(workbook, name, df):
+    # stream the table row by row into the worksheet (header rows, then index and values)
+    ws = workbook.add_worksheet(name[:31])
+    nidx, ncol = df.index.nlevels, df.columns.nlevels
+    for lev in range(ncol):
+        labels = df.columns.get_level_values(lev) if ncol > 1 else df.columns
+        ws.write_row(lev, 0, [None] * nidx + [_cell(l) for l in labels])
+    if any([n is not None for n in df.index.names]):
+        ws.write_row(ncol, 0, [_cell(n) for n in df.index.names])
+        ncol += 1
+
+    for start in range(0, len(df.index), export_chunk):
+        chunk = df.iloc[start:start + export_chunk]
+        index = chunk.index.tolist() if nidx == 1 else [list(i) for i in chunk.index.tolist()]
+        for en, (i, row) in enumerate(zip(index, chunk.to_numpy(dtype=object).tolist())):
+            ls_idx = [_cell(i)] if nidx == 1 else [_cell(k) for k in i]
+            ws.write_row(ncol + start + en, 0, ls_idx + [_cell(v) for v in row])
+
+
+def _flatColumns(df):
+    # parquet requires string column labels
+    df = df.copy()
+    df.columns = [' | '.join([str(k) for k in c]) if isinstance(c, tuple) else str(c) for c in df.columns]
+    return df
+
+
+def _saveTable(df, savename, key, fmt):
+    # additional export of a sheet as parquet or csv file next to the excel file
+    file = '{}_{}.{}'.format(savename.rsplit('.', 1)[0], key.replace('/', '-').replace(' ', '_'), fmt)
+    try:
+        if fmt == 'parquet':
+            _flatColumns(df).to_parquet(file)
+        else:
+            df.to_csv(file)
+    except Exception as e:
+        print('warning - sheet {} could not be saved as {}: {}'.format(key, fmt, e))
+
+
+def write_sheets(dout, savename, formats=None, progress=None):
+    """ Write all sheets into one excel file - each table is built (if given as function), written and released before
+    the next one. With xlsxwriter the rows are streamed in constant memory mode; otherwise the pandas ExcelWriter is
+    used.
+    :param dout:        dictionary of sheet name -> DataFrame or function returning the DataFrame
+    :param savename:    excel file
+    :param formats:     additional output formats for each sheet, e.g. ['parquet', 'csv']; export_formats by default
+    :param progress:    optional callback progress(done, total, sheet) after each written sheet
+    """
+    formats = export_formats if formats is None else formats
+    if importlib.util.find_spec('xlsxwriter') is not None:
+        import xlsxwriter
+        workbook = xlsxwriter.Workbook(savename, {'constant_memory': True})
+        write = lambda key, df: _writeSheet(workbook=workbook, name=key, df=df)
+    else:
+        workbook = pd.ExcelWriter(savename)
+        write = lambda key, df: df.to_excel(workbook, sheet_name=key)
+
+    try:
+        for en, key in enumerate(dout.keys()):
+            df = dout[key]() if callable(dout[key]) else dout[key]
+            write(key, df)
+            [_saveTable(df=df, savename=savename, key=key, fmt=f) for f in formats if f in ['parquet', 'csv']]
+            del df
+            if progress is not None:
+                progress(en + 1, len(dout), key)
+    finally:
+        workbook.close()
+
+
+def save_rawExcel(dout, file, savePath, progress=None):
     savename = _actualFileName(savePath=savePath, file=file, clabel='output', rlabel='run')
 
     # actually saving DataFrame to excel
-    writer = pd.ExcelWriter(savename)
-    for key in dout.keys():
-        dout[key].to_excel(writer, sheet_name=key)
-    writer.save()
-    writer.close()
+    write_sheets(dout=dout, savename=savename, progress=progress)
+
+
+def figure_spec(module, func, files, dpi, **kwargs):
+    """ Lightweight description of a figure for the export - no matplotlib object is created:
+    :param module:  module containing the plotting function, e.g. 'functions_O2'
+    :param func:    name of the plotting function; it returns the figure (or a tuple starting with the figure)
+    :param files:   list of output files (one per figure type)
+    :param dpi:     resolution of the saved figure
+    :param kwargs:  arguments of the plotting function
+    :return:        figure specification
+    """
+    return dict({'module': module, 'func': func, 'files': files, 'dpi': dpi, 'kwargs': kwargs})
+
+
+def _initRenderer():
+    # worker processes render without any GUI
+    matplotlib.use('Agg', force=True)
+
+
+def render_figure(spec):
+    # draw the figure according to its specification and write all output files
+    out = getattr(importlib.import_module(spec['module']), spec['func'])(**spec['kwargs'])
+    fig = out[0] if isinstance(out, tuple) else out
+    for name in spec['files']:
+        fig.savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=spec['dpi'])
+    plt.close(fig)
+    return spec['files']
+
+
+def render_figures(ls_spec, workers=None, progress=None):
+    """ Render and save all figures in a process pool (Agg backend). Files are written as soon as a figure is done:
+    :param ls_spec:     list of figure specifications (see figure_spec)
+    :param workers:     number of worker processes; None = export_workers
+    :param progress:    optional callback progress(done, total, files) after each saved figure
+    :return:            list of all saved files
+    """
+    workers = export_workers if workers is None else workers
+    ls_open, ls_files = list(range(len(ls_spec))), list()
+
+    def _done(files):
+        ls_files.extend(files)
+        if progress is not None:
+            progress(len(ls_spec) - len(ls_open), len(ls_spec), files)
+
+    if workers != 1 and len(ls_spec) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initRenderer) as executor:
+                dfuture = dict(map(lambda en: (executor.submit(render_figure, ls_spec[en]), en), ls_open))
+                try:
+                    for future in as_completed(dfuture):
+                        try:
+                            files = future.result()
+                        except Exception as e:
+                            print('warning - figure {} could not be rendered in parallel ({}); render it '
+                                  'serially'.format(ls_spec[dfuture[future]]['files'], e))
+                            continue
+                        ls_open.remove(dfuture[future])
+                        _done(files)
+                except TaskCancelled:
+                    # drop all figures that are not rendered yet
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            print('warning - parallel figure export failed ({}); continue with serial export'.format(e))
+
+    # serial export for all remaining figures - pyplot is not used outside the main (GUI) thread, but in a separate
+    # process instead
+    if len(ls_open) > 0 and threading.current_thread() is not threading.main_thread():
+        with ProcessPoolExecutor(max_workers=1, initializer=_initRenderer) as executor:
+            while len(ls_open) > 0:
+                en = ls_open.pop(0)
+                _done(executor.submit(render_figure, ls_spec[en]).result())
+    while len(ls_open) > 0:
+        en = ls_open.pop(0)
+        _done(render_figure(ls_spec[en]))
+    return ls_files
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -651,6 +1145,189 @@ def find_col2plot(unit, df):
     return col_plot
 
 
+class ProfileBrowser:
+    """ Fast redraw of the depth profiles when browsing through the cores with the slider. One persistent Line2D per
+    sample is kept and a core switch only exchanges the data (set_data), title, and legend. These are animated artists
+    blitted on top of a background (axes, ticks, labels) that is cached for each axis range; the background is renewed
+    whenever the canvas is fully redrawn. Once another plot function cleared the axes, the frame is set up again.
+    :param fig:     figure of the page
+    :param ax:      axes of the figure the profiles are drawn in
+    """
+    def __init__(self, fig, ax):
+        self.fig, self.ax = fig, ax
+        self.lines, self.legend, self.dlegend = list(), None, dict()
+        self.dbackground, self.frame, self.signature = dict(), None, None
+        self.core, self.dhidden, self.alpha = None, None, .6
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self.fig.canvas.mpl_connect('pick_event', self._on_pick)
+
+    def _signature(self):
+        return len(self.ax.lines), len(self.ax.collections), len(self.ax.texts), len(self.ax.patches)
+
+    def active(self):
+        # the frame is gone when the axes were cleared or other artists were added meanwhile
+        if self.frame is None or len(self.lines) == 0:
+            return False
+        return all([l in self.ax.lines for l in self.lines]) and self._signature() == self.signature
+
+    def _setup(self, frame, nlines, layout):
+        # static part of the plot - drawn once and cached as background
+        self.ax.cla()
+        self.ax.set_xlabel(frame[0], fontsize=frame[2]), self.ax.set_ylabel(frame[1], fontsize=frame[2])
+        self.ax.invert_yaxis()
+        self.ax.axhline(0, lw=.5, color='k')
+        self.lines = [self.ax.plot([], [], animated=True)[0] for n in range(nlines)]
+        self.ax.title.set_animated(True)
+        if layout is not None:
+            layout()
+        self.frame, self.legend, self.dlegend, self.signature = frame, None, dict(), self._signature()
+        self.dbackground.clear()
+
+    def show(self, core, title, ls_profile, frame, xlim=None, style=None, dhidden=None, layout=None):
+        """ Update the plot for another core
+        :param core:        selected core (key of the hidden objects)
+        :param title:       title of the plot
+        :param ls_profile:  list of (label, x, y) for each sample of the core
+        :param frame:       (x label, y label, font size) of the axes - the frame is set up again when it changes
+        :param xlim:        range of the x-axis; y-axis (and x-axis if None) are scaled to the data
+        :param style:       line style as keyword arguments for Line2D, e.g. dict(ls='-.', lw=.75, alpha=.75)
+        :param dhidden:     dictionary of hidden samples for each core; samples can be hidden by clicking the legend
+        :param layout:      optional function to adjust the figure layout once the frame is set up
+        """
+        if not self.active() or frame != self.frame or len(ls_profile) > len(self.lines):
+            self._setup(frame=frame, nlines=max(len(ls_profile), len(self.lines)), layout=layout)
+        self.core, self.dhidden = core, dhidden
+        ls_hid = dhidden[core] if dhidden and core in dhidden.keys() else list()
+
+        # exchange data of the persistent lines
+        style = dict() if style is None else dict(style)
+        self.alpha = style.pop('alpha', .6)
+        for en, line in enumerate(self.lines):
+            if en < len(ls_profile):
+                label, x, y = ls_profile[en]
+                line.set_data(np.asarray(x), np.asarray(y))
+                line.set(color=ls_col[en % len(ls_col)], label=label, alpha=.0 if label in ls_hid else self.alpha,
+                         visible=True, pickradius=6, **style)
+            else:
+                line.set_data([], []), line.set(label='_nolegend_', visible=False)
+        self.ax.title.set_text(title)
+
+        # legend of the samples; each legend line is connected to its profile
+        if self.legend is not None:
+            self.legend.remove()
+        self.legend = self.ax.legend(handles=self.lines[:len(ls_profile)], frameon=True, fancybox=True,
+                                     fontsize=frame[2] * 0.8)
+        self.legend.set_animated(True)
+        self.dlegend = dict()
+        for legline, line in zip(self.legend.get_lines(), self.lines):
+            legline.set_picker(5.)
+            self.dlegend[legline] = line
+        self.signature = self._signature()
+
+        # scale axes to the data
+        self.ax.relim(), self.ax.autoscale_view()
+        if xlim is not None:
+            self.ax.set_xlim(xlim)
+        self.blit()
+
+    def _key(self):
+        return (tuple(self.ax.get_xlim()), tuple(self.ax.get_ylim()), tuple(self.ax.get_position().bounds),
+                self.fig.canvas.get_width_height())
+
+    def _draw_animated(self):
+        for a in [l for l in self.lines if l.get_visible()] + [self.ax.title, self.legend]:
+            if a is not None:
+                self.ax.draw_artist(a)
+
+    def _on_draw(self, event):
+        # full redraw (first time for this axis range, resize, zoom) - store background and draw profiles on top
+        if not self.active():
+            return
+        self.dbackground[self._key()] = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def blit(self):
+        key = self._key()
+        if key in self.dbackground.keys():
+            self.fig.canvas.restore_region(self.dbackground[key])
+            self._draw_animated()
+            self.fig.canvas.blit(self.fig.bbox)
+        else:
+            self.fig.canvas.draw()
+
+    def _on_pick(self, event):
+        # hide / show the profile of the legend entry and store it as hidden object of the core
+        if not self.active() or event.artist not in self.dlegend.keys() or self.dhidden is None:
+            return
+        line = self.dlegend[event.artist]
+        ls_hid = list(dict.fromkeys(self.dhidden[self.core] if self.core in self.dhidden.keys() else list()))
+        if line.get_label() in ls_hid:
+            ls_hid.remove(line.get_label())
+        else:
+            ls_hid.append(line.get_label())
+        self.dhidden[self.core] = ls_hid
+
+        curve_vis = line.get_label() not in ls_hid
+        event.artist.set_alpha(1.0 if curve_vis else 0.2)
+        line.set_alpha(self.alpha if curve_vis else 0.)
+        self.blit()
+
+
+def profiles4plot(dcore, col):
+    # samples of a core as (label, x, y) arrays
+    return [('sample ' + str(nr), dcore[nr][col].to_numpy(), dcore[nr].index.to_numpy()) for nr in dcore.keys()]
+
+
+class PlotCache:
+    """ Ready-to-plot data of each core of a page - the profiles as (label, x, y) arrays and the x-range of the core.
+    An entry is re-used as long as the sample profiles of the core (and their depth index) are the same objects. Any
+    trimming, depth correction, or recalculation replaces them; in-place edits of values require invalidate().
+    """
+    def __init__(self):
+        self._dentry = dict()
+
+    @staticmethod
+    def _version(dcore):
+        return [(nr, dcore[nr], dcore[nr].index) for nr in dcore.keys()]
+
+    @staticmethod
+    def _sameVersion(v1, v2):
+        if len(v1) != len(v2):
+            return False
+        return all([a[0] == b[0] and a[1] is b[1] and a[2] is b[2] for a, b in zip(v1, v2)])
+
+    def profiles(self, dcore, core, col, build=None):
+        """ Profiles and x-range of a core
+        :param dcore:   dictionary of the sample profiles of the core
+        :param core:    core label
+        :param col:     plotted column
+        :param build:   function(dcore) returning the list of (label, x, y) - only called if the entry is outdated;
+                        profiles4plot by default
+        :return:        list of (label, x, y) and (min, max) of all x values
+        """
+        version = self._version(dcore)
+        entry = self._dentry.get((core, col))
+        if entry is None or not self._sameVersion(entry[0], version):
+            ls_profile = profiles4plot(dcore=dcore, col=col) if build is None else build(dcore)
+            ls_x = [np.asarray(p[1], dtype=float) for p in ls_profile if len(p[1]) > 0]
+            xrange = (np.nanmin([np.nanmin(x) for x in ls_x]), np.nanmax([np.nanmax(x) for x in ls_x])) if ls_x \
+                else (np.nan, np.nan)
+            entry = (version, ls_profile, xrange)
+            self._dentry[(core, col)] = entry
+        return entry[1], entry[2]
+
+    def xrange(self, ddata, col, build=None):
+        # common x-range of all cores (e.g. same x-scale for all core plots)
+        ls_range = [self.profiles(dcore=ddata[c], core=c, col=col, build=build)[1] for c in ddata.keys()]
+        return np.nanmin([r[0] for r in ls_range]), np.nanmax([r[1] for r in ls_range])
+
+    def invalidate(self, core=None):
+        if core is None:
+            self._dentry.clear()
+        else:
+            [self._dentry.pop(k) for k in list(self._dentry.keys()) if k[0] == core]
+
+
 # --------------------------------------------------------------------------------------------------------------------
 def sheetname_check(dsheets, para='O2'):
     ls, sheet_select = list(), None
@@ -681,36 +1358,73 @@ def _getProfileStack(nP, dataEP, dorder):
     return dfP_, dfP
 
 
+def _driftAverage(dfP_, numP):
+    # average EP of the first numP measurement points of each profile of a group
+    return np.array([np.nanmean(p['EP_mV'].to_numpy(dtype=float)[:numP]) if len(p.index) > 0 else np.nan
+                     for p in dfP_])
+
+
+def driftFitBatch(ls_ydata, ls_fit):
+    """ Drift regression of all groups with one (batched) least-squares solve. Each group is fitted with a 2nd order
+    polynomial (> 2 profiles) or a linear regression over the profile number:
+    :param ls_ydata:    list of average EPs (one array per group)
+    :param ls_fit:      list of fit selections ('2nd order polynomial fit' or 'linear regression') for each group
+    :return:            list of fit parameters (highest order first), array of chi-square for each group
+    """
+    ngroup, nmax = len(ls_ydata), max([len(y) for y in ls_ydata])
+    Y, W = np.zeros(shape=(ngroup, nmax)), np.zeros(shape=(ngroup, nmax))
+    for g, y in enumerate(ls_ydata):
+        Y[g, :len(y)], W[g, :len(y)] = np.nan_to_num(y), np.isfinite(y)
+    poly = np.array([len(y) > 2 and f == '2nd order polynomial fit' for y, f in zip(ls_ydata, ls_fit)])
+    valid = np.array([len(y) <= 2 or f in ['2nd order polynomial fit', 'linear regression']
+                      for y, f in zip(ls_ydata, ls_fit)])
+
+    # design matrix (x², x, 1) - the quadratic term is removed for linear regressions
+    X = np.arange(nmax, dtype=float)
+    V = np.stack([X**2 * np.ones(shape=(ngroup, 1)), X * np.ones(shape=(ngroup, 1)), np.ones(shape=(ngroup, nmax))],
+                 axis=-1) * W[..., None]
+    V[~poly, :, 0] = 0
+    VtV = np.einsum('gni,gnj->gij', V, V)
+    VtV[~poly, 0, 0] = 1
+    P = np.einsum('gij,gj->gi', np.linalg.pinv(VtV), np.einsum('gni,gn->gi', V, Y * W))
+
+    # goodness of fit
+    chi_squared = np.sum(((np.einsum('gni,gi->gn', V, P) - Y) * W)**2, axis=1)
+    ls_arg = [P[g] if poly[g] else P[g, 1:] for g in range(ngroup)]
+    ls_arg = [a if valid[g] else np.array([np.nan]) for g, a in enumerate(ls_arg)]
+    chi_squared[~valid] = np.nan
+    return ls_arg, chi_squared
+
+
+def applyDriftCorrection(dfP_, corr_f, nP, dorder, resultsEP):
+    # actual correction of all profiles part of the package - replaces the profiles in resultsEP
+    for en, r in enumerate(dorder[nP]):
+        c, s = r
+        col = [col_ for col_ in dfP_[en].columns if 'mV' not in col_][-1]
+        df = dfP_[en][[col, 'EP_mV']].copy()
+        df['EP_mV'] = df['EP_mV'].to_numpy() + corr_f[en]
+        resultsEP[c][s] = df
+    return resultsEP
+
+
+def driftRegression(ydata, arg):
+    # regression curve along the profile number
+    xnew = np.linspace(0, len(ydata) - 1, num=int((len(ydata) - 1) / 0.2 + 1))
+    return pd.DataFrame(np.polyval(arg, xnew), index=xnew, columns=['EP_reg'])
+
+
 def curveFitPack(dfP_, numP, nP, dorder, resultsEP, fit_select='2nd order polynomial fit'):
     # curve fit
-    ydata = [dfP_[n].loc[dfP_[n].index[:numP]].mean()['EP_mV'] for n in range(len(dfP_))]
-    xdata = np.arange(len(ydata))
-    xnew = np.linspace(0, xdata[-1], num=int(xdata[-1] / 0.2 + 1))
-    if len(ydata) > 2 and fit_select == '2nd order polynomial fit':
-        arg = np.polyfit(x=xdata, y=ydata, deg=2)
-        c, t = arg[2], arg[-1]
-        df_reg = pd.DataFrame(arg[0] * (xnew ** 2) + arg[1] * xnew + arg[2], index=xnew, columns=['EP_reg'])
-    elif len(ydata) <= 2 or fit_select == 'linear regression':
-        arg = stats.linregress(x=xdata, y=ydata)
-        c, t = arg[1], arg[1]
-        df_reg = pd.DataFrame(arg[0] * xnew + arg[1], index=xnew, columns=['EP_reg'])
-    else:
-        arg, c, t = [np.nan], 0, 0
-        df_reg = pd.DataFrame([np.nan] * xnew, index=xnew, columns=['EP_reg'])
-
-    # determine goodness of fit
-    chi_squared = np.sum((np.polyval(arg, xdata) - ydata) ** 2)
+    ydata = _driftAverage(dfP_=dfP_, numP=numP)
+    ls_arg, chi_squared = driftFitBatch(ls_ydata=[ydata], ls_fit=[fit_select])
+    arg = ls_arg[0]
+    df_reg = driftRegression(ydata=ydata, arg=arg)
 
     # actual correction of all profiles part of the package | target value - actual value
-    corr_f = [c - ydata[n] - t for n in range(len(xdata))]
-    for en, r in enumerate(dorder[nP]):
-        c, s = r
-        for col_ in dfP_[en].columns:
-            if 'mV' not in col_:
-                col = col_
-        resultsEP[c][s] = pd.concat([dfP_[en][col], dfP_[en]['EP_mV'] + corr_f[en]], axis=1)
-
-    return ydata, df_reg, chi_squared, arg, corr_f
+    c = t = arg[-1] if np.isfinite(arg[-1]) else 0
+    corr_f = list(c - ydata - t)
+    applyDriftCorrection(dfP_=dfP_, corr_f=corr_f, nP=nP, dorder=dorder, resultsEP=resultsEP)
+    return list(ydata), df_reg, chi_squared[0], arg, corr_f
 
 
 def _find_unit_in_column(ls_columns, plot_col):
@@ -20,6 +20,7 @@ import seaborn as sns
 import numpy as np
 import pandas as pd
 import os
+from functools import partial
 
 import functions_dbs as dbs
 
@@ -45,20 +46,15 @@ def load_pHdata(dcol_label, grp_label, data, results):
     if loadData is True:
         # raw measurement file pre-processed and saved per default as rawData file
         dsheets, dignore = dbs._loadGlobData(file_str=data, dcol_label=dcol_label)
-        for k in dignore.keys():
-            if 'pH' in dignore[k].keys():
-                l = k
 
         # pre-check whether pH_all in sheet names
         sheet_select = dbs.sheetname_check(dsheets, para='pH')
         checked = dbs.checkDatavsPara(sheet_select, par='pH')
 
         if checked is True:
-            # prepare file depending on the type
-            ddata = dsheets[sheet_select].set_index('Nr')
-
-            # remove excluded profiles
-            ddata_update = dbs._excludeProfiles(analyt='pH', dignore=dignore[l], ddata=ddata)
+            # prepare file depending on the type and remove excluded profiles
+            ddata_update = dbs._prepAnalyteData(dsheets=dsheets, dignore=dignore, sheet_select=sheet_select,
+                                                analyt='pH')
 
             if grp_label is None:
                 grp_label = ddata_update.columns[0]
@@ -68,7 +64,9 @@ def load_pHdata(dcol_label, grp_label, data, results):
 
             # import all measurements for given parameter
             [dpH_core, _, ls_colname] = dbs.load_measurements(dsheets=ddata_update, ls_core=ls_core, para=sheet_select)
-            results['pH profile raw data'], results['pH adjusted'] = dpH_core, dpH_core.copy()
+            # raw data stored columnar (read-only) - adjusted profiles are copied from it on first access
+            results['pH profile raw data'] = dbs.ProfileTable(dprofiles=dpH_core)
+            results['pH adjusted'] = results['pH profile raw data'].edit()
             return checked, grp_label, results, ls_colname, ls_core
         else:
             return checked, grp_label, results, None, None
@@ -77,33 +75,31 @@ def load_pHdata(dcol_label, grp_label, data, results):
 
 
 # --------------------------------------------------------------------------------------------------------------------
-def save_pHdata(save_path, save_params, data, results):
+def _framepH(ddata):
+    # wide table of all pH profiles without the core column - built when the sheet is written
+    dout0 = dict()
+    for c in ddata.keys():
+        dout0[c] = pd.concat([ddata[c][s][ddata[c][s].columns[1:]] for s in ddata[c].keys()], axis=1)
+    return pd.concat(dout0, axis=1)
+
+
+def save_pHdata(save_path, save_params, data, results, progress=None):
     dout_pH = dict()
     # for an external function
     ls_saveData = list()
     [ls_saveData.append(i) for i in save_params.split(',') if 'fig' not in i]
     if 'raw data' in ls_saveData:
-        dout0 = dict()
-        for c in results['pH profile raw data'].keys():
-            df = pd.concat([results['pH profile raw data'][c][s][results['pH profile raw data'][c][s].columns[1:]]
-                            for s in results['pH profile raw data'][c].keys()], axis=1)
-            dout0[c] = df
-        dout_pH['pH profile raw data'] = pd.concat(dout0, axis=1)
+        dout_pH['pH profile raw data'] = partial(_framepH, ddata=results['pH profile raw data'])
 
     # if adjusted in list to save + if anything has changed from raw data
     if 'adjusted data' in ls_saveData:
-        dout0 = dict()
-        for c in results['pH adjusted'].keys():
-            df = pd.concat([results['pH adjusted'][c][s][results['pH adjusted'][c][s].columns[1:]]
-                            for s in results['pH adjusted'][c].keys()], axis=1)
-            dout0[c] = df
-        dout_pH['pH adjusted'] = pd.concat(dout0, axis=1)
+        dout_pH['pH adjusted'] = partial(_framepH, ddata=results['pH adjusted'])
 
     # save to excel sheets
-    dbs.save_rawExcel(dout=dout_pH, file=data, savePath=save_path)
+    dbs.save_rawExcel(dout=dout_pH, file=data, savePath=save_path, progress=progress)
 
 
-def save_pHfigures(save_para, path_save, results, grp_label, fs_):
+def save_pHfigures(save_para, path_save, results, grp_label, fs_, progress=None):
     # create folder for figure output
     ls_saveFig = list()
     [ls_saveFig.append(i) for i in save_para.split(',') if 'fig' in i]
@@ -118,43 +114,36 @@ def save_pHfigures(save_para, path_save, results, grp_label, fs_):
         if not os.path.exists(save_path):
             os.makedirs(save_path)
 
-        # save figures
+        # describe the figures of all cores - they are rendered in parallel afterwards
+        ls_spec = list()
         if 'fig raw' in ls_saveFig:
-            dfig = dict()
-            for c in results['pH profile raw data'].keys():
-                fig = plot_pHProfile(data_pH=results['pH profile raw data'], core=c, scale=None, ls='-.', show=False,
-                                     ls_core=list(results['pH profile raw data'].keys()), grp_label=grp_label,
-                                     fs_=fs_*0.8)
-                dfig[c] = fig
-
             # make a project folder for the specific analyte if it doesn't exist
             save_folder1 = dbs._actualFolderName(savePath=save_path, cfolder='rawProfile', rlabel='run')
             if not os.path.exists(save_folder1):
                 os.makedirs(save_folder1)
 
-            # actual saving of pH raw data
-            for f in dfig.keys():
-                for t in ls_figtype:
-                    name = save_folder1 + 'rawDepthprofile_core-{}.'.format(f) + t
-                    dfig[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+            ls_core = list(results['pH profile raw data'].keys())
+            ls_spec += [dbs.figure_spec(module=__name__, func='plot_pHProfile', dpi=dpi,
+                                        files=[save_folder1 + 'rawDepthprofile_core-{}.'.format(c) + t
+                                               for t in ls_figtype],
+                                        data_pH=results['pH profile raw data'], core=c, scale=None, ls='-.', show=False,
+                                        ls_core=ls_core, grp_label=grp_label, fs_=fs_*0.8) for c in ls_core]
 
         if 'fig adjusted' in ls_saveFig:
-            dfig = dict()
-            for c in results['pH adjusted'].keys():
-                fig = plot_pHProfile(data_pH=results['pH adjusted'], core=c, scale=None, ls='-', show=False,
-                                     fs_=fs_*0.8, ls_core=list(results['pH adjusted'].keys()), grp_label=grp_label)
-                dfig[c] = fig
-
             # make a project folder for the specific analyte if it doesn't exist
             save_folder2 = dbs._actualFolderName(savePath=save_path, cfolder='DepthProfile', rlabel='run')
             if not os.path.exists(save_folder2):
                 os.makedirs(save_folder2)
 
-            # actual saving of pH raw data
-            for f in dfig.keys():
-                for t in ls_figtype:
-                    name = save_folder2 + 'Depthprofile_core-{}.'.format(f) + t
-                    dfig[f].savefig(name, bbox_inches='tight', pad_inches=0.1, dpi=dpi)
+            ls_core = list(results['pH adjusted'].keys())
+            ls_spec += [dbs.figure_spec(module=__name__, func='plot_pHProfile', dpi=dpi,
+                                        files=[save_folder2 + 'Depthprofile_core-{}.'.format(c) + t
+                                               for t in ls_figtype],
+                                        data_pH=results['pH adjusted'], core=c, scale=None, ls='-', show=False,
+                                        fs_=fs_*0.8, ls_core=ls_core, grp_label=grp_label) for c in ls_core]
+
+        # actual saving of all pH figures
+        dbs.render_figures(ls_spec=ls_spec, progress=progress)
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -190,13 +179,7 @@ def plot_pHProfile(data_pH, core, ls_core, scale, grp_label, fs_, ls='-.', fig=N
 
     # update layout
     if scale:
-        if trimexact is True:
-            scale_min = -1 * scale[1]/10 if scale[0] == 0 else scale[0]
-            scale_max = scale[1]
-        else:
-            scale_min = -1 * scale[1]/100 if scale[0] == 0 else scale[0]*0.995
-            scale_max = scale[1]*1.005
-        ax.set_xlim(scale_min, scale_max)
+        ax.set_xlim(_scaleRange(scale=scale, trimexact=trimexact))
     fig.tight_layout(pad=1.5)
 
     if show is False:
@@ -207,6 +190,35 @@ def plot_pHProfile(data_pH, core, ls_core, scale, grp_label, fs_, ls='-.', fig=N
     return fig
 
 
+def _scaleRange(scale, trimexact):
+    # x-range of the pH profile plot
+    if trimexact is True:
+        scale_min = -1 * scale[1]/10 if scale[0] == 0 else scale[0]
+        scale_max = scale[1]
+    else:
+        scale_min = -1 * scale[1]/100 if scale[0] == 0 else scale[0]*0.995
+        scale_max = scale[1]*1.005
+    return scale_min, scale_max
+
+
+def browse_pHProfile(browser, data_pH, core, ls_core, scale, grp_label, fs_, ls='-.', trimexact=False, cache=None):
+    # fast update of the pH profiles when another core is selected (see dbs.ProfileBrowser); the plot data of each core
+    # are prepared once and re-used from the cache (dbs.PlotCache) as long as the core is not changed
+    core_select = dbs.closest_core(ls_core=ls_core, core=core)
+    if core_select == 0:
+        return plot_pHProfile(data_pH=data_pH, core=core, ls_core=ls_core, scale=scale, grp_label=grp_label, fs_=fs_,
+                              ls=ls, fig=browser.fig, ax=browser.ax, trimexact=trimexact)
+
+    cache = dbs.PlotCache() if cache is None else cache
+    ls_profile = cache.profiles(dcore=data_pH[core_select], core=core_select, col='pH')[0]
+    style = dict(ls=ls, lw=0.75 if ls == '-.' else 1.5, marker='.' if ls == '-.' else None, ms=6, alpha=0.75)
+    browser.show(core=core_select, title='pH depth profile for {} {}'.format(grp_label, core_select),
+                 ls_profile=ls_profile, frame=('pH value', 'Depth / µm', fs_), style=style,
+                 xlim=_scaleRange(scale=scale, trimexact=trimexact) if scale else None,
+                 layout=partial(browser.fig.tight_layout, pad=1.5))
+    return browser.fig
+
+
 def plot_adjustpH(core, sample, dfCore, scale, grp_label, fig, ax):
     # initialize first plot with first core and sample
     fig = GUI_adjustDepth(core=core, nr=sample, dfCore=dfCore, scale=scale, fig=fig, ax=ax, grp_label=grp_label)